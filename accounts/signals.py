@@ -0,0 +1,8 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from utils.images import queue_derivatives
+from .models import User
+
+@receiver(post_save, sender=User)
+def build_profile_photo_thumbnails(sender, instance, update_fields=None, **kwargs):
+    queue_derivatives(instance.profile_photo, update_fields)
@@ -0,0 +1,20 @@
+from django.contrib import admin
+from .models import AuditEvent
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    """Read-only: the audit trail is append-only"""
+    list_display = ('timestamp', 'username', 'role', 'method', 'path', 'status_code', 'ip_address', 'latency_ms')
+    list_filter = ('role', 'method', 'status_code')
+    search_fields = ('username', 'path', 'ip_address')
+    date_hierarchy = 'timestamp'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('username', models.CharField(help_text='Kept so events survive the user being deleted', max_length=150)),
+                ('role', models.CharField(blank=True, max_length=20)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('ip_address', models.CharField(blank=True, max_length=45)),
+                ('latency_ms', models.PositiveIntegerField(help_text='Time spent in the view and inner middleware')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['timestamp'], name='audit_timestamp_idx'), models.Index(fields=['username', 'timestamp'], name='audit_username_timestamp_idx')],
+            },
+        ),
+    ]
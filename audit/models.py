@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import models
+
+class AuditEvent(models.Model):
+    """One authenticated request, written in batches by the audit sink. Rows are never updated."""
+    timestamp = models.DateTimeField()
+    # No database constraint and no cascade: deleting a user must not rewrite the trail
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False, related_name='+')
+    username = models.CharField(max_length=150, help_text="Kept so events survive the user being deleted")
+    role = models.CharField(max_length=20, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField()
+    ip_address = models.CharField(max_length=45, blank=True)
+    latency_ms = models.PositiveIntegerField(help_text="Time spent in the view and inner middleware")
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='audit_timestamp_idx'),
+            models.Index(fields=['username', 'timestamp'], name='audit_username_timestamp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.username} {self.method} {self.path} ({self.status_code})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Audit events are append-only')
+        super().save(*args, **kwargs)
@@ -0,0 +1,180 @@
+"""
+In-process, batched audit trail sink
+
+``record`` is all the request thread pays for: it puts a tuple on a
+bounded queue and returns. A daemon thread drains the queue and writes
+batches to the AuditEvent table, or to a rotating JSON-lines file. When the
+queue is full the event is dropped and counted instead of making the
+request wait, so a traffic spike cannot turn auditing into a bottleneck.
+
+Each process (e.g. every gunicorn worker) has its own queue, thread and
+counters. Anything still queued is flushed when the process exits.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import RotatingFileHandler
+from django.conf import settings
+from django.db import close_old_connections
+from .models import AuditEvent
+
+logger = logging.getLogger('ward_system')
+
+# Order of the values in an event tuple
+FIELDS = (
+    'timestamp', 'user_id', 'username', 'role', 'method',
+    'path', 'status_code', 'ip_address', 'latency_ms',
+)
+
+class AuditSink:
+    """
+    Bounded queue plus background writer.
+
+    Args:
+        backend (str): 'db' for the AuditEvent table, 'file' for JSON lines
+        max_size (int): Events held in memory before new ones are dropped
+        batch_size (int): Events written per insert
+        flush_interval (float): Longest time an event waits in the queue
+        log_file (str): Path for the 'file' backend
+    """
+
+    def __init__(self, backend='db', max_size=10000, batch_size=500, flush_interval=2.0, log_file=None):
+        self.backend = backend
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log_file = log_file
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._handler = None
+
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._dropped_reported = 0
+
+    def record(self, event):
+        """Queue an event tuple (see FIELDS); returns False if it was dropped"""
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'queued': self._queue.qsize(),
+            'capacity': self.max_size,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked child: the parent's thread did not come along, and its
+                # queued events are the parent's to write
+                self._queue = queue.Queue(maxsize=self.max_size)
+            else:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='audit-sink', daemon=True).start()
+
+    def _run(self):
+        # Events stay on the queue until written, so flush() at exit can reach all of them
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far, in batches, on the calling thread"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            if self.backend == 'file':
+                self._write_file(batch)
+            else:
+                self._write_db(batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception(f'Audit sink failed to write {len(batch)} event(s)')
+
+        if self.dropped != self._dropped_reported:
+            logger.warning(
+                f'Audit queue full: dropped {self.dropped - self._dropped_reported} event(s) '
+                f'({self.dropped} since start)'
+            )
+            self._dropped_reported = self.dropped
+
+    def _write_db(self, batch):
+        # This thread keeps its own connection; honour CONN_MAX_AGE and recover from dropped ones
+        close_old_connections()
+        try:
+            AuditEvent.objects.bulk_create(
+                [AuditEvent(**dict(zip(FIELDS, event))) for event in batch],
+                batch_size=self.batch_size,
+            )
+        except Exception:
+            close_old_connections()
+            raise
+
+    def _write_file(self, batch):
+        if self._handler is None:
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+            self._handler = RotatingFileHandler(self.log_file, maxBytes=10 * 1024 * 1024, backupCount=10, encoding='utf-8')
+            self._handler.setFormatter(logging.Formatter('%(message)s'))
+        for event in batch:
+            values = dict(zip(FIELDS, event))
+            values['timestamp'] = values['timestamp'].isoformat()
+            self._handler.handle(logging.makeLogRecord({'msg': json.dumps(values)}))
+        self._handler.flush()
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+def get_sink():
+    """The process-wide sink, configured from the AUDIT_* settings"""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = AuditSink(
+                    backend=getattr(settings, 'AUDIT_BACKEND', 'db'),
+                    max_size=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+                    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 500),
+                    flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0),
+                    log_file=getattr(settings, 'AUDIT_LOG_FILE', os.path.join(settings.BASE_DIR, 'logs', 'audit.jsonl')),
+                )
+    return _sink
+
+def record(event):
+    return get_sink().record(event)
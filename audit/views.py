@@ -0,0 +1,31 @@
+from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from utils.decorators import role_required
+from utils.pagination import CursorPaginator
+from .forms import AuditFilterForm
+from .models import AuditEvent
+from .sink import get_sink
+
+@login_required
+@role_required(['admin'])
+def event_list(request):
+    form = AuditFilterForm(request.GET or None)
+    events = AuditEvent.objects.all()
+    
+    if form.is_valid():
+        # Both filters are served by the (username, timestamp) and timestamp indexes
+        if form.cleaned_data['username']:
+            events = events.filter(username=form.cleaned_data['username'])
+        if form.cleaned_data['start']:
+            events = events.filter(timestamp__gte=form.cleaned_data['start'])
+        if form.cleaned_data['end']:
+            events = events.filter(timestamp__lte=form.cleaned_data['end'])
+    
+    paginator = CursorPaginator(events, 50, ordering=('-timestamp',))
+    events = paginator.get_page(request.GET.get('cursor'))
+    
+    return render(request, 'audit/events.html', {
+        'form': form,
+        'events': events,
+        'sink_stats': get_sink().stats(),
+    })
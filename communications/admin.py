@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Announcement, Complaint, ComplaintResponse, Suggestion
+from django.contrib import admin, messages
+from .broadcast import resume_broadcast, start_broadcast
+from .models import Announcement, Broadcast, Complaint, ComplaintResponse, Suggestion
 
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
@@ -7,6 +8,35 @@ class AnnouncementAdmin(admin.ModelAdmin):
     list_filter = ('priority', 'is_active', 'created_at', 'expires_at')
     search_fields = ('title', 'content')
     readonly_fields = ('created_at', 'updated_at')
+    actions = ['broadcast_email']
+
+    @admin.action(description='Email selected announcements to all residents')
+    def broadcast_email(self, request, queryset):
+        started = sum(start_broadcast(announcement, user=request.user)[1] for announcement in queryset)
+        messages.success(request, f'{started} announcement(s) queued for broadcast.')
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('announcement', 'channel', 'status', 'progress_display', 'delivered', 'recipients_total', 'created_at', 'finished_at')
+    list_filter = ('status', 'channel', 'created_at')
+    list_select_related = ('announcement',)
+    readonly_fields = (
+        'announcement', 'channel', 'status', 'started_by', 'cursor', 'recipients_total', 'batches_total',
+        'batches_done', 'delivered', 'last_error', 'created_at', 'dispatched_at', 'finished_at',
+    )
+    actions = ['resume']
+
+    @admin.display(description='Progress')
+    def progress_display(self, obj):
+        return f'{obj.progress}% ({obj.batches_done}/{obj.batches_total} batches)'
+
+    @admin.action(description='Resume selected broadcasts')
+    def resume(self, request, queryset):
+        queued = sum(resume_broadcast(broadcast) for broadcast in queryset.exclude(status='done'))
+        messages.success(request, f'{queued} job(s) queued to finish the selected broadcasts.')
+
+    def has_add_permission(self, request):
+        return False
 
 @admin.register(Complaint)
 class ComplaintAdmin(admin.ModelAdmin):
@@ -0,0 +1,196 @@
+"""
+Announcement fan-out for Ward Resident System
+
+``start_broadcast`` records a Broadcast and queues a dispatch job. The
+dispatcher streams the IDs of reachable residents with a queryset iterator,
+cuts them into batches of BROADCAST_BATCH_SIZE and queues one job per
+batch, so every run_jobs worker shares the sending. Each batch is
+delivered by its channel and marked done in the same transaction, and
+the dispatcher saves its cursor after every batch: a crash at any point
+resumes (``resume_broadcast``, or the job queue's own retries) without
+skipping or repeating anyone.
+
+Channels are pluggable: subclass Channel and register it with
+``register_channel``. The email channel writes one outbox message per
+resident with a single bulk INSERT per batch and queues an outbox sender
+per batch, so delivery runs on as many SMTP connections as there are
+workers. An address shared by several residents gets one message per
+broadcast: the outbox rows carry a unique (broadcast, address) key.
+"""
+import logging
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from jobs.queue import enqueue
+from residents.models import Resident
+from .models import Broadcast, BroadcastBatch
+
+logger = logging.getLogger('ward_system')
+
+CHANNELS = {}
+
+
+def register_channel(cls):
+    CHANNELS[cls.name] = cls()
+    return cls
+
+
+class Channel:
+    """A way of reaching residents, e.g. email or SMS"""
+    name = None
+
+    def recipients(self, queryset):
+        """Narrow active residents to those this channel can reach"""
+        return queryset
+
+    def send_batch(self, broadcast, residents):
+        """Deliver the broadcast's announcement to a list of residents; returns the number delivered"""
+        raise NotImplementedError
+
+
+def _address(email):
+    return email.strip().lower()
+
+
+@register_channel
+class EmailChannel(Channel):
+    name = 'email'
+
+    def recipients(self, queryset):
+        return queryset.exclude(email='')
+
+    def send_batch(self, broadcast, residents):
+        from outbox.mail import SEND_TASK
+        from outbox.models import OutboxMessage
+
+        context = {'announcement': broadcast.announcement}
+        subject = render_to_string('emails/announcement_subject.txt', context).strip()
+        body = render_to_string('emails/announcement.txt', context)
+        from_email = settings.DEFAULT_FROM_EMAIL
+
+        # Household members often share an address. The outbox stores one message per
+        # (broadcast, address) key, whichever batch the address turns up in first.
+        addresses = dict.fromkeys(_address(resident.email) for resident in residents)
+        keys = {f'broadcast:{broadcast.pk}:{address}': address for address in addresses}
+        sent = set(OutboxMessage.objects.filter(dedup_key__in=list(keys)).values_list('dedup_key', flat=True))
+        new = [key for key in keys if key not in sent]
+        # ignore_conflicts covers a batch running in parallel that stored the same address meanwhile
+        OutboxMessage.objects.bulk_create([
+            OutboxMessage(subject=subject, body=body, from_email=from_email, recipients=[keys[key]], dedup_key=key)
+            for key in new
+        ], ignore_conflicts=True)
+        # One sender per batch, so several workers deliver in parallel over their own connections
+        enqueue(SEND_TASK)
+        return len(new)
+
+
+def batch_size():
+    return getattr(settings, 'BROADCAST_BATCH_SIZE', 500)
+
+
+def start_broadcast(announcement, channel='email', user=None):
+    """
+    Queue the fan-out of ``announcement``; returns (broadcast, created), with
+    the existing Broadcast and False if one was already started
+    """
+    if channel not in CHANNELS:
+        raise KeyError(f'Unknown broadcast channel: {channel}')
+    broadcast, created = Broadcast.objects.get_or_create(
+        announcement=announcement,
+        channel=channel,
+        defaults={'started_by': user},
+    )
+    if created:
+        enqueue('communications.dispatch_broadcast', broadcast_id=broadcast.pk)
+    return broadcast, created
+
+
+def reachable_residents(channel):
+    return CHANNELS[channel].recipients(Resident.objects.filter(is_active=True))
+
+
+def dispatch(broadcast_id):
+    """Split the remaining recipients of a broadcast into batch jobs, resuming after the saved cursor"""
+    broadcast = Broadcast.objects.get(pk=broadcast_id)
+    if broadcast.dispatched_at:
+        return
+
+    residents = reachable_residents(broadcast.channel)
+    if broadcast.status == 'queued':
+        broadcast.recipients_total = residents.count()
+    broadcast.status = 'running'
+    broadcast.save(update_fields=['status', 'recipients_total'])
+
+    size = batch_size()
+    ids = (
+        residents.filter(pk__gt=broadcast.cursor)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+        .iterator(chunk_size=size * 4)
+    )
+    while chunk := list(islice(ids, size)):
+        with transaction.atomic():
+            batch = BroadcastBatch.objects.create(
+                broadcast=broadcast,
+                first_resident_id=chunk[0],
+                last_resident_id=chunk[-1],
+            )
+            Broadcast.objects.filter(pk=broadcast_id).update(
+                cursor=chunk[-1], batches_total=F('batches_total') + 1,
+            )
+            enqueue('communications.send_broadcast_batch', batch_id=batch.pk)
+
+    Broadcast.objects.filter(pk=broadcast_id).update(dispatched_at=timezone.now())
+    _finish_if_complete(broadcast_id)
+    logger.info(f'Broadcast {broadcast_id} dispatched')
+
+
+def send_batch(batch_id):
+    """Deliver one batch; a batch already done is skipped, so retries never resend"""
+    with transaction.atomic():
+        batch = BroadcastBatch.objects.select_for_update().select_related('broadcast__announcement').get(pk=batch_id)
+        if batch.done:
+            return
+        broadcast = batch.broadcast
+        residents = list(
+            reachable_residents(broadcast.channel)
+            .filter(pk__gte=batch.first_resident_id, pk__lte=batch.last_resident_id)
+            .only('pk', 'email', 'phone_number', 'first_name', 'last_name')
+        )
+        delivered = CHANNELS[broadcast.channel].send_batch(broadcast, residents)
+
+        batch.done = True
+        batch.delivered = delivered
+        batch.finished_at = timezone.now()
+        batch.save(update_fields=['done', 'delivered', 'finished_at'])
+        Broadcast.objects.filter(pk=broadcast.pk).update(
+            batches_done=F('batches_done') + 1, delivered=F('delivered') + delivered,
+        )
+        Broadcast.objects.filter(pk=broadcast.pk, status='failed').update(status='running')
+    _finish_if_complete(broadcast.pk)
+
+
+def _finish_if_complete(broadcast_id):
+    Broadcast.objects.filter(
+        pk=broadcast_id, dispatched_at__isnull=False, batches_done=F('batches_total'),
+    ).exclude(status='done').update(status='done', finished_at=timezone.now())
+
+
+def resume_broadcast(broadcast):
+    """Queue jobs for whatever a broadcast has left: undispatched recipients and unsent batches"""
+    queued = 0
+    if not broadcast.dispatched_at:
+        enqueue('communications.dispatch_broadcast', unique=True, broadcast_id=broadcast.pk)
+        queued += 1
+    for batch_id in broadcast.batches.filter(done=False).values_list('pk', flat=True):
+        enqueue('communications.send_broadcast_batch', unique=True, batch_id=batch_id)
+        queued += 1
+    return queued
+
+
+def record_failure(broadcast_id, error):
+    """Flag a broadcast whose job failed; the job queue retries it and the admin can resume it"""
+    Broadcast.objects.filter(pk=broadcast_id).exclude(status='done').update(status='failed', last_error=str(error))
@@ -0,0 +1,144 @@
+"""
+Cached announcement feeds for Ward Resident System
+
+The home page shows the latest live announcements, and anonymous visitors
+see the public (high and urgent) ones. Each feed is cached under a key
+that includes a version number. Saving or deleting an Announcement bumps
+the version once the transaction commits (see signals.py), so every old
+entry is ignored at once. An entry also expires when its first item does,
+so an announcement leaves the feed at its ``expires_at``.
+
+The rendered anonymous home page is cached under the same version and
+expiry (``cached_public_page``). Every anonymous visitor gets the same
+page, so the busiest public page costs two cache lookups. The first page
+of the announcements list is cached the same way (``get_first_page``);
+later pages, reached by cursor, are read from the database.
+"""
+import time
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from utils.metrics import record_cache
+from .models import Announcement
+
+TIMEOUT = getattr(settings, 'ANNOUNCEMENT_FEED_TIMEOUT', 300)
+
+KEY_PREFIX = 'announcements'
+
+VERSION_KEY = f'{KEY_PREFIX}:version'
+
+# Feed name -> (filter on live announcements, number shown)
+FEEDS = {
+    'latest': ({}, 3),
+    'public': ({'priority__in': ['high', 'urgent']}, 5),
+}
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1, so a version lost from the cache never reuses an old one
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Retire every cached feed and page once the current transaction commits"""
+    def bump():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            current_version()
+    transaction.on_commit(bump)
+
+
+def _feed_key(version, feed):
+    return f'{KEY_PREFIX}:{version}:feed:{feed}'
+
+
+def _page_key(version, page):
+    return f'{KEY_PREFIX}:{version}:page:{page}'
+
+
+def _first_page_key(version, per_page):
+    return f'{KEY_PREFIX}:{version}:first_page:{per_page}'
+
+
+def _entry(items, announcements, now):
+    """A cache entry for ``items`` that expires with the first of ``announcements`` to expire"""
+    expiries = [item.expires_at for item in announcements if item.expires_at]
+    timeout = TIMEOUT
+    if expiries:
+        timeout = max(1, min(timeout, int((min(expiries) - now).total_seconds()) + 1))
+    return {'items': items, 'expires': time.time() + timeout}
+
+
+def _build(feed):
+    filters, limit = FEEDS[feed]
+    now = timezone.now()
+    items = list(Announcement.objects.live(now).filter(**filters).order_by('-created_at')[:limit])
+    return _entry(items, items, now)
+
+
+def _remaining(entry):
+    return max(1, int(entry['expires'] - time.time()))
+
+
+def _get_entry(feed, version):
+    key = _feed_key(version, feed)
+    entry = cache.get(key)
+    record_cache(hits=entry is not None, misses=entry is None)
+    if entry is None or entry['expires'] <= time.time():
+        entry = _build(feed)
+        cache.set(key, entry, _remaining(entry))
+    return entry
+
+
+def get_feed(feed):
+    """The cached list of announcements in ``feed``"""
+    return _get_entry(feed, current_version())['items']
+
+
+def get_first_page(paginator):
+    """
+    ``paginator.get_page()`` for the first page of live announcements,
+    cached under the feed version. ``paginator`` must page through
+    ``Announcement.objects.live()``.
+    """
+    key = _first_page_key(current_version(), paginator.per_page)
+    entry = cache.get(key)
+    record_cache(hits=entry is not None, misses=entry is None)
+    if entry is None or entry['expires'] <= time.time():
+        now = timezone.now()
+        page = paginator.get_page()
+        entry = _entry(page, page.object_list, now)
+        cache.set(key, entry, _remaining(entry))
+    return entry['items']
+
+
+def cached_public_page(request, page, render_page):
+    """
+    Serve ``render_page()`` to anonymous visitors from the cache, keyed by
+    the feed version and expiring with the public feed. Requests with
+    pending messages are rendered normally, since the page would show them.
+    """
+    if request.user.is_authenticated or request.method != 'GET' or len(get_messages(request)):
+        return render_page()
+
+    version = current_version()
+    key = _page_key(version, page)
+    cached = cache.get(key)
+    record_cache(hits=cached is not None, misses=cached is None)
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
+    entry = _get_entry('public', version)
+    response = render_page()
+    if response.status_code == 200 and not response.cookies:
+        cache.set(key, (response.content, response['Content-Type']), _remaining(entry))
+    return response
@@ -0,0 +1,111 @@
+"""
+Management command to measure announcement fan-out throughput
+
+Creates synthetic residents and an urgent announcement inside a
+transaction, dispatches a broadcast and runs its batch jobs on this
+process, then rolls everything back. With --send the outbox is also
+drained through the in-memory email backend, so no mail leaves the
+machine either way.
+"""
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import run_job
+from residents.models import Household, Resident
+from communications.broadcast import dispatch, start_broadcast
+from communications.models import Announcement
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = 'Measure broadcast fan-out throughput (recipients/s) on synthetic residents; nothing is kept'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residents', type=int, default=100000, help='Number of synthetic residents')
+        parser.add_argument('--batch-size', type=int, default=500, help='Residents per broadcast batch')
+        parser.add_argument('--send', action='store_true', help='Also deliver the outbox through the locmem backend')
+
+    def handle(self, *args, **options):
+        overrides = {
+            'JOBS_RUN_INLINE': False,
+            'BROADCAST_BATCH_SIZE': options['batch_size'],
+            'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+        }
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Synthetic data rolled back')
+
+    def run(self, options):
+        count = options['residents']
+        started = time.perf_counter()
+        self.create_residents(count)
+        self.stdout.write(f'Created {count} residents in {time.perf_counter() - started:.1f}s')
+
+        author = get_user_model().objects.create(username=f'benchmark-{timezone.now():%Y%m%d%H%M%S}')
+        announcement = Announcement.objects.create(
+            title='Benchmark notice', content='Synthetic broadcast', priority='urgent', created_by=author,
+        )
+        first_job = Job.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        broadcast, _ = start_broadcast(announcement, user=author)
+
+        dispatch_time, _ = self.timed(dispatch, broadcast.pk)
+        batch_jobs = Job.objects.filter(pk__gt=first_job, task='communications.send_broadcast_batch', status='queued')
+        batches_time, _ = self.timed(lambda: [run_job(job) for job in batch_jobs])
+        broadcast.refresh_from_db()
+
+        total = dispatch_time + batches_time
+        self.stdout.write(
+            f'Dispatch: {broadcast.batches_total} batches in {dispatch_time:.2f}s '
+            f'({broadcast.batches_total / max(dispatch_time, 1e-6):.0f} batches/s)'
+        )
+        self.stdout.write(
+            f'Batches:  {broadcast.delivered} recipients in {batches_time:.2f}s '
+            f'({broadcast.delivered / max(batches_time, 1e-6):.0f} recipients/s)'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Fan-out:  {broadcast.delivered} recipients in {total:.2f}s, status {broadcast.status}'
+        ))
+
+        if options['send']:
+            from django.core import mail
+            from outbox.mail import send_pending
+
+            mail.outbox = []
+            send_time, stats = self.timed(send_pending)
+            self.stdout.write(
+                f'Delivery: {stats["sent"]} emails in {send_time:.2f}s ({stats["sent"] / max(send_time, 1e-6):.0f} emails/s)'
+            )
+
+    def create_residents(self, count):
+        household = Household.objects.create(
+            household_number=f'BENCH-{timezone.now():%Y%m%d%H%M%S}', street_name='Benchmark Street', house_number='0',
+        )
+        born = timezone.now().date().replace(year=1990)
+        step = 5000
+        for offset in range(0, count, step):
+            Resident.objects.bulk_create([
+                Resident(
+                    household=household,
+                    first_name='Bench',
+                    last_name=f'Resident{n}',
+                    nida_number=f'B{n:019d}',
+                    date_of_birth=born,
+                    gender='F',
+                    marital_status='single',
+                    email=f'resident{n}@bench.invalid',
+                )
+                for n in range(offset, min(offset + step, count))
+            ])
+
+    def timed(self, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        return time.perf_counter() - started, result
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('communications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(default='email', max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('cursor', models.PositiveBigIntegerField(default=0)),
+                ('recipients_total', models.PositiveIntegerField(default=0, help_text='Residents reachable on this channel when dispatch started')),
+                ('batches_total', models.PositiveIntegerField(default=0)),
+                ('batches_done', models.PositiveIntegerField(default=0)),
+                ('delivered', models.PositiveIntegerField(default=0, help_text='Messages handed to the channel')),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatched_at', models.DateTimeField(blank=True, help_text='Every recipient has been assigned to a batch', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts', to='communications.announcement')),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_resident_id', models.PositiveBigIntegerField()),
+                ('last_resident_id', models.PositiveBigIntegerField()),
+                ('done', models.BooleanField(default=False)),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='communications.broadcast')),
+            ],
+            options={
+                'ordering': ['first_resident_id'],
+                'indexes': [models.Index(fields=['broadcast', 'done'], name='broadcast_batch_done_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='broadcast',
+            constraint=models.UniqueConstraint(fields=('announcement', 'channel'), name='broadcast_announcement_channel_unique'),
+        ),
+    ]
@@ -1,7 +1,15 @@
 from django.db import models
+from django.db.models import Prefetch, Q
 from django.conf import settings
+from django.utils import timezone
 from residents.models import Resident
 
+class AnnouncementQuerySet(models.QuerySet):
+    def live(self, now=None):
+        """Active announcements that have not expired"""
+        now = now or timezone.now()
+        return self.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now), is_active=True)
+
 class Announcement(models.Model):
     PRIORITY_CHOICES = (
         ('low', 'Low'),
@@ -19,12 +27,94 @@ class Announcement(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     expires_at = models.DateTimeField(null=True, blank=True)
 
+    objects = AnnouncementQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
         return self.title
 
+class Broadcast(models.Model):
+    """Delivery of one announcement to every active resident over one channel"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='broadcasts')
+    channel = models.CharField(max_length=20, default='email')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    started_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Progress; the cursor is the last resident ID handed to a batch, so dispatch can resume
+    cursor = models.PositiveBigIntegerField(default=0)
+    recipients_total = models.PositiveIntegerField(default=0, help_text="Residents reachable on this channel when dispatch started")
+    batches_total = models.PositiveIntegerField(default=0)
+    batches_done = models.PositiveIntegerField(default=0)
+    delivered = models.PositiveIntegerField(default=0, help_text="Messages handed to the channel")
+
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True, help_text="Every recipient has been assigned to a batch")
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['announcement', 'channel'], name='broadcast_announcement_channel_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.announcement} via {self.channel} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentage of recipients delivered"""
+        if self.status == 'done':
+            return 100
+        if not self.recipients_total:
+            return 0
+        return min(99, int(self.delivered * 100 / self.recipients_total))
+
+class BroadcastBatch(models.Model):
+    """A contiguous range of resident IDs sent by one background job"""
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='batches')
+    first_resident_id = models.PositiveBigIntegerField()
+    last_resident_id = models.PositiveBigIntegerField()
+    done = models.BooleanField(default=False)
+    delivered = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['first_resident_id']
+        indexes = [
+            models.Index(fields=['broadcast', 'done'], name='broadcast_batch_done_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.broadcast} residents {self.first_resident_id}-{self.last_resident_id}"
+
+class ComplaintQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Every complaint for admins, otherwise the user's own"""
+        return self if user.role == 'admin' else self.filter(submitted_by=user)
+
+    def for_list(self):
+        """Rows for the complaints list: the complainant joined in, long text left out"""
+        return self.select_related('submitted_by', 'resident', 'assigned_to').defer('description')
+
+    def for_detail(self):
+        """One complaint with its whole response thread in a fixed number of queries"""
+        return self.select_related('submitted_by', 'resident', 'assigned_to').prefetch_related(
+            Prefetch(
+                'responses',
+                queryset=ComplaintResponse.objects.select_related('responded_by').order_by('created_at'),
+            )
+        )
+
 class Complaint(models.Model):
     STATUS_CHOICES = (
         ('open', 'Open'),
@@ -63,6 +153,8 @@ class Complaint(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    objects = ComplaintQuerySet.as_manager()
+
     class Meta:
         ordering = ['-submitted_at']
 
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from events.bus import ANNOUNCEMENTS, publish
+from .feed import bump_version
+from .models import Announcement
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def refresh_announcement_feeds(sender, instance, **kwargs):
+    bump_version()
+
+@receiver(post_save, sender=Announcement)
+def push_new_announcement(sender, instance, created, **kwargs):
+    if created and instance.is_active:
+        publish(ANNOUNCEMENTS, 'announcement', {
+            'id': instance.pk,
+            'title': instance.title,
+            'priority': instance.priority,
+            'url': reverse('communications:announcements'),
+        })
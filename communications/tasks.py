@@ -0,0 +1,26 @@
+"""
+Background tasks for announcement broadcasts
+"""
+from jobs.queue import task
+from .broadcast import dispatch, record_failure, send_batch
+from .models import BroadcastBatch
+
+@task('communications.dispatch_broadcast')
+def dispatch_broadcast(broadcast_id):
+    """Split a broadcast's recipients into batch jobs"""
+    try:
+        dispatch(broadcast_id)
+    except Exception as e:
+        record_failure(broadcast_id, e)
+        raise
+
+@task('communications.send_broadcast_batch')
+def send_broadcast_batch(batch_id):
+    """Deliver one batch of a broadcast"""
+    try:
+        send_batch(batch_id)
+    except Exception as e:
+        broadcast_id = BroadcastBatch.objects.filter(pk=batch_id).values_list('broadcast_id', flat=True).first()
+        if broadcast_id:
+            record_failure(broadcast_id, e)
+        raise
@@ -1,3 +1,171 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
+from django.contrib.admin.sites import site
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from jobs.queue import run_pending
+from outbox.models import OutboxMessage
+from residents.models import Household, Resident
+from utils.pagination import CursorPaginator
+from . import feed
+from .admin import AnnouncementAdmin
+from .broadcast import send_batch, start_broadcast
+from .models import Announcement, BroadcastBatch, Complaint, ComplaintResponse
 
-# Create your tests here.
+
+@override_settings(BROADCAST_BATCH_SIZE=2)
+class BroadcastTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('leader', role='admin')
+        household = Household.objects.create(household_number='HH1', street_name='Main', house_number='12', ward='Saranga')
+        # Shared addresses land in different batches of two
+        emails = ['asha@example.com', 'juma@example.com', ' ASHA@example.com', 'neema@example.com', 'juma@example.com', '']
+        for i, email in enumerate(emails):
+            Resident.objects.create(
+                household=household, first_name=f'R{i}', last_name='Test', nida_number=str(10 ** 19 + i),
+                date_of_birth=date(1990, 1, 1), gender='F', marital_status='single', email=email,
+            )
+        cls.announcement = Announcement.objects.create(title='Water cut', content='Tomorrow', created_by=cls.admin, priority='urgent')
+
+    def recipients(self):
+        return sorted(address for message in OutboxMessage.objects.all() for address in message.recipients)
+
+    def test_each_address_is_sent_once_per_broadcast(self):
+        broadcast, created = start_broadcast(self.announcement, user=self.admin)
+        self.assertTrue(created)
+        run_pending(worker='test')
+
+        broadcast.refresh_from_db()
+        self.assertEqual(broadcast.status, 'done')
+        self.assertEqual(broadcast.delivered, 3)
+        self.assertEqual(self.recipients(), ['asha@example.com', 'juma@example.com', 'neema@example.com'])
+
+    def test_rerun_batch_sends_nothing_again(self):
+        start_broadcast(self.announcement, user=self.admin)
+        run_pending(worker='test')
+        BroadcastBatch.objects.update(done=False)
+        for batch in BroadcastBatch.objects.all():
+            send_batch(batch.pk)
+        self.assertEqual(OutboxMessage.objects.count(), 3)
+
+    def test_other_broadcasts_send_again(self):
+        start_broadcast(self.announcement, user=self.admin)
+        other = Announcement.objects.create(title='Meeting', content='Friday', created_by=self.admin, priority='urgent')
+        start_broadcast(other, user=self.admin)
+        run_pending(worker='test')
+        self.assertEqual(OutboxMessage.objects.count(), 6)
+
+    def test_admin_action_counts_only_new_broadcasts(self):
+        start_broadcast(self.announcement, user=self.admin)
+        Announcement.objects.create(title='Meeting', content='Friday', created_by=self.admin, priority='low')
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        AnnouncementAdmin(Announcement, site).broadcast_email(request, Announcement.objects.all())
+        self.assertEqual([m.message for m in request._messages], ['1 announcement(s) queued for broadcast.'])
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('leader', role='admin')
+
+    def setUp(self):
+        cache.clear()
+
+    def announce(self, title, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Announcement.objects.create(title=title, content='Details', created_by=self.admin, **fields)
+
+    def first_page(self):
+        paginator = CursorPaginator(Announcement.objects.live(), 10, ordering=('-created_at',))
+        return [a.title for a in feed.get_first_page(paginator)]
+
+    def test_first_page_is_served_from_the_cache(self):
+        self.announce('Water cut')
+        self.assertEqual(self.first_page(), ['Water cut'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.first_page(), ['Water cut'])
+
+    def test_saving_an_announcement_bumps_the_version(self):
+        old = self.announce('Water cut')
+        self.first_page()
+        version = feed.current_version()
+
+        self.announce('Road works')
+        self.assertGreater(feed.current_version(), version)
+        self.assertEqual(self.first_page(), ['Road works', 'Water cut'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            old.delete()
+        self.assertEqual(self.first_page(), ['Road works'])
+
+    def test_version_is_bumped_only_on_commit(self):
+        self.announce('Water cut')
+        self.first_page()
+        version = feed.current_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Announcement.objects.create(title='Road works', content='Details', created_by=self.admin)
+        self.assertEqual(feed.current_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(feed.current_version(), version)
+
+    def test_entry_expires_with_its_first_announcement(self):
+        self.announce('Water cut', expires_at=timezone.now() + timedelta(seconds=30))
+        self.first_page()
+        key = feed._first_page_key(feed.current_version(), 10)
+        self.assertLessEqual(cache.get(key)['expires'], timezone.now().timestamp() + 31)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ComplaintTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('leader', role='admin')
+        cls.asha = User.objects.create_user('asha', role='resident')
+        cls.juma = User.objects.create_user('juma', role='resident')
+        cls.complaint = Complaint.objects.create(title='Blocked drain', description='Since Monday', category='infrastructure', submitted_by=cls.asha)
+
+    def setUp(self):
+        # The audit sink's thread writes through its own connection, which cannot see the test transaction
+        patcher = mock.patch('audit.sink.record')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, user, name, *args):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'communications:{name}', args=args), secure=True)
+        return response, len(queries)
+
+    def test_residents_list_only_their_own(self):
+        Complaint.objects.create(title='Noise', description='Late music', category='infrastructure', submitted_by=self.juma)
+        response, _ = self.get(self.asha, 'complaints')
+        self.assertEqual([c.title for c in response.context['complaints']], ['Blocked drain'])
+        response, _ = self.get(self.admin, 'complaints')
+        self.assertEqual(len(response.context['complaints']), 2)
+
+    def test_other_residents_cannot_open_a_complaint(self):
+        response, _ = self.get(self.juma, 'complaint_detail', self.complaint.pk)
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+    def test_detail_queries_do_not_grow_with_responses(self):
+        ComplaintResponse.objects.create(complaint=self.complaint, response_text='Noted', responded_by=self.admin)
+        response, queries = self.get(self.asha, 'complaint_detail', self.complaint.pk)
+        self.assertEqual(response.status_code, 200)
+
+        for responder in (self.admin, self.asha, self.admin):
+            ComplaintResponse.objects.create(complaint=self.complaint, response_text='More', responded_by=responder)
+        response, more_queries = self.get(self.asha, 'complaint_detail', self.complaint.pk)
+
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(len(response.context['responses']), 4)
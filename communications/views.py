@@ -1,16 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from .models import Announcement, Complaint, ComplaintResponse
+from .broadcast import start_broadcast
+from .feed import get_first_page
 from .forms import AnnouncementForm, ComplaintForm, ComplaintResponseForm
+from utils.pagination import CursorPaginator
 
 @login_required
 def announcements(request):
-    announcements = Announcement.objects.filter(is_active=True).order_by('-created_at')
-    paginator = Paginator(announcements, 10)
-    page_number = request.GET.get('page')
-    announcements = paginator.get_page(page_number)
+    announcements = Announcement.objects.live()
+    paginator = CursorPaginator(announcements, 10, ordering=('-created_at',))
+    cursor = request.GET.get('cursor')
+    # Most visits stop at the first page, which is cached until an announcement changes
+    announcements = paginator.get_page(cursor) if cursor else get_first_page(paginator)
     
     return render(request, 'communications/announcements.html', {'announcements': announcements})
 
@@ -27,6 +30,10 @@ def create_announcement(request):
             announcement.created_by = request.user
             announcement.save()
             messages.success(request, 'Announcement created successfully!')
+            if announcement.priority == 'urgent':
+                # Fanned out to every resident by the background workers
+                start_broadcast(announcement, user=request.user)
+                messages.info(request, 'Urgent announcement: residents are being notified by email.')
             return redirect('communications:announcements')
     else:
         form = AnnouncementForm()
@@ -53,14 +60,9 @@ def delete_announcement(request, pk):
 
 @login_required
 def complaints(request):
-    if request.user.role == 'admin':
-        complaints = Complaint.objects.all().select_related('submitted_by').order_by('-submitted_at')
-    else:
-        complaints = Complaint.objects.filter(submitted_by=request.user).order_by('-submitted_at')
-    
-    paginator = Paginator(complaints, 10)
-    page_number = request.GET.get('page')
-    complaints = paginator.get_page(page_number)
+    complaints = Complaint.objects.visible_to(request.user).for_list()
+    paginator = CursorPaginator(complaints, 10, ordering=('-submitted_at',))
+    complaints = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'communications/complaints.html', {'complaints': complaints})
 
@@ -81,14 +83,15 @@ def create_complaint(request):
 
 @login_required
 def complaint_detail(request, pk):
-    complaint = get_object_or_404(Complaint, pk=pk)
+    complaint = get_object_or_404(Complaint.objects.for_detail(), pk=pk)
     
     # Check permissions
-    if request.user.role != 'admin' and complaint.submitted_by != request.user:
+    if request.user.role != 'admin' and complaint.submitted_by_id != request.user.pk:
         messages.error(request, 'Access denied.')
         return redirect('home')
     
-    responses = complaint.responses.all().order_by('created_at')
+    # Prefetched with their authors by for_detail()
+    responses = complaint.responses.all()
     return render(request, 'communications/complaint_detail.html', {
         'complaint': complaint,
         'responses': responses
@@ -9,6 +9,7 @@ django.setup()
 
 from accounts.models import User
 from letters.models import LetterType
+from letters.templating import STANDARD_TEMPLATES
 from residents.models import Household, Resident
 from communications.models import Announcement
 
@@ -30,7 +31,7 @@ def create_initial_data():
         {
             'name': 'Introduction Letter',
             'description': 'Letter of introduction for residents',
-            'template_content': 'This is to certify that {full_name} is a registered resident...'
+            'template_content': STANDARD_TEMPLATES['Introduction Letter']
         },
         {
             'name': 'Residence Certificate',
@@ -0,0 +1,232 @@
+"""
+Publish/subscribe for live updates in Ward Resident System
+
+Application code calls ``publish(channel, kind, data)``; the event goes
+out once the current transaction commits. The server-sent events stream
+(events.views.stream) subscribes each connected browser to its own
+channel (``user:<id>``) and to ANNOUNCEMENTS; admins and clerks also get
+OCCUPANCY.
+
+The bus is chosen with settings.EVENTS_BACKEND:
+
+* ``events.bus.DatabaseBus`` (default) stores events in the Event table.
+  One poller per web process reads new rows and hands them to the
+  streams connected to that process. Any number of processes, and the job
+  workers, can publish, and the database load does not grow with the
+  number of connected clients.
+* ``events.bus.InProcessBus`` keeps everything in memory. It is a local
+  stand-in for runserver, tests and single-process deployments; events
+  published by other processes (such as run_jobs) are not seen.
+
+Either way a reconnecting client sends Last-Event-ID and gets what it
+missed, as long as it is still held: the last REPLAY_SIZE events in
+memory, or EVENTS_RETENTION_HOURS in the database. DatabaseBus deletes
+older rows itself every EVENTS_TRIM_INTERVAL seconds as it publishes; the
+hourly purge_events cron catches up when nothing is being published.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('ward_system')
+
+ANNOUNCEMENTS = 'announcements'
+OCCUPANCY = 'occupancy'
+
+# Events per subscriber waiting to be sent before the slowest clients start losing them
+QUEUE_SIZE = 100
+
+Message = namedtuple('Message', 'id channel kind data')
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """Events for a set of channels, delivered to an asyncio queue from any thread"""
+
+    def __init__(self, bus, channels):
+        self.bus = bus
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, message):
+        if message.channel in self.channels:
+            self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(f'Dropped event {message.id} for a slow live-update client')
+
+    async def get(self, timeout):
+        """The next event, or None if there was none within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def __aenter__(self):
+        self.bus.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.bus.remove(self)
+
+
+class InProcessBus:
+    # Recent events held for clients that reconnect with Last-Event-ID
+    REPLAY_SIZE = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=self.REPLAY_SIZE)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channels):
+        """Use as ``async with bus.subscribe(channels) as subscription``"""
+        return Subscription(self, channels)
+
+    def add(self, subscription):
+        with self._lock:
+            self._subscribers.add(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, channel, kind, data):
+        with self._lock:
+            message = Message(next(self._ids), channel, kind, data)
+            self._recent.append(message)
+        self.deliver(message)
+
+    def deliver(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    async def missed(self, channels, last_id):
+        """Events on ``channels`` after ``last_id`` that are still held"""
+        with self._lock:
+            return [m for m in self._recent if m.id > last_id and m.channel in channels]
+
+
+class DatabaseBus(InProcessBus):
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+        self._last_id = None
+        self._trimmed_at = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'EVENTS_POLL_INTERVAL', 1.0)
+
+    def publish(self, channel, kind, data):
+        from .models import Event
+
+        Event.objects.create(channel=channel, kind=kind, data=data)
+        self._trim()
+
+    def _trim(self):
+        """Delete expired events, at most once per EVENTS_TRIM_INTERVAL in each process"""
+        now = time.monotonic()
+        if self._trimmed_at is not None and now - self._trimmed_at < getattr(settings, 'EVENTS_TRIM_INTERVAL', 600):
+            return
+        self._trimmed_at = now
+        purge_events(getattr(settings, 'EVENTS_RETENTION_HOURS', 24))
+
+    def add(self, subscription):
+        super().add(subscription)
+        poller = self._poller
+        if poller is None or poller.done() or poller.get_loop() is not subscription.loop:
+            self._poller = subscription.loop.create_task(self._poll())
+
+    async def _poll(self):
+        """Read new events for everyone connected to this process until nobody is"""
+        # Start from now; anything older reaches reconnecting clients through missed()
+        self._last_id = await sync_to_async(self._latest_id)()
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                rows = await sync_to_async(self._fetch)()
+            except Exception:
+                logger.warning('Live update poll failed', exc_info=True)
+                continue
+            for row in rows:
+                self.deliver(Message(*row))
+                self._last_id = row[0]
+
+    def _fetch(self):
+        from .models import Event
+
+        # The poller outlives any request; honour CONN_MAX_AGE and recover from dropped connections
+        close_old_connections()
+        try:
+            return list(
+                Event.objects.filter(pk__gt=self._last_id).values_list('pk', 'channel', 'kind', 'data')[:500]
+            )
+        except Exception:
+            close_old_connections()
+            raise
+
+    def _latest_id(self):
+        from .models import Event
+
+        return Event.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    async def missed(self, channels, last_id):
+        from .models import Event
+
+        # Only up to where the poller has got, so nothing is sent twice
+        ceiling = self._last_id if self._last_id is not None else await sync_to_async(self._latest_id)()
+        rows = await sync_to_async(list)(
+            Event.objects.filter(pk__gt=last_id, pk__lte=ceiling, channel__in=channels)
+            .values_list('pk', 'channel', 'kind', 'data')[:QUEUE_SIZE]
+        )
+        return [Message(*row) for row in rows]
+
+
+_bus = None
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        _bus = import_string(getattr(settings, 'EVENTS_BACKEND', 'events.bus.DatabaseBus'))()
+    return _bus
+
+
+def publish(channel, kind, data):
+    """Send an event to ``channel`` subscribers once the current transaction commits"""
+    def send():
+        try:
+            get_bus().publish(channel, kind, data)
+        except Exception:
+            # Live updates are a convenience; never fail the request over one
+            logger.warning(f'Could not publish {kind} event to {channel}', exc_info=True)
+    transaction.on_commit(send)
+
+
+def purge_events(older_than_hours):
+    """Delete stored events older than the given number of hours"""
+    from .models import Event
+
+    cutoff = timezone.now() - timedelta(hours=older_than_hours)
+    deleted, _ = Event.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,21 @@
+"""
+Management command to delete old live-update events
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from events.bus import purge_events
+
+class Command(BaseCommand):
+    help = 'Delete stored live-update events older than EVENTS_RETENTION_HOURS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=getattr(settings, 'EVENTS_RETENTION_HOURS', 24),
+            help='Delete events older than this many hours',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_events(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} event(s)'))
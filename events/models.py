@@ -0,0 +1,14 @@
+from django.db import models
+
+class Event(models.Model):
+    """A published event, kept briefly so every web process can pick it up and clients can resume"""
+    channel = models.CharField(max_length=100)
+    kind = models.CharField(max_length=50)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['pk']
+
+    def __str__(self):
+        return f"{self.kind} on {self.channel} (#{self.pk})"
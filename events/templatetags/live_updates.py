@@ -0,0 +1,13 @@
+from django import template
+from django.conf import settings
+from django.urls import reverse
+
+register = template.Library()
+
+@register.simple_tag
+def event_stream_url():
+    """
+    Where browsers open the live-update stream: EVENTS_STREAM_URL when the
+    ASGI events process has its own host, otherwise this site's own path.
+    """
+    return getattr(settings, 'EVENTS_STREAM_URL', '') or reverse('event_stream')
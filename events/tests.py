@@ -0,0 +1,48 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .bus import DatabaseBus
+from .models import Event
+
+
+class TrimTests(TestCase):
+    def age(self, event, hours):
+        Event.objects.filter(pk=event.pk).update(created_at=timezone.now() - timedelta(hours=hours))
+
+    @override_settings(EVENTS_RETENTION_HOURS=24)
+    def test_publish_deletes_expired_events(self):
+        old = Event.objects.create(channel='announcements', kind='announcement')
+        recent = Event.objects.create(channel='announcements', kind='announcement')
+        self.age(old, 25)
+        self.age(recent, 1)
+
+        DatabaseBus().publish('announcements', 'announcement', {})
+
+        self.assertFalse(Event.objects.filter(pk=old.pk).exists())
+        self.assertTrue(Event.objects.filter(pk=recent.pk).exists())
+        self.assertEqual(Event.objects.count(), 2)
+
+    @override_settings(EVENTS_RETENTION_HOURS=24, EVENTS_TRIM_INTERVAL=600)
+    def test_trims_at_most_once_per_interval(self):
+        bus = DatabaseBus()
+        bus.publish('announcements', 'announcement', {})
+        old = Event.objects.create(channel='announcements', kind='announcement')
+        self.age(old, 25)
+
+        bus.publish('announcements', 'announcement', {})
+
+        self.assertTrue(Event.objects.filter(pk=old.pk).exists())
+
+
+class WsgiStreamTests(TestCase):
+    def test_answers_204_without_an_events_host(self):
+        with self.settings(EVENTS_STREAM_URL=''):
+            response = self.client.get(reverse('event_stream'), secure=True)
+        self.assertEqual(response.status_code, 204)
+
+    def test_redirects_to_the_events_host(self):
+        url = 'https://events.example.org/events/stream/'
+        with self.settings(EVENTS_STREAM_URL=url):
+            response = self.client.get(reverse('event_stream'), secure=True)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
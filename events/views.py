@@ -0,0 +1,94 @@
+"""
+Server-sent events stream for live letter-status, announcement and occupancy updates
+
+Only this view runs on the ASGI server (the "events" process in the
+Procfile); each open stream costs a coroutine, not a worker thread. The
+rest of the site stays on WSGI, where Django streams exports, zips and
+downloads chunk by chunk (under ASGI, Django 4.2 reads a synchronous
+streaming response fully into memory first). Live events are served
+only by that process. A request that reaches the WSGI site instead is
+redirected to settings.EVENTS_STREAM_URL when the events process has its
+own host; otherwise it gets 204, which tells EventSource not to retry,
+and pages keep working without live updates.
+
+When the events process has its own host (settings.EVENTS_STREAM_URL),
+pages open the stream cross-origin with credentials; origins listed in
+EVENTS_ALLOWED_ORIGINS get the CORS headers that allows.
+"""
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from .bus import ANNOUNCEMENTS, OCCUPANCY, get_bus, user_channel
+
+# Seconds between comment lines that keep proxies from closing an idle stream
+HEARTBEAT = 15
+
+# Milliseconds the browser waits before reconnecting
+RETRY = 5000
+
+
+def format_event(message):
+    return f'id: {message.id}\nevent: {message.kind}\ndata: {json.dumps(message.data)}\n\n'
+
+
+# Roles that follow the live visitor count
+STAFF_ROLES = ('admin', 'clerk')
+
+
+def _user(request):
+    """(id, role) of the signed-in user, or None"""
+    return (request.user.pk, request.user.role) if request.user.is_authenticated else None
+
+
+def allow_origin(request, response):
+    """Let the site's own pages read the stream when it is served from another host"""
+    origin = request.headers.get('Origin')
+    if origin and origin in getattr(settings, 'EVENTS_ALLOWED_ORIGINS', ()):
+        response['Access-Control-Allow-Origin'] = origin
+        response['Access-Control-Allow-Credentials'] = 'true'
+        response['Vary'] = 'Origin'
+    return response
+
+
+async def stream(request):
+    if not isinstance(request, ASGIRequest):
+        # The WSGI site cannot hold streams open; send the browser to the events process if it can be reached
+        url = getattr(settings, 'EVENTS_STREAM_URL', '')
+        return allow_origin(request, HttpResponseRedirect(url) if url else HttpResponse(status=204))
+    user = await sync_to_async(_user)(request)
+    if user is None:
+        return allow_origin(request, HttpResponse(status=204))
+
+    user_id, role = user
+    channels = {user_channel(user_id), ANNOUNCEMENTS}
+    if role in STAFF_ROLES:
+        channels.add(OCCUPANCY)
+    last_id = request.headers.get('Last-Event-ID', '')
+    last_id = int(last_id) if last_id.isdigit() else None
+    # Streams end after a while and the browser reconnects, so a deploy or a lost client never pins one for long
+    lifetime = getattr(settings, 'EVENTS_STREAM_TIMEOUT', 300)
+
+    async def events():
+        bus = get_bus()
+        async with bus.subscribe(channels) as subscription:
+            yield f'retry: {RETRY}\n\n'
+            sent = last_id or 0
+            if last_id is not None:
+                for message in await bus.missed(channels, last_id):
+                    sent = message.id
+                    yield format_event(message)
+            deadline = time.monotonic() + lifetime
+            while time.monotonic() < deadline:
+                message = await subscription.get(min(HEARTBEAT, deadline - time.monotonic()))
+                if message is None:
+                    yield ': keepalive\n\n'
+                elif message.id > sent:
+                    yield format_event(message)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx-style proxies from buffering the stream
+    return allow_origin(request, response)
@@ -0,0 +1,21 @@
+"""
+Management command to delete finished background jobs
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from jobs.queue import purge_finished
+
+class Command(BaseCommand):
+    help = 'Delete done and failed jobs older than JOBS_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'JOBS_RETENTION_DAYS', 7),
+            help='Delete jobs that finished more than this many days ago',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_finished(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} job(s)'))
@@ -0,0 +1,52 @@
+"""
+Management command that runs queued background jobs
+"""
+import time
+from django.core.management.base import BaseCommand
+from jobs.queue import requeue_stale, run_pending, worker_id
+import logging
+
+logger = logging.getLogger('ward_system')
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (letter rendering, notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling for new jobs',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Requeue jobs that have been running longer than this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_id()
+        requeued = requeue_stale(options['stale_after'])
+        if requeued:
+            logger.warning(f'Requeued {requeued} stale job(s)')
+
+        self.stdout.write(f'Job worker {worker} started')
+        try:
+            while True:
+                processed = run_pending(worker=worker)
+                if processed:
+                    self.stdout.write(f'Processed {processed} job(s)')
+                elif options['burst']:
+                    break
+                else:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Job worker {worker} stopped'))
@@ -0,0 +1,130 @@
+"""
+Database-backed background job queue for Ward Resident System
+
+Tasks are plain functions registered with the ``task`` decorator in an
+app's ``tasks.py``. Web views call ``enqueue`` and return immediately; the
+``run_jobs`` management command claims and executes queued jobs.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger('ward_system')
+
+_registry = {}
+
+def task(name):
+    """Register a function as a background task under the given name"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+def enqueue(name, delay=None, unique=False, **payload):
+    """
+    Queue a task for the worker and return the Job.
+
+    Args:
+        name (str): Registered task name
+        delay (int): Optional number of seconds to wait before running
+        unique (bool): Reuse a queued or running job with the same payload
+    """
+    if name not in _registry:
+        raise KeyError(f'Unknown background task: {name}')
+
+    if unique:
+        existing = Job.objects.filter(
+            task=name,
+            status__in=['queued', 'running'],
+            **{f'payload__{key}': value for key, value in payload.items()}
+        ).first()
+        if existing:
+            return existing
+
+    run_after = timezone.now() + timedelta(seconds=delay or 0)
+    job = Job.objects.create(task=name, payload=payload, run_after=run_after)
+
+    # Development and tests can run jobs on the request thread instead
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        transaction.on_commit(lambda: run_job(job))
+
+    return job
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def claim_next(worker):
+    """
+    Atomically claim the oldest due job.
+
+    Uses a conditional UPDATE rather than SELECT ... FOR UPDATE so the same
+    code works on SQLite in development and PostgreSQL in production.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_after__lte=now).values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running',
+            locked_by=worker,
+            started_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+def run_job(job):
+    """Execute a claimed job and record the outcome, retrying with backoff"""
+    func = _registry.get(job.task)
+    job.attempts += 1
+
+    try:
+        if func is None:
+            raise KeyError(f'Unknown background task: {job.task}')
+        func(**job.payload)
+    except Exception as e:
+        job.last_error = str(e)
+        if job.attempts < job.max_attempts:
+            # Exponential backoff: 30s, 60s, 120s, ...
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** (job.attempts - 1))
+            logger.warning(f'Job {job} failed (attempt {job.attempts}), retrying: {e}')
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error(f'Job {job} failed permanently: {e}', exc_info=True)
+    else:
+        job.status = 'done'
+        job.last_error = ''
+        job.finished_at = timezone.now()
+
+    job.locked_by = ''
+    job.save(update_fields=['status', 'attempts', 'run_after', 'last_error', 'locked_by', 'finished_at'])
+    return job.status == 'done'
+
+def requeue_stale(older_than):
+    """Return jobs left running by a crashed worker to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return Job.objects.filter(status='running', started_at__lt=cutoff).update(status='queued', locked_by='')
+
+def purge_finished(older_than_days):
+    """Delete done and failed jobs that finished more than the given number of days ago"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = Job.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff).delete()
+    return deleted
+
+def run_pending(limit=None, worker=None):
+    """Run due jobs until the queue is empty or ``limit`` jobs have run"""
+    worker = worker or worker_id()
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next(worker)
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,174 @@
+from datetime import timedelta
+from unittest import mock
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import Job
+from .queue import claim_next, enqueue, purge_finished, run_job, run_pending, task
+
+calls = []
+
+@task('tests.record')
+def record(**payload):
+    calls.append(payload)
+
+@task('tests.fail')
+def fail(**payload):
+    raise RuntimeError('boom')
+
+
+class QueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+
+class ClaimTests(QueueTestCase):
+    def test_claims_oldest_due_job(self):
+        later = enqueue('tests.record', n=2)
+        Job.objects.filter(pk=later.pk).update(run_after=timezone.now() - timedelta(seconds=5))
+        earlier = enqueue('tests.record', n=1)
+        Job.objects.filter(pk=earlier.pk).update(run_after=timezone.now() - timedelta(seconds=10))
+
+        job = claim_next('worker-a')
+        self.assertEqual(job.pk, earlier.pk)
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.locked_by, 'worker-a')
+        self.assertIsNotNone(job.started_at)
+
+    def test_job_is_claimed_once(self):
+        enqueue('tests.record', n=1)
+        self.assertIsNotNone(claim_next('worker-a'))
+        self.assertIsNone(claim_next('worker-b'))
+
+    def test_workers_claim_different_jobs(self):
+        enqueue('tests.record', n=1)
+        enqueue('tests.record', n=2)
+        first = claim_next('worker-a')
+        second = claim_next('worker-b')
+        self.assertNotEqual(first.pk, second.pk)
+
+    def test_job_taken_between_select_and_update_is_skipped(self):
+        taken = enqueue('tests.record', n=1)
+        free = enqueue('tests.record', n=2)
+        update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            # Another worker claims the first candidate just before this worker's conditional UPDATE
+            if not raced:
+                raced.append(True)
+                update(Job.objects.filter(pk=taken.pk), status='running', locked_by='worker-b')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            job = claim_next('worker-a')
+        self.assertEqual(job.pk, free.pk)
+        self.assertEqual(Job.objects.get(pk=taken.pk).locked_by, 'worker-b')
+
+    def test_future_job_is_not_claimed(self):
+        enqueue('tests.record', delay=60, n=1)
+        self.assertIsNone(claim_next('worker-a'))
+
+
+class RunTests(QueueTestCase):
+    def test_success(self):
+        job = enqueue('tests.record', n=1)
+        self.assertEqual(run_pending(worker='worker-a'), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, '')
+        self.assertEqual(calls, [{'n': 1}])
+
+    def test_failure_retries_with_exponential_backoff(self):
+        job = enqueue('tests.fail')
+        for attempt, backoff in ((1, 30), (2, 60)):
+            started = timezone.now()
+            self.assertFalse(run_job(job))
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'queued')
+            self.assertEqual(job.attempts, attempt)
+            self.assertEqual(job.last_error, 'boom')
+            delay = (job.run_after - started).total_seconds()
+            self.assertGreaterEqual(delay, backoff)
+            self.assertLess(delay, backoff + 5)
+
+    def test_failure_after_max_attempts_is_permanent(self):
+        job = enqueue('tests.fail')
+        for _ in range(job.max_attempts):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_unknown_task_fails_the_job(self):
+        job = Job.objects.create(task='tests.missing', max_attempts=1)
+        self.assertFalse(run_job(job))
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Unknown background task', job.last_error)
+
+    def test_enqueue_rejects_unknown_task(self):
+        with self.assertRaises(KeyError):
+            enqueue('tests.missing')
+
+
+class UniqueTests(QueueTestCase):
+    def test_same_payload_reuses_queued_job(self):
+        first = enqueue('tests.record', unique=True, n=1)
+        self.assertEqual(enqueue('tests.record', unique=True, n=1).pk, first.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_running_job_is_reused(self):
+        first = enqueue('tests.record', unique=True, n=1)
+        claim_next('worker-a')
+        self.assertEqual(enqueue('tests.record', unique=True, n=1).pk, first.pk)
+
+    def test_different_payload_is_queued(self):
+        first = enqueue('tests.record', unique=True, n=1)
+        self.assertNotEqual(enqueue('tests.record', unique=True, n=2).pk, first.pk)
+
+    def test_finished_job_is_not_reused(self):
+        first = enqueue('tests.record', unique=True, n=1)
+        run_pending(worker='worker-a')
+        self.assertNotEqual(enqueue('tests.record', unique=True, n=1).pk, first.pk)
+
+    def test_without_unique_duplicates_are_queued(self):
+        enqueue('tests.record', n=1)
+        enqueue('tests.record', n=1)
+        self.assertEqual(Job.objects.count(), 2)
+
+
+class InlineTests(QueueTestCase):
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_inline_job_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('tests.record', n=1)
+            self.assertEqual(calls, [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(calls, [{'n': 1}])
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_queued_job_waits_for_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('tests.record', n=1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(calls, [])
+
+
+class PurgeTests(QueueTestCase):
+    def test_only_old_finished_jobs_are_deleted(self):
+        old = timezone.now() - timedelta(days=10)
+        done = enqueue('tests.record', n=1)
+        failed = enqueue('tests.record', n=2)
+        recent = enqueue('tests.record', n=3)
+        queued = enqueue('tests.record', n=4)
+        Job.objects.filter(pk=done.pk).update(status='done', finished_at=old)
+        Job.objects.filter(pk=failed.pk).update(status='failed', finished_at=old)
+        Job.objects.filter(pk=recent.pk).update(status='done', finished_at=timezone.now())
+        Job.objects.filter(pk=queued.pk).update(created_at=old)
+
+        self.assertEqual(purge_finished(7), 2)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {recent.pk, queued.pk})
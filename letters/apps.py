@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LettersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'letters'
+
+    def ready(self):
+        from . import signals  # noqa: F401
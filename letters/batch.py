@@ -0,0 +1,200 @@
+"""
+Bulk export of letter PDFs as a ZIP archive or a merged PDF
+
+Small selections are written on the request thread; larger ones by the
+letters.batch_export job, which stores the file under EXPORT_DIR for the
+admin to download. Either way the approved requests in the export are
+marked completed only once the file has been written.
+"""
+import io
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from utils.counters import invalidate
+from .live import publish_letter_status
+from .models import GeneratedLetter, LetterRequest
+from .pdf import build_letter_document, download_filename, draw_letter, is_current, letter_fingerprint, render_letter_pdf
+
+EXPORT_DIR = 'letter_exports'
+
+CONTENT_TYPES = {
+    'zip': 'application/zip',
+    'pdf': 'application/pdf',
+}
+
+
+def inline_limit():
+    """Most letters exported on the request thread; larger selections go to a background job"""
+    return getattr(settings, 'LETTER_EXPORT_INLINE_LIMIT', 10)
+
+
+def default_workers():
+    return getattr(settings, 'LETTER_EXPORT_WORKERS', None) or min(4, os.cpu_count() or 1)
+
+
+def _stored_pdf(letter_request, document):
+    """Bytes of an up-to-date stored PDF for the request, or None"""
+    try:
+        generated = letter_request.generatedletter
+    except GeneratedLetter.DoesNotExist:
+        return None
+    if not is_current(generated, letter_fingerprint(document)):
+        return None
+    with generated.pdf_file.open('rb') as f:
+        return f.read()
+
+
+def export_entries(letter_requests):
+    """(filename, document, stored_pdf_or_None) for each letter request"""
+    for letter_request in letter_requests:
+        document = build_letter_document(letter_request)
+        filename = f'{letter_request.id:06d}_{download_filename(letter_request)}'
+        yield filename, document, _stored_pdf(letter_request, document)
+
+
+def render_pdfs(entries, workers=None):
+    """
+    Yield (filename, pdf_bytes) for each export entry, in order.
+
+    Entries without stored bytes are rendered in a process pool. At most
+    ``workers * 2`` letters are in flight at once, so memory stays bounded
+    no matter how many letters are exported.
+    """
+    workers = workers or default_workers()
+
+    if workers <= 1:
+        for filename, document, data in entries:
+            yield filename, data if data is not None else render_letter_pdf(document)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        for filename, document, data in entries:
+            future = pool.submit(render_letter_pdf, document) if data is None else None
+            pending.append((filename, data, future))
+            if len(pending) >= workers * 2:
+                filename, data, future = pending.popleft()
+                yield filename, data if future is None else future.result()
+        while pending:
+            filename, data, future = pending.popleft()
+            yield filename, data if future is None else future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_letter_pdfs(letter_requests, workers=None):
+    """Yield (filename, pdf_bytes) for each letter request, reusing stored PDFs"""
+    return render_pdfs(export_entries(letter_requests), workers)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable buffer that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files):
+    """
+    Yield a ZIP archive chunk by chunk from (filename, bytes) pairs.
+
+    The sink is unseekable, so zipfile writes data descriptors after each
+    member and only the current member is ever buffered.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, data in files:
+            archive.writestr(filename, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def write_merged_pdf(letter_requests, fileobj):
+    """
+    Draw every letter as consecutive pages of one PDF written to ``fileobj``.
+
+    Concatenating separately rendered PDFs needs a PDF parser that is not
+    among our requirements, so the merged document is drawn on a single
+    canvas in this process. Use the ZIP export for parallel rendering.
+    """
+    p = canvas.Canvas(fileobj, pagesize=letter)
+    for letter_request in letter_requests:
+        draw_letter(p, build_letter_document(letter_request))
+    p.save()
+
+
+def exportable(ids):
+    """Approved and completed letter requests among ``ids``, with what rendering needs"""
+    return LetterRequest.objects.filter(
+        pk__in=ids,
+        status__in=['approved', 'completed'],
+    ).select_related('resident__household', 'letter_type', 'generatedletter').order_by('pk')
+
+
+def write_export(letter_requests, export_format, fileobj, workers=None):
+    """Write the letters as a ZIP archive or, for 'pdf', one merged PDF to ``fileobj``"""
+    if export_format == 'pdf':
+        write_merged_pdf(letter_requests, fileobj)
+        return
+    for chunk in stream_zip(iter_letter_pdfs(letter_requests, workers)):
+        fileobj.write(chunk)
+
+
+def mark_issued(letter_requests):
+    """
+    Mark the approved requests among ``letter_requests`` completed, as a
+    download would, and tell each requester; returns how many changed
+    """
+    issued = list(letter_requests.filter(status='approved'))
+    if not issued:
+        return 0
+    now = timezone.now()
+    LetterRequest.objects.filter(pk__in=[r.pk for r in issued], status='approved').update(
+        status='completed', completion_date=now,
+    )
+    # QuerySet.update() sends no signals
+    invalidate('letters', user_ids={r.requested_by_id for r in issued})
+    for letter_request in issued:
+        letter_request.status = 'completed'
+        letter_request.completion_date = now
+        publish_letter_status(letter_request)
+    return len(issued)
+
+
+def export_name(export_id, export_format):
+    """Storage name of a background export"""
+    return f'{EXPORT_DIR}/{export_id}.{export_format}'
+
+
+def prune_exports(older_than=timedelta(days=1)):
+    """Delete stored background exports older than ``older_than``"""
+    if not default_storage.exists(EXPORT_DIR):
+        return 0
+    cutoff = timezone.now() - older_than
+    deleted = 0
+    for name in default_storage.listdir(EXPORT_DIR)[1]:
+        path = f'{EXPORT_DIR}/{name}'
+        if default_storage.get_modified_time(path) < cutoff:
+            default_storage.delete(path)
+            deleted += 1
+    return deleted
@@ -0,0 +1,33 @@
+"""
+Register export columns for letter requests
+"""
+from .models import LetterRequest
+
+LETTER_REQUEST_COLUMNS = (
+    ('Request ID', 'pk'),
+    ('Request Date', 'request_date'),
+    ('Letter Type', 'letter_type.name'),
+    ('Resident', 'resident.full_name'),
+    ('NIDA Number', 'resident.nida_number'),
+    ('Purpose', 'purpose'),
+    ('Priority', lambda r: r.get_priority_display()),
+    ('Status', lambda r: r.get_status_display()),
+    ('Requested By', 'requested_by.username'),
+    ('Approved By', 'approved_by.username'),
+    ('Approval Date', 'approval_date'),
+    ('Completion Date', 'completion_date'),
+    ('Rejection Reason', 'rejection_reason'),
+    ('Admin Notes', 'admin_notes'),
+)
+
+def letter_request_queryset(status=None):
+    """
+    Letter requests as listed on the all-requests page, or on the pending
+    page when ``status`` is 'pending'. Unknown statuses are ignored.
+    """
+    requests = LetterRequest.objects.select_related(
+        'resident', 'letter_type', 'requested_by', 'approved_by'
+    ).order_by('-request_date', '-pk')
+    if status in dict(LetterRequest.STATUS_CHOICES):
+        requests = requests.filter(status=status)
+    return requests
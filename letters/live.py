@@ -0,0 +1,27 @@
+"""
+Live letter-status updates pushed to the requesting resident's browser
+"""
+from django.urls import reverse
+from events.bus import publish, user_channel
+
+MESSAGES = {
+    'approved': 'Your {letter_type} request has been approved.',
+    'rejected': 'Your {letter_type} request has been rejected.',
+    'completed': 'Your {letter_type} has been issued.',
+    'ready': 'Your {letter_type} is ready to download.',
+}
+
+
+def publish_letter_status(letter_request, ready=False):
+    """Tell the requester their letter request changed status, or that its PDF is ready"""
+    letter_type = letter_request.letter_type.name
+    message = MESSAGES['ready' if ready else letter_request.status]
+    publish(user_channel(letter_request.requested_by_id), 'letter_status', {
+        'id': letter_request.pk,
+        'status': letter_request.status,
+        'status_display': letter_request.get_status_display(),
+        'ready': ready,
+        'message': message.format(letter_type=letter_type),
+        'url': reverse('letters:detail', args=[letter_request.pk]),
+        'download_url': reverse('letters:generate_pdf', args=[letter_request.pk]) if ready else '',
+    })
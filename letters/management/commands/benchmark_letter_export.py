@@ -0,0 +1,79 @@
+"""
+Management command to measure bulk letter export throughput per worker count
+"""
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from letters.batch import render_pdfs, stream_zip
+from letters.pdf import build_letter_document
+from letters.models import LetterRequest, LetterType
+from residents.models import Household, Resident
+
+class Command(BaseCommand):
+    help = 'Benchmark ZIP export of letter PDFs across process pool sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--letters',
+            type=int,
+            default=200,
+            help='Number of synthetic letters to export per run',
+        )
+        parser.add_argument(
+            '--workers',
+            default='1,2,4,8',
+            help='Comma separated worker counts to benchmark',
+        )
+
+    def build_documents(self, count):
+        """Letter documents built from unsaved models, so the database is never touched"""
+        letter_type = LetterType(name='Introduction Letter', template_content='')
+        approved_at = timezone.now()
+        documents = []
+        for i in range(1, count + 1):
+            household = Household(
+                household_number=f'HH{i:06d}',
+                street_name='Benchmark Street',
+                house_number=str(i),
+                ward='Saranga',
+            )
+            resident = Resident(
+                household=household,
+                first_name='Resident',
+                last_name=f'Number{i}',
+                nida_number=f'{i:020d}',
+                date_of_birth=date(1990, 1, 1),
+                phone_number='0712345678',
+            )
+            letter_request = LetterRequest(
+                id=i,
+                resident=resident,
+                letter_type=letter_type,
+                purpose='employment verification',
+                status='approved',
+                approval_date=approved_at,
+            )
+            documents.append(build_letter_document(letter_request))
+        return documents
+
+    def handle(self, *args, **options):
+        count = options['letters']
+        worker_counts = [int(w) for w in options['workers'].split(',') if w.strip()]
+        documents = self.build_documents(count)
+
+        self.stdout.write(f'Exporting {count} letters as a ZIP archive')
+        self.stdout.write(f'{"workers":>8} {"seconds":>10} {"letters/s":>10} {"MB":>8} {"speedup":>8}')
+
+        baseline = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            entries = ((f'{i:06d}.pdf', document, None) for i, document in enumerate(documents, 1))
+            size = sum(len(chunk) for chunk in stream_zip(render_pdfs(entries, workers=workers)))
+            elapsed = time.perf_counter() - start
+
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f'{workers:>8} {elapsed:>10.2f} {count / elapsed:>10.1f} '
+                f'{size / 1024 / 1024:>8.2f} {baseline / elapsed:>7.2f}x'
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('letters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedletter',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='Hash of the letter inputs the stored PDF was rendered from', max_length=64),
+        ),
+    ]
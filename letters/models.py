@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from residents.models import Resident
 
 class LetterType(models.Model):
@@ -12,6 +13,13 @@ class LetterType(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        from .templating import TemplateError, compile_template
+        try:
+            compile_template(self.template_content or '')
+        except TemplateError as e:
+            raise ValidationError({'template_content': str(e)})
+
 class LetterRequest(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -63,6 +71,7 @@ class GeneratedLetter(models.Model):
     letter_request = models.OneToOneField(LetterRequest, on_delete=models.CASCADE)
     content = models.TextField()
     pdf_file = models.FileField(upload_to='letters_pdf/')
+    content_hash = models.CharField(max_length=64, blank=True, help_text="Hash of the letter inputs the stored PDF was rendered from")
     generated_at = models.DateTimeField(auto_now_add=True)
     generated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     
@@ -0,0 +1,210 @@
+"""
+PDF rendering and caching for approved letter requests
+"""
+import hashlib
+import io
+import logging
+import re
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.utils import timezone
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from .models import GeneratedLetter
+from .templating import get_compiled_template, letter_context
+
+logger = logging.getLogger('ward_system')
+
+# Bump when the drawing code below changes so cached PDFs are re-rendered
+LAYOUT_VERSION = '2'
+
+BODY_FONT = "Helvetica"
+BODY_SIZE = 11
+BODY_WIDTH = letter[0] - 2*inch
+LINE_HEIGHT = 20
+
+NUMBERED_PARAGRAPH = re.compile(r'^\d+\.\s')
+
+CONTACT_INFO = "Tel: +255 763 587 710 | Email: sarangakata@info.go.tz"
+
+
+def wrap_paragraphs(paragraphs, font=BODY_FONT, size=BODY_SIZE, max_width=BODY_WIDTH):
+    """
+    Break rendered paragraphs into lines that fit the body width.
+
+    Numbered paragraphs ("2. ...") get a hanging indent, and paragraphs are
+    separated by a blank line.
+    """
+    lines = []
+    for paragraph in paragraphs:
+        if lines:
+            lines.append("")
+        indent = "   " if NUMBERED_PARAGRAPH.match(paragraph) else ""
+        wrapped = simpleSplit(paragraph, font, size, max_width)
+        lines.append(wrapped[0] if wrapped else "")
+        if len(wrapped) > 1:
+            rest = simpleSplit(" ".join(wrapped[1:]), font, size, max_width - stringWidth(indent, font, size))
+            lines.extend(indent + line for line in rest)
+    return lines
+
+
+def build_letter_document(letter_request):
+    """Collect every piece of text that ends up on the rendered letter"""
+    household = letter_request.resident.household
+    issued_on = letter_request.approval_date or timezone.now()
+    reference_number = f"WRD/{letter_request.id:06d}/{issued_on.year}"
+    date = issued_on.strftime('%d %B %Y')
+
+    context = letter_context(letter_request, reference_number, date)
+    body = get_compiled_template(letter_request.letter_type).render(context)
+
+    lines = [
+        "TO WHOM IT MAY CONCERN",
+        "",
+        "Dear Sir/Madam,",
+        "",
+        *wrap_paragraphs(body),
+        "",
+        "",
+        "________________________",
+        "Ward Executive Officer",
+        f"For {household.ward}",
+        "RESIDENT CONTACTS:",
+        f"Phone Number: {context['phone_number'] or 'Not provided'}",
+        f"Current Address: {context['address']}",
+    ]
+
+    return {
+        'ward_info': f"Ward: {household.ward}",
+        'reference': f"Reference No.: {reference_number}",
+        'date': f"Date: {date}",
+        'subject': f"RE: {letter_request.letter_type.name.upper()}",
+        'lines': lines,
+    }
+
+
+def letter_fingerprint(document):
+    """Hash of the letter inputs; changes whenever the rendered output would"""
+    digest = hashlib.sha256(LAYOUT_VERSION.encode())
+    for key in ('ward_info', 'reference', 'date', 'subject'):
+        digest.update(b'\x00' + document[key].encode())
+    for line in document['lines']:
+        digest.update(b'\x01' + line.encode())
+    return digest.hexdigest()
+
+
+def draw_letter(p, document):
+    """Draw one letter onto the current page of a ReportLab canvas"""
+    width, height = letter
+
+    # Official Letterhead
+    p.setFont("Helvetica-Bold", 18)
+    title = "WARD ADMINISTRATION OFFICE"
+    title_width = p.stringWidth(title, "Helvetica-Bold", 18)
+    p.drawString((width - title_width) / 2, height - 0.8*inch, title)
+
+    # Ward details
+    p.setFont("Helvetica", 10)
+    ward_width = p.stringWidth(document['ward_info'], "Helvetica", 10)
+    p.drawString((width - ward_width) / 2, height - inch, document['ward_info'])
+
+    # Contact information
+    contact_width = p.stringWidth(CONTACT_INFO, "Helvetica", 10)
+    p.drawString((width - contact_width) / 2, height - 1.2*inch, CONTACT_INFO)
+
+    # Reference number and date (right aligned)
+    p.setFont("Helvetica", 11)
+    p.drawRightString(width - inch, height - 1.8*inch, document['reference'])
+    p.drawRightString(width - inch, height - 2*inch, document['date'])
+
+    # Subject line
+    y_position = height - 2.5*inch
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(inch, y_position, document['subject'])
+
+    # Main content starts here, continuing on new pages for long templates
+    y_position -= 0.5*inch
+    p.setFont(BODY_FONT, BODY_SIZE)
+    for line in document['lines']:
+        if y_position < inch:
+            p.showPage()
+            p.setFont(BODY_FONT, BODY_SIZE)
+            y_position = height - inch
+        p.drawString(inch, y_position, line)
+        y_position -= LINE_HEIGHT
+
+    p.showPage()
+
+
+def render_letter_pdf(document):
+    """Render a single letter and return the PDF bytes"""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    draw_letter(p, document)
+    p.save()
+    return buffer.getvalue()
+
+
+def download_filename(letter_request):
+    """Attachment filename based on the resident's full name"""
+    safe_name = letter_request.resident.full_name.replace(' ', '_').replace('.', '')
+    return f'{safe_name}_Introduction_Letter.pdf'
+
+
+def is_current(generated, content_hash):
+    """Whether a stored GeneratedLetter was rendered from the given inputs"""
+    return (
+        generated is not None
+        and generated.content_hash == content_hash
+        and bool(generated.pdf_file)
+        and generated.pdf_file.storage.exists(generated.pdf_file.name)
+    )
+
+
+def get_current_letter(letter_request):
+    """Return the stored GeneratedLetter if it matches the current inputs, else None"""
+    content_hash = letter_fingerprint(build_letter_document(letter_request))
+    generated = GeneratedLetter.objects.filter(letter_request=letter_request).first()
+    return generated if is_current(generated, content_hash) else None
+
+
+def get_or_render_letter(letter_request, user):
+    """
+    Return the GeneratedLetter for a request, rendering the PDF only when
+    no stored copy exists or the letter inputs changed since it was stored.
+    """
+    document = build_letter_document(letter_request)
+    content_hash = letter_fingerprint(document)
+
+    generated = GeneratedLetter.objects.filter(letter_request=letter_request).first()
+    if is_current(generated, content_hash):
+        return generated
+
+    pdf_bytes = render_letter_pdf(document)
+
+    if generated is None:
+        generated = GeneratedLetter(letter_request=letter_request, generated_by=user)
+    elif generated.pdf_file:
+        generated.pdf_file.delete(save=False)
+
+    generated.content = "\n".join(document['lines'])
+    generated.content_hash = content_hash
+    generated.generated_at = timezone.now()
+    generated.pdf_file.save(
+        f"WRD_{letter_request.id:06d}_{content_hash[:12]}.pdf",
+        ContentFile(pdf_bytes),
+        save=False,
+    )
+
+    try:
+        generated.save()
+    except IntegrityError:
+        # Another worker stored this letter first; serve its copy instead
+        generated.pdf_file.delete(save=False)
+        return GeneratedLetter.objects.get(letter_request=letter_request)
+
+    logger.info(f'Rendered letter PDF for request {letter_request.id}')
+    return generated
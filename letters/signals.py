@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from utils.counters import invalidate
+from .models import LetterRequest, LetterType
+from .templating import invalidate_template
+
+@receiver(post_save, sender=LetterType)
+@receiver(post_delete, sender=LetterType)
+def drop_compiled_template(sender, instance, **kwargs):
+    invalidate_template(instance.pk)
+
+@receiver(post_save, sender=LetterRequest)
+@receiver(post_delete, sender=LetterRequest)
+def refresh_letter_counters(sender, instance, **kwargs):
+    invalidate('letters', user_ids=[instance.requested_by_id])
@@ -0,0 +1,53 @@
+"""
+Background tasks for letter requests
+"""
+import logging
+import tempfile
+from django.core.files import File
+from django.core.files.storage import default_storage
+from jobs.queue import task
+from utils.email_utils import send_letter_approval_notification
+from .batch import exportable, export_name, mark_issued, prune_exports, write_export
+from .live import publish_letter_status
+from .models import LetterRequest
+from .pdf import get_or_render_letter
+
+logger = logging.getLogger('ward_system')
+
+def _load(letter_request_id):
+    return LetterRequest.objects.select_related(
+        'resident__household', 'letter_type', 'requested_by', 'approved_by'
+    ).get(pk=letter_request_id)
+
+@task('letters.render_letter')
+def render_letter(letter_request_id):
+    """Render and store the PDF for an approved letter ahead of download"""
+    letter_request = _load(letter_request_id)
+    if letter_request.status not in ('approved', 'completed'):
+        logger.info(f'Skipping render for letter request {letter_request_id} ({letter_request.status})')
+        return
+    get_or_render_letter(letter_request, letter_request.approved_by or letter_request.requested_by)
+    publish_letter_status(letter_request, ready=True)
+
+@task('letters.send_approval_notification')
+def send_approval_notification(letter_request_id):
+    """
+    Shim for jobs queued before approvals wrote the email to the outbox
+    themselves: hands the email to the outbox. Nothing enqueues this task
+    any more; delete it once no such jobs are left in the queue.
+    """
+    send_letter_approval_notification(_load(letter_request_id))
+
+@task('letters.batch_export')
+def batch_export(export_id, ids, export_format, user_id):
+    """Write a large letter export to storage for letters:batch_export_download"""
+    prune_exports()
+    letter_requests = exportable(ids)
+    name = export_name(export_id, export_format)
+    with tempfile.TemporaryFile() as f:
+        write_export(letter_requests.iterator(chunk_size=100), export_format, f)
+        f.seek(0)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, File(f))
+    mark_issued(letter_requests)
@@ -0,0 +1,184 @@
+"""
+Compiled LetterType templates
+
+A template is plain text with ``{placeholder}`` fields. Blank lines separate
+paragraphs; single line breaks inside a paragraph are joined with a space.
+A field may carry a case modifier, e.g. ``{full_name:upper}``.
+
+Templates are parsed once per process and cached by LetterType; the cache
+entry is dropped when the LetterType is saved or deleted, and is also
+rebuilt whenever the stored text differs, so edits made through another
+worker process are picked up on the next render.
+
+LetterType.clean() rejects templates that do not compile, so the admin
+cannot save one. Text that reaches the database some other way is
+rendered with the default body, and the approval page warns about it.
+"""
+import logging
+import re
+from string import Formatter
+
+logger = logging.getLogger('ward_system')
+
+RESIDENT_FIELDS = (
+    'first_name', 'middle_name', 'last_name', 'nida_number', 'date_of_birth',
+    'place_of_birth', 'gender', 'marital_status', 'tribe', 'religion',
+    'phone_number', 'email', 'occupation', 'education_level',
+    'special_category', 'relationship_to_head',
+)
+
+HOUSEHOLD_FIELDS = ('household_number', 'street_name', 'house_number', 'ward')
+
+EXTRA_FIELDS = ('full_name', 'age', 'address', 'purpose', 'letter_type', 'reference_number', 'date')
+
+PLACEHOLDERS = frozenset(RESIDENT_FIELDS + HOUSEHOLD_FIELDS + EXTRA_FIELDS)
+
+MODIFIERS = {
+    '': str,
+    'upper': str.upper,
+    'lower': str.lower,
+    'title': str.title,
+}
+
+# Used when a LetterType has no template text of its own
+DEFAULT_TEMPLATE = """RE: INTRODUCTION OF A RESIDENT {full_name:upper}
+
+Please refer to letter head above,
+
+2. Be informed that {full_name:upper} with national identity number(NIDA) {nida_number} is a
+resident at {ward}, at saranga ward. He/She is pursuing {purpose}.
+He/She has been registered in our ward.
+
+3. We request your good office to assist the resident where he/she need arises.
+
+4. If there is any question, please don't hesitate to ask.
+
+5. Yours in Public Service,"""
+
+# Wording shipped with the code, by LetterType name (see create_initial_data.py). Every other
+# letter type's wording is the ward's, entered in the admin.
+STANDARD_TEMPLATES = {
+    'Introduction Letter': DEFAULT_TEMPLATE,
+}
+
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n')
+
+
+class TemplateError(ValueError):
+    """Raised when a letter template cannot be compiled"""
+
+
+class CompiledTemplate:
+    """Parsed form of a letter template: paragraphs of (literal, field, modifier) segments"""
+
+    def __init__(self, source):
+        self.source = source
+        self.paragraphs = []
+        self.fields = set()
+
+        unknown = set()
+        for block in _PARAGRAPH_BREAK.split(source.strip()):
+            text = ' '.join(line.strip() for line in block.splitlines() if line.strip())
+            if not text:
+                continue
+            try:
+                parsed = list(Formatter().parse(text))
+            except ValueError as e:
+                raise TemplateError(f'Invalid template syntax: {e}')
+
+            segments = []
+            for literal, field, modifier, conversion in parsed:
+                if field is None:
+                    segments.append((literal, None, None))
+                    continue
+                if conversion or modifier not in MODIFIERS:
+                    raise TemplateError(f'Unsupported formatting in {{{field}}}')
+                if field not in PLACEHOLDERS:
+                    unknown.add(field or '{}')
+                self.fields.add(field)
+                segments.append((literal, field, MODIFIERS[modifier]))
+            self.paragraphs.append(segments)
+
+        if unknown:
+            raise TemplateError(f'Unknown placeholder(s): {", ".join(sorted(unknown))}')
+
+    def render(self, context):
+        """Return the paragraphs of the template with placeholders filled in"""
+        rendered = []
+        for segments in self.paragraphs:
+            parts = []
+            for literal, field, modifier in segments:
+                parts.append(literal)
+                if field is not None:
+                    parts.append(modifier(context[field]))
+            rendered.append(''.join(parts))
+        return rendered
+
+
+# letter type pk -> (template text, CompiledTemplate, error message or None)
+_cache = {}
+_default = CompiledTemplate(DEFAULT_TEMPLATE)
+
+
+def compile_template(source):
+    """Compile template text, falling back to the default letter body when empty"""
+    return CompiledTemplate(source) if source.strip() else _default
+
+
+def _cached(letter_type):
+    source = letter_type.template_content or ''
+    cached = _cache.get(letter_type.pk)
+    if cached is not None and cached[0] == source:
+        return cached
+
+    error = None
+    try:
+        compiled = compile_template(source)
+    except TemplateError as e:
+        # LetterType.clean() rejects these; only text written around the admin gets here
+        logger.error(f'Letter type {letter_type.pk} has an invalid template, using default: {e}')
+        compiled, error = _default, str(e)
+
+    _cache[letter_type.pk] = (source, compiled, error)
+    return _cache[letter_type.pk]
+
+
+def get_compiled_template(letter_type):
+    """
+    Return the cached compiled template for a LetterType. An invalid
+    template falls back to the default letter body; ``template_error``
+    tells the approving admin.
+    """
+    return _cached(letter_type)[1]
+
+
+def template_error(letter_type):
+    """Why a LetterType's template cannot be used, or None when it can"""
+    return _cached(letter_type)[2]
+
+
+def invalidate_template(letter_type_pk):
+    _cache.pop(letter_type_pk, None)
+
+
+def letter_context(letter_request, reference_number, date):
+    """Values for every placeholder, taken from the resident, household and request"""
+    resident = letter_request.resident
+    household = resident.household
+
+    context = {name: getattr(resident, name) for name in RESIDENT_FIELDS}
+    context.update({name: getattr(household, name) for name in HOUSEHOLD_FIELDS})
+    context.update({
+        'gender': resident.get_gender_display(),
+        'marital_status': resident.get_marital_status_display(),
+        'special_category': resident.get_special_category_display(),
+        'date_of_birth': resident.date_of_birth.strftime('%d %B %Y') if resident.date_of_birth else '',
+        'full_name': resident.full_name,
+        'age': resident.age if resident.date_of_birth else '',
+        'address': f'{household.house_number}, {household.street_name}',
+        'purpose': letter_request.purpose,
+        'letter_type': letter_request.letter_type.name,
+        'reference_number': reference_number,
+        'date': date,
+    })
+    return {name: '' if value is None else str(value) for name, value in context.items()}
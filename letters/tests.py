@@ -1,3 +1,138 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import zipfile
+from datetime import date
+from io import BytesIO
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.forms import modelform_factory
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import User
+from events.bus import user_channel
+from events.models import Event
+from jobs.models import Job
+from jobs.queue import run_pending
+from residents.models import Household, Resident
+from .models import LetterRequest, LetterType
+from .templating import DEFAULT_TEMPLATE, get_compiled_template, template_error
 
-# Create your tests here.
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('leader', role='admin')
+        cls.user = User.objects.create_user('asha', role='resident', email='asha@example.com')
+        household = Household.objects.create(household_number='HH1', street_name='Main', house_number='12', ward='Saranga')
+        cls.resident = Resident.objects.create(
+            user=cls.user, household=household, first_name='Asha', last_name='Juma', nida_number='1' * 20,
+            date_of_birth=date(1990, 1, 1), gender='F', marital_status='single',
+        )
+
+    def setUp(self):
+        # The audit sink's thread writes through its own connection, which cannot see the test transaction
+        patcher = mock.patch('audit.sink.record')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def letter_request(self, letter_type, **kwargs):
+        return LetterRequest.objects.create(
+            resident=self.resident, letter_type=letter_type, purpose='a job', requested_by=self.user, **kwargs
+        )
+
+
+class TemplateValidationTests(ViewTestCase):
+    def test_unknown_placeholder_is_rejected_on_save(self):
+        letter_type = LetterType(name='Permit', description='d', template_content='For {full_name} of {planet}')
+        with self.assertRaises(ValidationError) as raised:
+            letter_type.full_clean()
+        self.assertIn('planet', str(raised.exception.message_dict['template_content']))
+
+    def test_admin_form_rejects_bad_template(self):
+        form = modelform_factory(LetterType, fields='__all__')(data={
+            'name': 'Permit', 'description': 'd', 'template_content': 'For {full_name!r}', 'is_active': True,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('template_content', form.errors)
+
+    def test_valid_template_is_compiled(self):
+        letter_type = LetterType.objects.create(name='Permit', description='d', template_content='For {full_name:upper}')
+        self.assertIsNone(template_error(letter_type))
+        self.assertEqual(get_compiled_template(letter_type).fields, {'full_name'})
+
+    def test_invalid_stored_template_falls_back_and_warns_the_approver(self):
+        # Written around the admin, e.g. by a data import
+        letter_type = LetterType.objects.create(name='Permit', description='d', template_content='For {planet}')
+        self.assertEqual(get_compiled_template(letter_type).source, DEFAULT_TEMPLATE)
+        self.assertIn('planet', template_error(letter_type))
+
+        self.client.force_login(self.admin)
+        response = self.client.get(f'/letters/approve/{self.letter_request(letter_type).pk}/', secure=True)
+        self.assertContains(response, 'template cannot be used')
+
+
+@override_settings(LETTER_EXPORT_WORKERS=1)
+class BatchExportTests(ViewTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        letter_type = LetterType.objects.create(name='Introduction Letter', description='d', template_content=DEFAULT_TEMPLATE)
+        self.requests = [
+            self.letter_request(letter_type, status='approved', approved_by=self.admin, approval_date=timezone.now())
+            for _ in range(3)
+        ]
+        self.ids = [str(r.pk) for r in self.requests]
+        self.client.force_login(self.admin)
+
+    def export(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/letters/batch-export/', {'ids': self.ids, **data}, secure=True)
+
+    def statuses(self):
+        return set(LetterRequest.objects.filter(pk__in=self.ids).values_list('status', flat=True))
+
+    def test_small_export_marks_requests_completed_and_publishes(self):
+        response = self.export()
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 3)
+        self.assertEqual(self.statuses(), {'completed'})
+        events = Event.objects.filter(channel=user_channel(self.user.pk), kind='letter_status')
+        self.assertEqual([event.data['status'] for event in events], ['completed'] * 3)
+
+    def test_failed_export_leaves_requests_approved(self):
+        with mock.patch('letters.views.write_export', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.export(format='pdf')
+        self.assertEqual(self.statuses(), {'approved'})
+
+    @override_settings(LETTER_EXPORT_INLINE_LIMIT=2)
+    def test_large_export_runs_as_a_job(self):
+        response = self.export(format='pdf')
+        job = Job.objects.get(task='letters.batch_export')
+        download = f'/letters/batch-export/{job.payload["export_id"]}/'
+        self.assertRedirects(response, download, fetch_redirect_response=False)
+        self.assertEqual(self.statuses(), {'approved'})
+        self.assertEqual(self.client.get(download, secure=True).status_code, 202)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending(worker='test')
+        self.assertEqual(self.statuses(), {'completed'})
+        response = self.client.get(download, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    @override_settings(LETTER_EXPORT_INLINE_LIMIT=2)
+    def test_export_download_belongs_to_its_admin(self):
+        self.export()
+        export_id = Job.objects.get(task='letters.batch_export').payload['export_id']
+        other = User.objects.create_user('deputy', role='admin')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f'/letters/batch-export/{export_id}/', secure=True).status_code, 404)
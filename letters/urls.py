@@ -12,4 +12,7 @@ urlpatterns = [
     path('approve/<int:pk>/', views.approve_request, name='approve'),
     path('reject/<int:pk>/', views.reject_request, name='reject'),
     path('generate-pdf/<int:pk>/', views.generate_pdf, name='generate_pdf'),
+    path('export/', views.export_requests, name='export'),
+    path('batch-export/', views.batch_export, name='batch_export'),
+    path('batch-export/<str:export_id>/', views.batch_export_download, name='batch_export_download'),
 ]
@@ -1,26 +1,33 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
+from django.core.files.storage import default_storage
+from django.http import FileResponse
 from django.utils import timezone
-from django.core.paginator import Paginator
-from .models import LetterRequest, LetterType, GeneratedLetter
+from .models import LetterRequest, LetterType
 from .forms import LetterRequestForm
+from .exports import LETTER_REQUEST_COLUMNS, letter_request_queryset
+from .pdf import download_filename, get_current_letter
+from .batch import CONTENT_TYPES, export_name, exportable, inline_limit, mark_issued, write_export
+from .live import publish_letter_status
+from .templating import template_error
 from residents.models import Resident
-from utils.email_utils import send_letter_approval_notification
+from jobs.models import Job
+from jobs.queue import enqueue
 from utils.decorators import role_required, rate_limit, log_activity
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-import io
+from utils.downloads import serve_file
+from utils.email_utils import send_letter_approval_notification
+from utils.exports import FORMATS, export_response
+from utils.pagination import CursorPaginator
 import logging
+import tempfile
+import uuid
 
 logger = logging.getLogger('ward_system')
 
 @login_required
 @role_required(['resident'])
-# 10 requests per hour for authenticated users, 3 for anonymous
-@rate_limit('letter_request', limit=10, window=3600)
+@rate_limit('letter_request')
 @log_activity('letter_request')
 def letter_request(request):
     
@@ -80,9 +87,8 @@ def my_requests(request):
         )
     
     # Paginate the results
-    paginator = Paginator(requests, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(requests, 10, ordering=('-request_date',))
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'letters/my_requests.html', {
         'requests': page_obj,
@@ -95,10 +101,10 @@ def pending_requests(request):
         messages.error(request, 'Access denied. Admin privileges required.')
         return redirect('home')
     
-    requests = LetterRequest.objects.filter(status='pending').select_related('resident', 'letter_type').order_by('-request_date')
-    paginator = Paginator(requests, 20)
-    page_number = request.GET.get('page')
-    requests = paginator.get_page(page_number)
+    # The rows show the requester's photo and name
+    requests = LetterRequest.objects.filter(status='pending').select_related('resident', 'letter_type', 'requested_by__resident')
+    paginator = CursorPaginator(requests, 20, ordering=('-request_date',), count='approximate')
+    requests = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'letters/pending.html', {'requests': requests})
 
@@ -108,10 +114,9 @@ def all_requests(request):
         messages.error(request, 'Access denied. Admin privileges required.')
         return redirect('home')
     
-    requests = LetterRequest.objects.all().select_related('resident', 'letter_type').order_by('-request_date')
-    paginator = Paginator(requests, 20)
-    page_number = request.GET.get('page')
-    requests = paginator.get_page(page_number)
+    requests = LetterRequest.objects.all().select_related('resident', 'letter_type', 'requested_by__resident')
+    paginator = CursorPaginator(requests, 20, ordering=('-request_date',), count='approximate')
+    requests = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'letters/all.html', {'requests': requests})
 
@@ -132,6 +137,13 @@ def request_detail(request, pk):
 def approve_request(request, pk):
     
     letter_request = get_object_or_404(LetterRequest, pk=pk)
+    error = template_error(letter_request.letter_type)
+    if error:
+        messages.warning(
+            request,
+            f'The "{letter_request.letter_type}" template cannot be used ({error}), so this letter will '
+            f'have the standard introduction wording. Correct the template in the admin before approving.'
+        )
     
     if request.method == 'POST':
         admin_notes = request.POST.get('admin_notes', '')
@@ -141,28 +153,12 @@ def approve_request(request, pk):
         letter_request.admin_notes = admin_notes
         letter_request.save()
         
-        # Send email notification
-        try:
-            send_letter_approval_notification(letter_request)
-            logger.info(f'Approval notification sent for letter request {letter_request.id}')
-            # Add success message for the admin
-            messages.success(request, f'Letter request for {letter_request.resident.full_name} has been approved and notification sent.')
-            
-            # Add success message that will be shown to the resident
-            from django.contrib import messages as msg
-            from django.contrib.messages import get_messages
-            
-            # Store a message for the resident
-            storage = get_messages(request)
-            storage.used = True  # Mark existing messages as used
-            msg.success(
-                request, 
-                f'Your {letter_request.letter_type.name} request has been approved! You can now download your letter.',
-                extra_tags='letter_approved'
-            )
-        except Exception as e:
-            logger.error(f'Failed to send approval notification: {e}')
-            messages.warning(request, f'Letter was approved but could not send notification: {e}')
+        # Shown live on the resident's open pages; another "ready" update follows once the PDF is rendered
+        publish_letter_status(letter_request)
+        # Render the PDF in the background; the notification goes through the email outbox
+        enqueue('letters.render_letter', unique=True, letter_request_id=letter_request.pk)
+        send_letter_approval_notification(letter_request)
+        messages.success(request, f'Letter request for {letter_request.resident.full_name} has been approved. The letter is being prepared and the resident will be notified.')
         return redirect('letters:detail', pk=letter_request.pk)
     
     return render(request, 'letters/approve.html', {'letter_request': letter_request})
@@ -182,6 +178,7 @@ def reject_request(request, pk):
         letter_request.approval_date = timezone.now()
         letter_request.rejection_reason = rejection_reason
         letter_request.save()
+        publish_letter_status(letter_request)
         
         messages.success(request, 'Letter request rejected.')
         return redirect('letters:detail', pk=pk)
@@ -190,102 +187,118 @@ def reject_request(request, pk):
 
 @login_required
 def generate_pdf(request, pk):
-    letter_request = get_object_or_404(LetterRequest, pk=pk, status='approved')
+    letter_request = get_object_or_404(
+        LetterRequest.objects.select_related('resident__household', 'letter_type'),
+        pk=pk,
+        status__in=['approved', 'completed'],
+    )
     
     # Allow admin or the resident who requested the letter to download
     if request.user.role != 'admin' and letter_request.requested_by != request.user:
         messages.error(request, 'Access denied. You can only download your own approved letters.')
         return redirect('home')
     
-    # Create PDF
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Official Letterhead
-    p.setFont("Helvetica-Bold", 18)
-    title = "WARD ADMINISTRATION OFFICE"
-    title_width = p.stringWidth(title, "Helvetica-Bold", 18)
-    p.drawString((width - title_width) / 2, height - 0.8*inch, title)
-    
-    # Ward details
-    p.setFont("Helvetica", 10)
-    ward_info = f"Ward: {letter_request.resident.household.ward}"
-    ward_width = p.stringWidth(ward_info, "Helvetica", 10)
-    p.drawString((width - ward_width) / 2, height - inch, ward_info)
-    
-    # Contact information
-    contact_info = "Tel: +255 763 587 710 | Email: sarangakata@info.go.tz"
-    contact_width = p.stringWidth(contact_info, "Helvetica", 10)
-    p.drawString((width - contact_width) / 2, height - 1.2*inch, contact_info)
-    
-    # Reference number and date (right aligned)
-    p.setFont("Helvetica", 11)
-    ref_number = f"Reference No.: WRD/{letter_request.id:06d}/{timezone.now().year}"
-    p.drawRightString(width - inch, height - 1.8*inch, ref_number)
-    p.drawRightString(width - inch, height - 2*inch, f"Date: {timezone.now().strftime('%d %B %Y')}")
-    
-    # Subject line
-    y_position = height - 2.5*inch
-    p.setFont("Helvetica-Bold", 12)
-    subject = f"RE: {letter_request.letter_type.name.upper()}"
-    p.drawString(inch, y_position, subject)
-    
-    # Main content starts here
-    y_position -= 0.5*inch
-    p.setFont("Helvetica", 11)
-    
-    content_lines = [
-        "TO WHOM IT MAY CONCERN",
-        "",
-        "Dear Sir/Madam,",
-        "",
-        f"RE: INTRODUCTION OF A RESIDENT {letter_request.resident.full_name.upper()}",
-        "",
-        "Please refer to letter head above,",
-        "",
-        f"2. Be informed that {letter_request.resident.full_name.upper()} with national identity number(NIDA) {letter_request.resident.nida_number} is a",
-        f"   resident at {letter_request.resident.household.ward}, at saranga ward. He/She is pursuing {letter_request.purpose}.",
-        f"   He/She has been registered in our ward.",
-        "",
-        "3. We request your good office to assist the resident where he/she need arises.",
-        "",
-        "4. If there is any question, please don't hesitate to ask.",
-        "",
-        "5. Yours in Public Service,",
-        "",
-        "",
-        "________________________",
-        "Ward Executive Officer",
-        f"For {letter_request.resident.household.ward}",
-        "RESIDENT CONTACTS:",
-        f"Phone Number: {letter_request.resident.phone_number or 'Not provided'}",
-        f"Current Address: {letter_request.resident.household.house_number}, {letter_request.resident.household.street_name}",
-    ]
-    
-    for line in content_lines:
-        p.drawString(inch, y_position, line)
-        y_position -= 20
-    
-    p.showPage()
-    p.save()
-    
-    # Update request status
-    letter_request.status = 'completed'
-    letter_request.completion_date = timezone.now()
-    letter_request.save()
-    
-    # Create GeneratedLetter record
-    GeneratedLetter.objects.create(
-        letter_request=letter_request,
-        content="\n".join(content_lines),
-        generated_by=request.user
+    # Serve the stored PDF; rendering happens in the background job worker
+    generated = get_current_letter(letter_request)
+    if generated is None:
+        enqueue('letters.render_letter', unique=True, letter_request_id=letter_request.pk)
+        return render(request, 'letters/preparing.html', {'letter_request': letter_request}, status=202)
+    
+    # Update request status on first download
+    if letter_request.status == 'approved':
+        letter_request.status = 'completed'
+        letter_request.completion_date = timezone.now()
+        letter_request.save(update_fields=['status', 'completion_date'])
+    
+    # Validators let repeat downloads revalidate with a 304 and resume with Range
+    return serve_file(
+        request,
+        generated.pdf_file.open('rb'),
+        size=generated.pdf_file.size,
+        etag=f'"{generated.content_hash[:32]}-{int(generated.generated_at.timestamp())}"',
+        last_modified=generated.generated_at,
+        content_type='application/pdf',
+        filename=download_filename(letter_request),
+        as_attachment=True,
     )
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    # Use resident's full name for filename
-    safe_name = letter_request.resident.full_name.replace(' ', '_').replace('.', '')
-    response['Content-Disposition'] = f'attachment; filename="{safe_name}_Introduction_Letter.pdf"'
-    
-    return response
+
+@login_required
+@role_required(['admin'])
+@log_activity('batch_export_letters')
+def batch_export(request):
+    if request.method != 'POST':
+        return redirect('letters:all')
+    
+    ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+    export_format = 'pdf' if request.POST.get('format') == 'pdf' else 'zip'
+    letter_requests = exportable(ids)
+    count = letter_requests.count()
+    
+    if not count:
+        messages.warning(request, 'Select at least one approved letter request to export.')
+        return redirect('letters:all')
+    
+    if count > inline_limit():
+        # Rendered by the job worker; the download page waits for the file
+        export_id = uuid.uuid4().hex
+        enqueue('letters.batch_export', export_id=export_id, ids=ids, export_format=export_format, user_id=request.user.pk)
+        messages.info(request, f'{count} letters are being exported. The download starts when the file is ready.')
+        return redirect('letters:batch_export_download', export_id=export_id)
+    
+    export = tempfile.TemporaryFile()
+    try:
+        write_export(letter_requests.iterator(chunk_size=100), export_format, export, workers=1)
+    except Exception:
+        export.close()
+        raise
+    # Exported letters count as issued, same as a single download, once the file exists
+    mark_issued(letter_requests)
+    export.seek(0)
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+    return FileResponse(
+        export,
+        as_attachment=True,
+        filename=f'letters_{timestamp}.{export_format}',
+        content_type=CONTENT_TYPES[export_format],
+    )
+
+@login_required
+@role_required(['admin'])
+def batch_export_download(request, export_id):
+    """The file written by a letters.batch_export job, or a page that waits for it"""
+    job = get_object_or_404(
+        Job, task='letters.batch_export', payload__export_id=export_id, payload__user_id=request.user.pk,
+    )
+    if job.status == 'failed':
+        messages.error(request, 'The letter export failed. Please try again.')
+        return redirect('letters:all')
+    
+    export_format = job.payload['export_format']
+    name = export_name(export_id, export_format)
+    if job.status != 'done' or not default_storage.exists(name):
+        return render(request, 'letters/export_preparing.html', {'job': job}, status=202)
+    
+    stored = default_storage.open(name, 'rb')
+    modified = default_storage.get_modified_time(name)
+    return serve_file(
+        request,
+        stored,
+        size=default_storage.size(name),
+        etag=f'"{export_id}"',
+        last_modified=modified,
+        content_type=CONTENT_TYPES[export_format],
+        filename=f'letters_{job.created_at:%Y%m%d_%H%M%S}.{export_format}',
+        as_attachment=True,
+    )
+
+@login_required
+@role_required(['admin'])
+@log_activity('export_letter_requests')
+def export_requests(request):
+    """Download letter requests as CSV or XLSX; ?status=pending matches the pending list"""
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in FORMATS:
+        file_format = 'csv'
+    
+    requests = letter_request_queryset(request.GET.get('status'))
+    return export_response(file_format, 'letter_requests', requests, LETTER_REQUEST_COLUMNS, title='Letter Requests')
@@ -0,0 +1,24 @@
+from django.contrib import admin, messages
+from django.utils import timezone
+from .mail import schedule_sender
+from .models import OutboxMessage
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipient_list', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'recipients', 'last_error')
+    readonly_fields = ('created_at', 'sent_at', 'locked_by', 'locked_at', 'attempts', 'last_error')
+    actions = ['retry_now']
+
+    @admin.display(description='Recipients')
+    def recipient_list(self, obj):
+        return ', '.join(obj.recipients)
+
+    @admin.action(description='Retry selected messages now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='queued', attempts=0, next_attempt_at=timezone.now(), locked_by='', last_error='',
+        )
+        schedule_sender()
+        messages.success(request, f'{updated} message(s) queued for another attempt.')
@@ -0,0 +1,207 @@
+"""
+Email outbox for Ward Resident System
+
+``queue_email`` stores a message in the OutboxMessage table and schedules
+the ``outbox.send_pending`` background job; the caller never waits on
+SMTP. The sender claims due messages in batches and delivers them all over
+one connection from ``get_connection()``, reconnecting once if the server
+drops it. Temporary failures are retried with exponential backoff, while
+permanent ones (5xx replies, refused recipients) are marked failed.
+
+Any Django email backend works, so development and tests can use the
+console or locmem backends, or a local SMTP stand-in such as
+``python -m aiosmtpd -n -l localhost:1025``.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import enqueue, worker_id
+from .models import OutboxMessage
+
+logger = logging.getLogger('ward_system')
+
+SEND_TASK = 'outbox.send_pending'
+
+# Seconds before the first retry; doubled on each further attempt
+RETRY_BASE = 60
+RETRY_MAX = 3600
+
+
+def queue_email(subject, body, recipients, html_body='', from_email=None):
+    """Store an email for background delivery and return the OutboxMessage"""
+    message = OutboxMessage.objects.create(
+        subject=subject[:255],
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+    transaction.on_commit(schedule_sender)
+    return message
+
+
+def schedule_sender(delay=0):
+    """
+    Make sure a sender job will run within ``delay`` seconds. Only queued
+    jobs count: one that is already running may have taken its last batch.
+    """
+    due = timezone.now() + timedelta(seconds=delay)
+    if not Job.objects.filter(task=SEND_TASK, status='queued', run_after__lte=due).exists():
+        enqueue(SEND_TASK, delay=delay)
+
+
+def claim_batch(worker, size):
+    """Mark up to ``size`` due messages as sending for ``worker`` and return them"""
+    now = timezone.now()
+    candidates = list(
+        OutboxMessage.objects.filter(status='queued', next_attempt_at__lte=now).values_list('pk', flat=True)[:size]
+    )
+    if not candidates:
+        return []
+    OutboxMessage.objects.filter(pk__in=candidates, status='queued').update(
+        status='sending', locked_by=worker, locked_at=now,
+    )
+    return list(OutboxMessage.objects.filter(pk__in=candidates, status='sending', locked_by=worker))
+
+
+def requeue_stale(older_than):
+    """Return messages left sending by a crashed sender; they may be delivered twice"""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return OutboxMessage.objects.filter(status='sending', locked_at__lt=cutoff).update(status='queued', locked_by='')
+
+
+def build_email(message, connection):
+    email = EmailMultiAlternatives(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email,
+        to=message.recipients,
+        connection=connection,
+    )
+    if message.html_body:
+        email.attach_alternative(message.html_body, 'text/html')
+    return email
+
+
+def is_permanent(error):
+    """Errors that retrying cannot fix"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def is_connection_error(error):
+    """The server went away, as opposed to rejecting this particular message"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException subclasses OSError, so plain socket errors are told apart this way
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _record_failure(message, error, stats):
+    message.attempts += 1
+    message.last_error = str(error)[:1000]
+    message.locked_by = ''
+    if is_permanent(error) or message.attempts >= message.max_attempts:
+        message.status = 'failed'
+        stats['failed'] += 1
+        logger.error(f'Email {message.pk} to {message.recipients} failed permanently: {error}')
+    else:
+        delay = min(RETRY_BASE * 2 ** (message.attempts - 1), RETRY_MAX)
+        message.status = 'queued'
+        message.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        stats['retried'] += 1
+        stats['retry_delay'] = min(stats['retry_delay'] or delay, delay)
+        logger.warning(f'Email {message.pk} failed (attempt {message.attempts}), retrying in {delay}s: {error}')
+    message.save(update_fields=['attempts', 'last_error', 'locked_by', 'status', 'next_attempt_at'])
+
+
+def send_pending(batch_size=None, connection=None):
+    """
+    Deliver every due message, ``batch_size`` at a time, over one connection.
+
+    Returns counts of messages sent, failed for good, and rescheduled.
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+    worker = worker_id()
+    connection = connection or get_connection(fail_silently=False)
+    stats = {'sent': 0, 'failed': 0, 'retried': 0, 'retry_delay': None}
+
+    try:
+        connection.open()
+        while True:
+            batch = claim_batch(worker, batch_size)
+            if not batch:
+                break
+
+            sent = []
+            server_down = None
+            for index, message in enumerate(batch):
+                try:
+                    try:
+                        connection.send_messages([build_email(message, connection)])
+                    except Exception as e:
+                        if not is_connection_error(e):
+                            raise
+                        # The server dropped an idle or overused connection; reconnect once
+                        connection.close()
+                        connection.open()
+                        connection.send_messages([build_email(message, connection)])
+                except Exception as e:
+                    _record_failure(message, e, stats)
+                    if is_connection_error(e):
+                        # Server unreachable: hand the rest of the batch back untouched
+                        OutboxMessage.objects.filter(pk__in=[m.pk for m in batch[index + 1:]]).update(
+                            status='queued', locked_by='',
+                        )
+                        server_down = e
+                        break
+                else:
+                    sent.append(message.pk)
+
+            # One UPDATE per batch for the successes
+            OutboxMessage.objects.filter(pk__in=sent).update(
+                status='sent', sent_at=timezone.now(), locked_by='', last_error='',
+            )
+            stats['sent'] += len(sent)
+            if server_down:
+                raise server_down
+    except (smtplib.SMTPException, OSError) as e:
+        logger.warning(f'Outbox sender stopped: {e}')
+        stats['retry_delay'] = stats['retry_delay'] or RETRY_BASE
+    finally:
+        connection.close()
+
+    if stats['retry_delay']:
+        schedule_sender(delay=stats['retry_delay'])
+    if stats['sent'] or stats['failed'] or stats['retried']:
+        logger.info(f'Outbox: {stats["sent"]} sent, {stats["failed"]} failed, {stats["retried"]} rescheduled')
+    return stats
+
+
+def outbox_stats():
+    """Message counts by status and the age in seconds of the oldest due message"""
+    counts = {status: 0 for status, _ in OutboxMessage.STATUS_CHOICES}
+    counts.update(
+        OutboxMessage.objects.values_list('status').annotate(total=Count('pk')).order_by()
+    )
+    oldest = OutboxMessage.objects.filter(
+        status='queued', next_attempt_at__lte=timezone.now(),
+    ).aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'counts': counts,
+        'oldest_queued_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0,
+    }
+
+
+def purge_sent(older_than_days):
+    """Delete delivered messages older than the given number of days"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = OutboxMessage.objects.filter(status='sent', sent_at__lt=cutoff).delete()
+    return deleted
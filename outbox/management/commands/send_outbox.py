@@ -0,0 +1,53 @@
+"""
+Management command to deliver queued outbox email
+
+The outbox.send_pending job normally does this; the command is for cron
+as a safety net, for draining the outbox by hand and for checking its
+state.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from outbox.mail import outbox_stats, purge_sent, requeue_stale, send_pending
+import logging
+
+logger = logging.getLogger('ward_system')
+
+class Command(BaseCommand):
+    help = 'Send queued outbox email and report delivery counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Messages claimed per batch (default: OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Requeue messages that have been sending longer than this many seconds',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Only print outbox counts',
+        )
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            requeued = requeue_stale(options['stale_after'])
+            if requeued:
+                logger.warning(f'Requeued {requeued} stale outbox message(s)')
+            result = send_pending(batch_size=options['batch_size'])
+            self.stdout.write(
+                f'{result["sent"]} sent, {result["failed"]} failed, {result["retried"]} rescheduled'
+            )
+            purged = purge_sent(getattr(settings, 'OUTBOX_RETENTION_DAYS', 30))
+            if purged:
+                self.stdout.write(f'Purged {purged} delivered message(s)')
+
+        stats = outbox_stats()
+        counts = ', '.join(f'{status} {count}' for status, count in stats['counts'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Outbox: {counts}; oldest due message waiting {stats["oldest_queued_seconds"]:.0f}s'
+        ))
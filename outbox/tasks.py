@@ -0,0 +1,10 @@
+"""
+Background tasks for the email outbox
+"""
+from jobs.queue import task
+from .mail import SEND_TASK, send_pending
+
+@task(SEND_TASK)
+def send_outbox():
+    """Deliver every due outbox message over one SMTP connection"""
+    send_pending()
@@ -0,0 +1,131 @@
+import smtplib
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from jobs.models import Job
+from .mail import SEND_TASK, purge_sent, queue_email, requeue_stale, send_pending
+from .models import OutboxMessage
+
+
+class FakeConnection:
+    """Email backend stand-in that fails with the queued errors before it succeeds"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.sent = []
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.extend(messages)
+        return len(messages)
+
+
+class OutboxTestCase(TestCase):
+    def queue(self, subject='Hello'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return queue_email(subject, 'Body', ['asha@example.org'])
+
+
+class SendTests(OutboxTestCase):
+    def test_queue_schedules_one_sender(self):
+        self.queue()
+        self.queue()
+        self.assertEqual(Job.objects.filter(task=SEND_TASK, status='queued').count(), 1)
+
+    def test_batch_goes_out_over_one_connection(self):
+        first, second = self.queue('One'), self.queue('Two')
+        connection = FakeConnection()
+        stats = send_pending(connection=connection)
+        self.assertEqual(stats['sent'], 2)
+        self.assertEqual(connection.opened, 1)
+        self.assertEqual([m.subject for m in connection.sent], ['One', 'Two'])
+        for message in (first, second):
+            message.refresh_from_db()
+            self.assertEqual(message.status, 'sent')
+            self.assertIsNotNone(message.sent_at)
+
+    def test_dropped_connection_is_reopened_once(self):
+        message = self.queue()
+        connection = FakeConnection(smtplib.SMTPServerDisconnected('gone'))
+        self.assertEqual(send_pending(connection=connection)['sent'], 1)
+        self.assertEqual(connection.opened, 2)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('sent', 0))
+
+
+class RetryTests(OutboxTestCase):
+    def test_temporary_failure_is_retried_with_backoff(self):
+        message = self.queue()
+        Job.objects.all().delete()
+        before = timezone.now()
+        stats = send_pending(connection=FakeConnection(smtplib.SMTPResponseException(451, 'try later')))
+        self.assertEqual((stats['sent'], stats['retried']), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('queued', 1))
+        self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=60))
+        self.assertIn('try later', message.last_error)
+        # A sender is booked for when the retry falls due
+        self.assertTrue(Job.objects.filter(task=SEND_TASK, status='queued', run_after__gt=before).exists())
+
+    def test_backoff_doubles(self):
+        message = self.queue()
+        OutboxMessage.objects.filter(pk=message.pk).update(attempts=2)
+        before = timezone.now()
+        send_pending(connection=FakeConnection(smtplib.SMTPResponseException(451, 'try later')))
+        message.refresh_from_db()
+        self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=240))
+
+    def test_permanent_failure_is_not_retried(self):
+        message = self.queue()
+        stats = send_pending(connection=FakeConnection(smtplib.SMTPResponseException(550, 'no such user')))
+        self.assertEqual(stats['failed'], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 1))
+
+    def test_gives_up_after_max_attempts(self):
+        message = self.queue()
+        OutboxMessage.objects.filter(pk=message.pk).update(attempts=4)
+        send_pending(connection=FakeConnection(smtplib.SMTPResponseException(451, 'try later')))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 5))
+
+    def test_unreachable_server_hands_the_batch_back(self):
+        first, second = self.queue('One'), self.queue('Two')
+        down = ConnectionRefusedError('refused')
+        stats = send_pending(connection=FakeConnection(down, down))
+        self.assertEqual(stats['sent'], 0)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), ('queued', 1))
+        self.assertEqual((second.status, second.attempts, second.locked_by), ('queued', 0, ''))
+
+    def test_stale_sending_messages_are_requeued(self):
+        message = self.queue()
+        OutboxMessage.objects.filter(pk=message.pk).update(
+            status='sending', locked_by='gone', locked_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(requeue_stale(600), 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.locked_by), ('queued', ''))
+
+
+class PurgeTests(OutboxTestCase):
+    def test_only_old_delivered_messages_are_deleted(self):
+        old_sent, recent_sent, old_failed = self.queue(), self.queue(), self.queue()
+        old = timezone.now() - timedelta(days=31)
+        OutboxMessage.objects.filter(pk=old_sent.pk).update(status='sent', sent_at=old)
+        OutboxMessage.objects.filter(pk=recent_sent.pk).update(status='sent', sent_at=timezone.now())
+        OutboxMessage.objects.filter(pk=old_failed.pk).update(status='failed', sent_at=old)
+
+        self.assertEqual(purge_sent(30), 1)
+        self.assertEqual(
+            set(OutboxMessage.objects.values_list('pk', flat=True)), {recent_sent.pk, old_failed.pk}
+        )
@@ -1,5 +1,12 @@
+import os
 from django.contrib import admin
-from .models import Household, Resident
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from jobs.queue import enqueue
+from .forms import ResidentImportForm
+from .models import Household, Resident, ResidentImport
 
 @admin.register(Household)
 class HouseholdAdmin(admin.ModelAdmin):
@@ -31,3 +38,53 @@ class ResidentAdmin(admin.ModelAdmin):
             'fields': ('user', 'is_active')
         }),
     )
+
+@admin.register(ResidentImport)
+class ResidentImportAdmin(admin.ModelAdmin):
+    form = ResidentImportForm
+    list_display = ('__str__', 'source_file', 'status', 'rows', 'created', 'updated', 'failed', 'uploaded_by', 'created_at', 'report_link')
+    list_filter = ('status', 'created_at')
+    readonly_fields = (
+        'status', 'uploaded_by', 'rows', 'created', 'updated', 'failed',
+        'report_link', 'last_error', 'created_at', 'finished_at',
+    )
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ('source_file',)
+        return ('source_file',) + self.readonly_fields
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return ()
+        return ('source_file',) + self.readonly_fields
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/report/', self.admin_site.admin_view(self.report_view), name='residents_residentimport_report'),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(description='Error report')
+    def report_link(self, obj):
+        if not obj.error_report:
+            return '-'
+        return format_html('<a href="{}">Download</a>', reverse('admin:residents_residentimport_report', args=[obj.pk]))
+
+    def report_view(self, request, pk):
+        resident_import = get_object_or_404(ResidentImport, pk=pk)
+        if not self.has_view_permission(request, resident_import) or not resident_import.error_report:
+            raise Http404
+        return FileResponse(
+            resident_import.error_report.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(resident_import.error_report.name),
+            content_type='text/csv',
+        )
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.uploaded_by = request.user
+        super().save_model(request, obj, form, change)
+        if not change:
+            enqueue('residents.import_residents', import_id=obj.pk)
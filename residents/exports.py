@@ -0,0 +1,29 @@
+"""
+Register export columns for residents
+
+Headers match the import columns (see importer.COLUMNS), so an export can
+be edited and imported back.
+"""
+RESIDENT_COLUMNS = (
+    ('Household Number', 'household.household_number'),
+    ('Street Name', 'household.street_name'),
+    ('House Number', 'household.house_number'),
+    ('Ward', 'household.ward'),
+    ('First Name', 'first_name'),
+    ('Middle Name', 'middle_name'),
+    ('Last Name', 'last_name'),
+    ('NIDA Number', 'nida_number'),
+    ('Date of Birth', 'date_of_birth'),
+    ('Place of Birth', 'place_of_birth'),
+    ('Gender', lambda r: r.get_gender_display()),
+    ('Marital Status', lambda r: r.get_marital_status_display()),
+    ('Tribe', 'tribe'),
+    ('Religion', 'religion'),
+    ('Phone Number', 'phone_number'),
+    ('Email', 'email'),
+    ('Occupation', 'occupation'),
+    ('Education Level', 'education_level'),
+    ('Special Category', lambda r: r.get_special_category_display()),
+    ('Relationship to Head', 'relationship_to_head'),
+    ('Registration Date', 'registration_date'),
+)
@@ -1,5 +1,6 @@
 from django import forms
-from .models import Resident, Household
+from .importer import ImportFileError, detect_format
+from .models import Resident, Household, ResidentImport
 
 class HouseholdForm(forms.ModelForm):
     class Meta:
@@ -46,3 +47,16 @@ class ResidentRegistrationForm(forms.ModelForm):
         self.fields['gender'].empty_label = 'Select gender'
         self.fields['marital_status'].empty_label = 'Select marital status'
         self.fields['special_category'].empty_label = 'Select category'
+
+class ResidentImportForm(forms.ModelForm):
+    class Meta:
+        model = ResidentImport
+        fields = ['source_file']
+
+    def clean_source_file(self):
+        source_file = self.cleaned_data['source_file']
+        try:
+            detect_format(source_file.name)
+        except ImportFileError as e:
+            raise forms.ValidationError(str(e))
+        return source_file
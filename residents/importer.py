@@ -0,0 +1,366 @@
+"""
+Bulk import of households and residents from CSV or XLSX
+
+Rows are streamed from the file (openpyxl read-only mode for XLSX), checked
+with the same validators as the registration form, and upserted in batches:
+households by household_number, residents by nida_number. Rejected rows are
+written to a CSV error report as they are found, so neither the input nor
+the report is ever held in memory.
+"""
+import csv
+import io
+import os
+import re
+from datetime import date, datetime
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+from utils.counters import invalidate
+from utils.validators import validate_nida_number, validate_phone_number
+from .models import Household, Resident
+
+BATCH_SIZE = 2000
+
+HOUSEHOLD_COLUMNS = ('household_number', 'street_name', 'house_number', 'ward')
+
+RESIDENT_COLUMNS = (
+    'first_name', 'middle_name', 'last_name', 'nida_number', 'date_of_birth',
+    'place_of_birth', 'gender', 'marital_status', 'tribe', 'religion',
+    'phone_number', 'email', 'occupation', 'education_level',
+    'special_category', 'relationship_to_head',
+)
+
+COLUMNS = HOUSEHOLD_COLUMNS + RESIDENT_COLUMNS
+
+REQUIRED_COLUMNS = (
+    'household_number', 'street_name', 'house_number',
+    'first_name', 'last_name', 'nida_number', 'date_of_birth', 'gender', 'marital_status',
+)
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+
+REPORT_HEADER = ('row', 'nida_number', 'errors')
+
+# Columns overwritten when a household or resident already exists
+HOUSEHOLD_UPDATE_FIELDS = ['street_name', 'house_number', 'ward', 'updated_at']
+RESIDENT_UPDATE_FIELDS = [
+    name for name in RESIDENT_COLUMNS if name != 'nida_number'
+] + ['household', 'updated_at']
+
+
+class ImportFileError(Exception):
+    """Raised when a file cannot be imported at all (unknown format, missing columns)"""
+
+
+class ImportResult:
+    """Running totals for one import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.households = 0
+
+    def __str__(self):
+        return (
+            f'{self.rows} rows: {self.created} created, {self.updated} updated, '
+            f'{self.failed} rejected, {self.households} households'
+        )
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.xlsx', '.xlsm'):
+        return 'xlsx'
+    raise ImportFileError(f'Unsupported file type "{extension}"; upload a .csv or .xlsx file')
+
+
+def _header(values):
+    return [re.sub(r'\s+', '_', str(value or '').strip().lower()) for value in values]
+
+
+def _check_header(header):
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ImportFileError(f'Missing column(s): {", ".join(missing)}')
+
+
+def _iter_csv(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = _header(next(reader, []))
+    _check_header(header)
+    # Spreadsheet row numbers: the header is row 1
+    for number, values in enumerate(reader, start=2):
+        if any(value.strip() for value in values):
+            yield number, dict(zip(header, values))
+
+
+def _iter_xlsx(fileobj):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        _check_header(header)
+        for number, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield number, dict(zip(header, values))
+    finally:
+        # Read-only workbooks keep the file open until closed
+        workbook.close()
+
+
+def read_rows(fileobj, file_format):
+    """Yield (row_number, {column: value}) from an open CSV or XLSX file"""
+    if file_format == 'csv':
+        return _iter_csv(fileobj)
+    if file_format == 'xlsx':
+        return _iter_xlsx(fileobj)
+    raise ImportFileError(f'Unsupported format "{file_format}"')
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store digit-only cells as numbers
+        value = int(value)
+    return str(value).strip()
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValidationError(f'Invalid date "{text}"; use YYYY-MM-DD')
+
+
+def _choice(value, choices, label):
+    """Accept a choice by its stored value or its display name, ignoring case"""
+    text = value.lower()
+    for key, display in choices:
+        if text in (key.lower(), str(display).lower()):
+            return key
+    raise ValidationError(f'Invalid {label} "{value}"')
+
+
+def _max_lengths(model, names):
+    return {
+        name: model._meta.get_field(name).max_length
+        for name in names
+        if getattr(model._meta.get_field(name), 'max_length', None)
+    }
+
+
+_HOUSEHOLD_LENGTHS = _max_lengths(Household, HOUSEHOLD_COLUMNS)
+_RESIDENT_LENGTHS = _max_lengths(Resident, RESIDENT_COLUMNS)
+
+
+def clean_row(row):
+    """
+    Validate one row and return (household_values, resident_values).
+
+    Raises ValidationError listing every problem found in the row.
+    """
+    errors = []
+    values = {name: _text(row.get(name)) for name in COLUMNS if name != 'date_of_birth'}
+
+    for name in REQUIRED_COLUMNS:
+        if name != 'date_of_birth' and not values[name]:
+            errors.append(f'{name} is required')
+
+    if isinstance(row.get('nida_number'), float):
+        # Excel keeps only 15 significant digits of numeric cells
+        errors.append('nida_number was stored as a number and lost digits; format the column as text')
+
+    validators = (
+        ('nida_number', validate_nida_number),
+        ('phone_number', validate_phone_number),
+        ('email', validate_email),
+    )
+    for name, validator in validators:
+        if values[name]:
+            try:
+                validator(values[name])
+            except ValidationError as e:
+                errors.extend(e.messages)
+
+    choices = (
+        ('gender', Resident.GENDER_CHOICES),
+        ('marital_status', Resident.MARITAL_STATUS_CHOICES),
+        ('special_category', Resident.SPECIAL_CATEGORY_CHOICES),
+    )
+    for name, options in choices:
+        if values[name]:
+            try:
+                values[name] = _choice(values[name], options, name.replace('_', ' '))
+            except ValidationError as e:
+                errors.extend(e.messages)
+
+    # Phone numbers are stored without separators so exact phone search hits the index
+    values['phone_number'] = re.sub(r'[\s\-\(\)]', '', values['phone_number'])
+
+    for lengths in (_HOUSEHOLD_LENGTHS, _RESIDENT_LENGTHS):
+        for name, max_length in lengths.items():
+            if len(values[name]) > max_length:
+                errors.append(f'{name} is longer than {max_length} characters')
+
+    birth_date = None
+    if _text(row.get('date_of_birth')):
+        try:
+            birth_date = _date(row.get('date_of_birth'))
+            if birth_date > date.today():
+                errors.append('date_of_birth is in the future')
+        except ValidationError as e:
+            errors.extend(e.messages)
+    else:
+        errors.append('date_of_birth is required')
+
+    if errors:
+        raise ValidationError(errors)
+
+    household = {name: values[name] for name in HOUSEHOLD_COLUMNS}
+    household['ward'] = household['ward'] or 'Ward Office'
+
+    resident = {name: values[name] for name in RESIDENT_COLUMNS if name != 'date_of_birth'}
+    resident['date_of_birth'] = birth_date
+    resident['special_category'] = resident['special_category'] or 'none'
+    resident['relationship_to_head'] = resident['relationship_to_head'] or 'Head'
+    return household, resident
+
+
+class Importer:
+    """
+    Validate and upsert rows in batches.
+
+    Args:
+        report: Optional csv.writer that receives (row, nida_number, errors) for rejected rows
+        batch_size (int): Rows per bulk_create and per transaction
+        dry_run (bool): Validate only; nothing is written to the database
+    """
+
+    def __init__(self, report=None, batch_size=BATCH_SIZE, dry_run=False):
+        self.report = report
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.result = ImportResult()
+
+    def reject(self, number, nida_number, messages):
+        self.result.failed += 1
+        if self.report is not None:
+            self.report.writerow([number, nida_number, '; '.join(messages)])
+
+    def run(self, rows, progress=None):
+        """
+        Import an iterable of (row_number, row) pairs and return the ImportResult.
+
+        ``progress`` is called with the ImportResult after every batch.
+        """
+        batch = []
+        seen = {}
+        for number, row in rows:
+            self.result.rows += 1
+            try:
+                household, resident = clean_row(row)
+            except ValidationError as e:
+                self.reject(number, _text(row.get('nida_number')), e.messages)
+                continue
+
+            # ON CONFLICT cannot touch the same row twice in one statement
+            nida_number = resident['nida_number']
+            if nida_number in seen:
+                self.reject(number, nida_number, [f'Duplicate NIDA number (first seen on row {seen[nida_number]})'])
+                continue
+            seen[nida_number] = number
+            batch.append((number, household, resident))
+
+            if len(batch) >= self.batch_size:
+                self.save_batch(batch)
+                batch = []
+                seen.clear()
+                if progress:
+                    progress(self.result)
+
+        if batch:
+            self.save_batch(batch)
+            if progress:
+                progress(self.result)
+        return self.result
+
+    def save_batch(self, batch):
+        if self.dry_run:
+            return
+        try:
+            with transaction.atomic():
+                self._upsert(batch)
+        except DatabaseError as e:
+            for number, _, resident in batch:
+                self.reject(number, resident['nida_number'], [f'Database error: {e}'])
+
+    def _upsert(self, batch):
+        households = {}
+        for _, household, _ in batch:
+            households.setdefault(household['household_number'], household)
+        Household.objects.bulk_create(
+            [Household(**values) for values in households.values()],
+            update_conflicts=True,
+            unique_fields=['household_number'],
+            update_fields=HOUSEHOLD_UPDATE_FIELDS,
+        )
+        # PKs are not returned for upserted rows, so look them up
+        household_ids = dict(
+            Household.objects.filter(household_number__in=households).values_list('household_number', 'id')
+        )
+
+        nida_numbers = [resident['nida_number'] for _, _, resident in batch]
+        existing = set(
+            Resident.objects.filter(nida_number__in=nida_numbers).values_list('nida_number', flat=True)
+        )
+        Resident.objects.bulk_create(
+            [
+                Resident(household_id=household_ids[household['household_number']], **resident)
+                for _, household, resident in batch
+            ],
+            update_conflicts=True,
+            unique_fields=['nida_number'],
+            update_fields=RESIDENT_UPDATE_FIELDS,
+        )
+
+        # bulk_create sends no post_save signals
+        invalidate('residents')
+
+        self.result.households += len(households)
+        self.result.updated += len(existing)
+        self.result.created += len(batch) - len(existing)
+
+
+def import_file(fileobj, file_format, report_file=None, batch_size=BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Import residents from an open CSV or XLSX file.
+
+    Args:
+        fileobj: Open binary file (seekable for XLSX)
+        file_format (str): 'csv' or 'xlsx'
+        report_file: Optional text file that receives the CSV error report
+    """
+    report = None
+    if report_file is not None:
+        report = csv.writer(report_file)
+        report.writerow(REPORT_HEADER)
+    importer = Importer(report=report, batch_size=batch_size, dry_run=dry_run)
+    return importer.run(read_rows(fileobj, file_format), progress=progress)
@@ -0,0 +1,73 @@
+"""
+Management command to bulk import households and residents from CSV or XLSX
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from residents.importer import BATCH_SIZE, COLUMNS, ImportFileError, detect_format, import_file
+import logging
+
+logger = logging.getLogger('ward_system')
+
+class Command(BaseCommand):
+    help = (
+        'Import households and residents from a CSV or XLSX file. '
+        f'Recognised columns: {", ".join(COLUMNS)}'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'xlsx'],
+            help='File format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write rejected rows to this CSV file (default: <path>.errors.csv)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Rows per bulk insert and transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and write the error report without saving anything',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        report_path = options['report'] or f'{path}.errors.csv'
+        started = time.perf_counter()
+
+        def progress(result):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{result} ({result.rows / elapsed:,.0f} rows/s)')
+
+        try:
+            file_format = options['format'] or detect_format(path)
+            with open(path, 'rb') as source, open(report_path, 'w', newline='', encoding='utf-8') as report:
+                result = import_file(
+                    source,
+                    file_format,
+                    report_file=report,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                    progress=progress,
+                )
+        except (ImportFileError, OSError) as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        summary = f'Imported {result} in {elapsed:.1f}s'
+        if options['dry_run']:
+            summary = (
+                f'Dry run, nothing saved. Checked {result.rows} rows in {elapsed:.1f}s: '
+                f'{result.rows - result.failed} valid, {result.failed} rejected'
+            )
+        self.stdout.write(self.style.SUCCESS(summary))
+        if result.failed:
+            self.stdout.write(self.style.WARNING(f'Rejected rows written to {report_path}'))
+        logger.info(f'Resident import from {path}: {result}')
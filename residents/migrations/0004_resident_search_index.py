@@ -0,0 +1,75 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:06
+
+from django.db import migrations, models
+import utils.validators
+
+
+SEARCH_COLUMNS = 'first_name, middle_name, last_name, nida_number, phone_number'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE residents_resident_fts USING fts5(
+        {SEARCH_COLUMNS},
+        content='residents_resident', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER residents_resident_fts_ai AFTER INSERT ON residents_resident BEGIN
+        INSERT INTO residents_resident_fts(rowid, {SEARCH_COLUMNS})
+        VALUES (new.id, new.first_name, new.middle_name, new.last_name, new.nida_number, new.phone_number);
+    END""",
+    f"""CREATE TRIGGER residents_resident_fts_ad AFTER DELETE ON residents_resident BEGIN
+        INSERT INTO residents_resident_fts(residents_resident_fts, rowid, {SEARCH_COLUMNS})
+        VALUES ('delete', old.id, old.first_name, old.middle_name, old.last_name, old.nida_number, old.phone_number);
+    END""",
+    f"""CREATE TRIGGER residents_resident_fts_au AFTER UPDATE OF {SEARCH_COLUMNS} ON residents_resident BEGIN
+        INSERT INTO residents_resident_fts(residents_resident_fts, rowid, {SEARCH_COLUMNS})
+        VALUES ('delete', old.id, old.first_name, old.middle_name, old.last_name, old.nida_number, old.phone_number);
+        INSERT INTO residents_resident_fts(rowid, {SEARCH_COLUMNS})
+        VALUES (new.id, new.first_name, new.middle_name, new.last_name, new.nida_number, new.phone_number);
+    END""",
+    "INSERT INTO residents_resident_fts(residents_resident_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS residents_resident_fts_au",
+    "DROP TRIGGER IF EXISTS residents_resident_fts_ad",
+    "DROP TRIGGER IF EXISTS residents_resident_fts_ai",
+    "DROP TABLE IF EXISTS residents_resident_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS residents_resident_first_name_trgm ON residents_resident USING gin (first_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS residents_resident_middle_name_trgm ON residents_resident USING gin (middle_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS residents_resident_last_name_trgm ON residents_resident USING gin (last_name gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS residents_resident_first_name_trgm",
+    "DROP INDEX IF EXISTS residents_resident_middle_name_trgm",
+    "DROP INDEX IF EXISTS residents_resident_last_name_trgm",
+]
+
+
+def _run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('residents', '0003_alter_resident_nida_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resident',
+            name='phone_number',
+            field=models.CharField(blank=True, db_index=True, max_length=15, validators=[utils.validators.validate_phone_number]),
+        ),
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
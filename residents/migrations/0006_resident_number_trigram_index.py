@@ -0,0 +1,35 @@
+# Trigram indexes so partial NIDA and phone numbers match anywhere in the
+# number on PostgreSQL, as the SQLite FTS5 trigram table already does
+
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS residents_resident_nida_number_trgm ON residents_resident USING gin (nida_number gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS residents_resident_phone_number_trgm ON residents_resident USING gin (phone_number gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS residents_resident_nida_number_trgm",
+    "DROP INDEX IF EXISTS residents_resident_phone_number_trgm",
+]
+
+
+def _run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('residents', '0005_residentimport'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(POSTGRES_FORWARD), _run(POSTGRES_BACKWARD)),
+    ]
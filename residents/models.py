@@ -52,7 +52,7 @@ class Resident(models.Model):
     religion = models.CharField(max_length=50, blank=True)
     
     # Contact Information
-    phone_number = models.CharField(max_length=15, blank=True, validators=[validate_phone_number])
+    phone_number = models.CharField(max_length=15, blank=True, db_index=True, validators=[validate_phone_number])
     email = models.EmailField(blank=True)
     
     # Additional Information
@@ -84,3 +84,33 @@ class Resident(models.Model):
         from datetime import date
         today = date.today()
         return today.year - self.date_of_birth.year - ((today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day))
+
+class ResidentImport(models.Model):
+    """A CSV/XLSX file of households and residents uploaded for bulk import"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    source_file = models.FileField(upload_to='imports/', help_text="CSV or XLSX file with one resident per row")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Totals, updated after every batch
+    rows = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    error_report = models.FileField(upload_to='imports/reports/', blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.status})"
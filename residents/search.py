@@ -0,0 +1,128 @@
+"""
+Indexed resident search
+
+Exact NIDA numbers and phone numbers are answered from their own indexes.
+Everything else goes to a database-specific text index:
+
+* SQLite: an FTS5 table with the trigram tokenizer, kept in sync with
+  residents_resident by triggers (see migration 0004). SQLite drops
+  triggers when Django rebuilds a table, so migrations that remake
+  residents_resident must recreate them.
+* PostgreSQL: pg_trgm GIN indexes on the name columns, ranked by word
+  similarity. Partial numbers match anywhere in the NIDA or phone number
+  through trigram indexes on those columns (migration 0006), as they do
+  in the SQLite FTS table.
+
+Other backends fall back to the original icontains filters.
+"""
+import re
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from utils.validators import validate_phone_number
+from .models import Resident
+
+FTS_TABLE = 'residents_resident_fts'
+
+# The trigram tokenizer cannot match terms shorter than three characters
+MIN_TERM_LENGTH = 3
+
+NIDA_RE = re.compile(r'^\d{20}$')
+DIGITS_RE = re.compile(r'^\+?\d+$')
+
+def phone_variants(value):
+    """Stored spellings of a phone number: 07..., +2557... and 2557..."""
+    cleaned = re.sub(r'[\s\-\(\)]', '', value)
+    try:
+        validate_phone_number(cleaned)
+    except ValidationError:
+        return []
+    local = cleaned[4:] if cleaned.startswith('+255') else cleaned[1:]
+    return [f'0{local}', f'+255{local}', f'255{local}']
+
+def exact_match(queryset, query):
+    """Fast path for complete NIDA or phone numbers; None when the query is neither"""
+    if NIDA_RE.match(query):
+        return queryset.filter(nida_number=query)
+    variants = phone_variants(query)
+    if variants:
+        return queryset.filter(phone_number__in=variants)
+    return None
+
+def _icontains(queryset, query):
+    return queryset.filter(
+        Q(first_name__icontains=query) |
+        Q(last_name__icontains=query) |
+        Q(nida_number__icontains=query) |
+        Q(phone_number__icontains=query)
+    )
+
+def _sqlite_search(queryset, terms):
+    # Each term becomes a quoted phrase; FTS5 ANDs adjacent phrases
+    match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'search_rank': f'{FTS_TABLE}.rank'},
+    ).order_by('search_rank', 'last_name', 'first_name', 'pk')
+
+def _postgres_search(queryset, query, terms):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+    from django.db.models.functions import Greatest
+
+    if DIGITS_RE.match(query):
+        # LIKE '%...%' on the trigram indexes, so the middle of a number matches as on SQLite
+        return queryset.filter(
+            Q(nida_number__contains=query) | Q(phone_number__contains=query)
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(first_name__trigram_word_similar=term) |
+            Q(middle_name__trigram_word_similar=term) |
+            Q(last_name__trigram_word_similar=term)
+        )
+    return queryset.filter(condition).annotate(
+        search_rank=Greatest(
+            TrigramWordSimilarity(query, 'first_name'),
+            TrigramWordSimilarity(query, 'middle_name'),
+            TrigramWordSimilarity(query, 'last_name'),
+        )
+    ).order_by('-search_rank', 'last_name', 'first_name', 'pk')
+
+def search_residents(queryset, query):
+    """
+    Filter and rank a Resident queryset by a free-text query.
+
+    Complete NIDA and phone numbers take the exact-match fast path; names
+    and partial numbers use the text index for the current database.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    exact = exact_match(queryset, query)
+    if exact is not None:
+        return exact
+
+    terms = [term for term in query.split() if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        return _icontains(queryset, query)
+
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(queryset, terms)
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, query, terms)
+    return _icontains(queryset, query)
+
+def resident_list_queryset(search_query=''):
+    """Active residents as shown on the resident list and in its exports"""
+    residents = (
+        Resident.objects.filter(is_active=True)
+        .select_related('household', 'user')
+        .order_by('last_name', 'first_name', 'pk')
+    )
+    return search_residents(residents, search_query)
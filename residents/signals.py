@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from utils.counters import invalidate
+from utils.images import queue_derivatives
+from .models import Resident
+
+@receiver(post_save, sender=Resident)
+@receiver(post_delete, sender=Resident)
+def refresh_resident_counters(sender, instance, **kwargs):
+    invalidate('residents')
+
+@receiver(post_save, sender=Resident)
+def build_photo_thumbnails(sender, instance, update_fields=None, **kwargs):
+    queue_derivatives(instance.photo, update_fields)
@@ -0,0 +1,61 @@
+"""
+Background tasks for residents
+"""
+import io
+import logging
+import os
+import tempfile
+from django.core.files import File
+from django.utils import timezone
+from jobs.queue import task
+from .importer import ImportFileError, detect_format, import_file
+from .models import ResidentImport
+
+logger = logging.getLogger('ward_system')
+
+@task('residents.import_residents')
+def import_residents(import_id):
+    """Run an uploaded bulk import and store its error report"""
+    resident_import = ResidentImport.objects.get(pk=import_id)
+    if resident_import.status == 'done':
+        return
+
+    def save_progress(result):
+        ResidentImport.objects.filter(pk=import_id).update(
+            rows=result.rows,
+            created=result.created,
+            updated=result.updated,
+            failed=result.failed,
+        )
+
+    ResidentImport.objects.filter(pk=import_id).update(status='running', last_error='')
+
+    with tempfile.TemporaryFile() as report:
+        report_text = io.TextIOWrapper(report, encoding='utf-8', newline='')
+        try:
+            file_format = detect_format(resident_import.source_file.name)
+            with resident_import.source_file.open('rb') as source:
+                result = import_file(source, file_format, report_file=report_text, progress=save_progress)
+        except ImportFileError as e:
+            # The file itself is unusable; retrying will not help
+            ResidentImport.objects.filter(pk=import_id).update(
+                status='failed', last_error=str(e), finished_at=timezone.now()
+            )
+            return
+        except Exception as e:
+            ResidentImport.objects.filter(pk=import_id).update(status='failed', last_error=str(e))
+            raise
+        report_text.flush()
+        report_text.detach()
+
+        save_progress(result)
+        resident_import.refresh_from_db()
+        if result.failed:
+            report.seek(0)
+            name = os.path.splitext(os.path.basename(resident_import.source_file.name))[0]
+            resident_import.error_report.save(f'{name}_errors.csv', File(report), save=False)
+        resident_import.status = 'done'
+        resident_import.finished_at = timezone.now()
+        resident_import.save(update_fields=['error_report', 'status', 'finished_at'])
+
+    logger.info(f'Resident import {import_id} finished: {result}')
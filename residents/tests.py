@@ -1,3 +1,110 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
+from datetime import date
+from unittest import mock
+from django.test import TestCase, override_settings
+from accounts.models import User
+from utils import images
+from .importer import import_file
+from .models import Household, Resident
 
-# Create your tests here.
+
+class MediaAccessTests(TestCase):
+    def setUp(self):
+        # The audit sink's thread writes through its own connection, which cannot see the test transaction
+        patcher = mock.patch('audit.sink.record')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for name in ('resident_photos/asha.jpg', 'resident_photos/juma.jpg',
+                     images.derivative_name('resident_photos/juma.jpg', 'small'),
+                     'generated_letters/letter.pdf', 'uploads/new.txt'):
+            os.makedirs(os.path.join(media, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(media, name), 'wb') as f:
+                f.write(b'data')
+
+        household = Household.objects.create(household_number='HH1', street_name='Main', house_number='1', ward='Saranga')
+        self.asha = User.objects.create_user('asha', role='resident')
+        self.juma = User.objects.create_user('juma', role='resident')
+        self.clerk = User.objects.create_user('clerk', role='clerk')
+        for user, nida in ((self.asha, '1'), (self.juma, '2')):
+            Resident.objects.create(
+                user=user, household=household, first_name=user.username, last_name='Test', nida_number=nida * 20,
+                date_of_birth=date(1990, 1, 1), gender='F', marital_status='single',
+                photo=f'resident_photos/{user.username}.jpg',
+            )
+
+    def get(self, user, path):
+        self.client.force_login(user)
+        return self.client.get(f'/media/{path}', secure=True)
+
+    def test_resident_reads_own_photo_and_thumbnails(self):
+        self.assertEqual(self.get(self.juma, 'resident_photos/juma.jpg').status_code, 200)
+        thumbnail = images.derivative_name('resident_photos/juma.jpg', 'small')
+        self.assertEqual(self.get(self.juma, thumbnail).status_code, 200)
+
+    def test_resident_cannot_read_other_photos(self):
+        self.assertEqual(self.get(self.asha, 'resident_photos/juma.jpg').status_code, 404)
+        thumbnail = images.derivative_name('resident_photos/juma.jpg', 'small')
+        self.assertEqual(self.get(self.asha, thumbnail).status_code, 404)
+
+    def test_staff_read_any_photo(self):
+        self.assertEqual(self.get(self.clerk, 'resident_photos/asha.jpg').status_code, 200)
+
+    def test_unlisted_directories_are_not_served(self):
+        for path in ('generated_letters/letter.pdf', 'uploads/new.txt'):
+            self.assertEqual(self.get(self.clerk, path).status_code, 404)
+
+    def test_anonymous_is_sent_to_login(self):
+        self.assertEqual(self.client.get('/media/resident_photos/asha.jpg', secure=True).status_code, 302)
+
+
+class ImportTests(TestCase):
+    header = 'household_number,street_name,house_number,first_name,last_name,nida_number,date_of_birth,gender,marital_status'
+
+    def run_import(self, *lines):
+        data = io.BytesIO('\n'.join((self.header,) + lines).encode())
+        report = io.StringIO()
+        result = import_file(data, 'csv', report_file=report)
+        report.seek(0)
+        return result, list(csv.reader(report))[1:]
+
+    def test_creates_then_updates_by_nida_number(self):
+        result, errors = self.run_import('HH1,Main,1,Asha,Juma,' + '1' * 20 + ',1990-01-01,F,single')
+        self.assertEqual((result.created, result.updated, errors), (1, 0, []))
+
+        result, errors = self.run_import('HH1,Main,1,Asha,Mussa,' + '1' * 20 + ',01/01/1990,Female,Married')
+        self.assertEqual((result.created, result.updated, errors), (0, 1, []))
+        resident = Resident.objects.get()
+        self.assertEqual((resident.last_name, resident.gender, resident.marital_status), ('Mussa', 'F', 'married'))
+        self.assertEqual(Household.objects.count(), 1)
+
+    def test_duplicate_nida_number_in_file_is_rejected(self):
+        result, errors = self.run_import(
+            'HH1,Main,1,Asha,Juma,' + '1' * 20 + ',1990-01-01,F,single',
+            'HH2,Main,2,Neema,Juma,' + '1' * 20 + ',1991-01-01,F,single',
+        )
+        self.assertEqual((result.created, result.failed), (1, 1))
+        self.assertEqual(errors, [['3', '1' * 20, 'Duplicate NIDA number (first seen on row 2)']])
+        self.assertEqual(Resident.objects.get().first_name, 'Asha')
+
+    def test_invalid_rows_are_reported_with_every_error(self):
+        result, errors = self.run_import(
+            'HH1,Main,1,Asha,,123,2999-01-01,X,single',
+            'HH1,Main,1,Juma,Ali,' + '2' * 20 + ',1990-01-01,M,single',
+        )
+        self.assertEqual((result.rows, result.created, result.failed), (2, 1, 1))
+        self.assertEqual(len(errors), 1)
+        number, nida_number, messages = errors[0]
+        self.assertEqual((number, nida_number), ('2', '123'))
+        for message in ('last_name is required', 'NIDA number must be exactly 20 digits',
+                        'date_of_birth is in the future', 'Invalid gender "X"'):
+            self.assertIn(message, messages)
+        self.assertEqual(Resident.objects.get().first_name, 'Juma')
@@ -5,6 +5,7 @@ app_name = 'residents'
 
 urlpatterns = [
     path('', views.resident_list, name='list'),
+    path('export/', views.resident_export, name='export'),
     path('register/', views.resident_register, name='register'),
     path('profile/', views.resident_profile, name='profile'),
     path('profile/<int:pk>/', views.resident_detail, name='detail'),
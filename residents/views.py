@@ -1,11 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
 from .models import Resident, Household
 from .forms import ResidentRegistrationForm, HouseholdForm
+from .search import resident_list_queryset
 from accounts.models import User
+from utils.counters import get_user_letter_counters
+from utils.exports import FORMATS, export_response
+from utils.pagination import CursorPaginator
+from .exports import RESIDENT_COLUMNS
 
 @login_required
 def resident_list(request):
@@ -14,29 +17,34 @@ def resident_list(request):
         return redirect('home')
     
     search_query = request.GET.get('search', '')
-    residents = (
-        Resident.objects.filter(is_active=True)
-        .select_related('household', 'user')
-        .order_by('last_name', 'first_name', 'pk')
-    )
+    # Indexed, ranked search; exact NIDA/phone numbers use their own index
+    residents = resident_list_queryset(search_query)
     
     if search_query:
-        residents = residents.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(nida_number__icontains=search_query) |
-            Q(phone_number__icontains=search_query)
-        )
-    
-    paginator = Paginator(residents, 20)
-    page_number = request.GET.get('page')
-    residents = paginator.get_page(page_number)
+        # Ranked results keep their own ordering and are paged by offset
+        paginator = CursorPaginator(residents, 20, count='approximate')
+    else:
+        paginator = CursorPaginator(residents, 20, ordering=('last_name', 'first_name', 'pk'), count='approximate')
+    residents = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'residents/list.html', {
         'residents': residents,
         'search_query': search_query
     })
 
+@login_required
+def resident_export(request):
+    if request.user.role != 'admin':
+        messages.error(request, 'Access denied. Admin privileges required.')
+        return redirect('home')
+    
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in FORMATS:
+        file_format = 'csv'
+    
+    residents = resident_list_queryset(request.GET.get('search', ''))
+    return export_response(file_format, 'residents', residents, RESIDENT_COLUMNS, title='Residents')
+
 @login_required
 def resident_register(request):
     # Residents should be able to complete their own registration.
@@ -77,16 +85,9 @@ def resident_register(request):
 def resident_profile(request):
     try:
         resident = request.user.resident
-        # Get statistics for the resident
-        from letters.models import LetterRequest
-        letter_requests = LetterRequest.objects.filter(requested_by=request.user)
-        
-        context = {
-            'resident': resident,
-            'letter_requests_count': letter_requests.count(),
-            'approved_requests_count': letter_requests.filter(status='approved').count(),
-            'pending_requests_count': letter_requests.filter(status='pending').count(),
-        }
+        # Letter request statistics for the resident, from the cache
+        context = {'resident': resident}
+        context.update(get_user_letter_counters(request.user.pk))
         return render(request, 'residents/profile.html', context)
     except Resident.DoesNotExist:
         messages.info(request, 'Please complete your resident registration.')
@@ -0,0 +1,61 @@
+/*
+ * Live updates for signed-in users: letter status changes and new
+ * announcements arrive over server-sent events and are shown as alerts,
+ * so there is no need to keep refreshing the page. For staff, elements
+ * marked data-occupancy-total follow the number of visitors inside.
+ */
+(function () {
+    var body = document.body;
+    var url = body.dataset.eventStream;
+    if (!url || !window.EventSource) {
+        return;
+    }
+
+    var area = document.getElementById('live-updates');
+
+    function show(level, text, link, linkText) {
+        var alert = document.createElement('div');
+        alert.className = 'alert alert-' + level + ' alert-dismissible fade show';
+        alert.setAttribute('role', 'alert');
+        alert.appendChild(document.createTextNode(text + ' '));
+        if (link) {
+            var anchor = document.createElement('a');
+            anchor.href = link;
+            anchor.className = 'alert-link';
+            anchor.textContent = linkText;
+            alert.appendChild(anchor);
+        }
+        var close = document.createElement('button');
+        close.type = 'button';
+        close.className = 'btn-close';
+        close.setAttribute('data-bs-dismiss', 'alert');
+        alert.appendChild(close);
+        area.prepend(alert);
+    }
+
+    // Credentials so the session cookie goes along when the stream has its own host
+    var source = new EventSource(url, {withCredentials: true});
+
+    source.addEventListener('letter_status', function (event) {
+        var data = JSON.parse(event.data);
+        var level = {approved: 'success', completed: 'success', rejected: 'danger'}[data.status] || 'info';
+        if (data.ready) {
+            show('success', data.message, data.download_url, 'Download');
+        } else {
+            show(level, data.message, data.url, 'View request');
+        }
+    });
+
+    source.addEventListener('announcement', function (event) {
+        var data = JSON.parse(event.data);
+        var level = {urgent: 'danger', high: 'warning'}[data.priority] || 'info';
+        show(level, 'New announcement: ' + data.title + '.', data.url, 'Read it');
+    });
+
+    source.addEventListener('occupancy', function (event) {
+        var data = JSON.parse(event.data);
+        document.querySelectorAll('[data-occupancy-total]').forEach(function (element) {
+            element.textContent = data.total;
+        });
+    });
+})();
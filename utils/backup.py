@@ -0,0 +1,665 @@
+"""
+Backup engine for Ward Resident System
+
+A backup is a snapshot directory under BACKUP_ROOT holding a compressed
+database dump and a manifest.json. Media files are not copied into each
+snapshot; they are stored once in a content-addressed object store
+(BACKUP_ROOT/objects/<sha256[:2]>/<sha256>), and the manifest maps every
+media path to its object. A nightly run therefore only writes files that
+are new or changed, and deleting old snapshots leaves objects that are
+still referenced in place.
+
+    backups/
+        objects/ab/ab12...ef.zst
+        media-index.json            size/mtime -> sha256 cache, avoids rehashing
+        snapshots/20261018_020000/
+            database.sqlite3.zst
+            manifest.json
+
+The database is captured online: SQLite through the sqlite3 backup API
+(a consistent copy even while the site is writing), PostgreSQL through
+pg_dump streamed straight into the compressor. Output is zstd-compressed
+when the ``zstandard`` package is installed, gzip otherwise.
+
+Media is copied, checked and restored by a thread pool (BACKUP_WORKERS):
+the work is file I/O, hashing and (de)compression, all of which release
+the GIL, so threads overlap well.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.db import connection, connections
+
+MANIFEST_VERSION = 1
+
+READ_SIZE = 1024 * 1024
+
+# Already compressed; compressing them again costs CPU and saves nothing
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.ico', '.pdf',
+    '.zip', '.gz', '.zst', '.xlsx', '.docx', '.mp4',
+}
+
+CODEC_EXTENSIONS = {'zstd': '.zst', 'gzip': '.gz', 'none': ''}
+
+
+class BackupError(Exception):
+    pass
+
+
+def default_workers():
+    return getattr(settings, 'BACKUP_WORKERS', None) or min(32, (os.cpu_count() or 1) + 4)
+
+
+class Progress:
+    """Thread-safe file/byte counter that calls ``callback(done, total, done_bytes)``"""
+
+    def __init__(self, total, callback=None):
+        self.total = total
+        self.callback = callback
+        self.done = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def advance(self, size):
+        with self._lock:
+            self.done += 1
+            self.bytes += size
+            if self.callback:
+                self.callback(self.done, self.total, self.bytes)
+
+
+# -------------------------
+# Compression
+# -------------------------
+
+def default_codec():
+    preferred = getattr(settings, 'BACKUP_COMPRESSION', 'auto')
+    if preferred != 'auto':
+        return preferred
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return 'gzip'
+    return 'zstd'
+
+
+def open_compressed(path, codec, mode='rb'):
+    """Open ``path`` for streaming binary reads ('rb') or writes ('wb') through ``codec``"""
+    if codec == 'gzip':
+        return gzip.open(path, mode, compresslevel=6)
+    if codec == 'none':
+        return open(path, mode)
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise BackupError('zstd backups need the "zstandard" package')
+        fileobj = open(path, mode)
+        if mode == 'wb':
+            return zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(fileobj, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=True)
+    raise BackupError(f'Unknown compression "{codec}"')
+
+
+def copy_stream(source, target, digest=None):
+    """Copy one binary stream to another in chunks; returns the number of bytes"""
+    size = 0
+    while True:
+        chunk = source.read(READ_SIZE)
+        if not chunk:
+            return size
+        if digest is not None:
+            digest.update(chunk)
+        target.write(chunk)
+        size += len(chunk)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(READ_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# -------------------------
+# Layout
+# -------------------------
+
+def backup_root():
+    return str(getattr(settings, 'BACKUP_ROOT', os.path.join(settings.BASE_DIR, 'backups')))
+
+
+def snapshots_dir(root=None):
+    return os.path.join(root or backup_root(), 'snapshots')
+
+
+def object_path(root, sha256, codec):
+    return os.path.join(root, 'objects', sha256[:2], sha256 + CODEC_EXTENSIONS[codec])
+
+
+def list_snapshots(root=None):
+    """Snapshot names, oldest first"""
+    directory = snapshots_dir(root)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, name, 'manifest.json'))
+    )
+
+
+def load_manifest(name, root=None):
+    path = os.path.join(snapshots_dir(root), name, 'manifest.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise BackupError(f'No backup named "{name}"')
+
+
+# -------------------------
+# Database
+# -------------------------
+
+def database_vendor():
+    return connection.vendor
+
+
+def dump_database(snapshot_dir, codec):
+    """Write a consistent, compressed dump of the default database; returns its manifest entry"""
+    vendor = database_vendor()
+    if vendor == 'sqlite':
+        filename = 'database.sqlite3' + CODEC_EXTENSIONS[codec]
+        size, sha256 = _dump_sqlite(os.path.join(snapshot_dir, filename), codec)
+    elif vendor == 'postgresql':
+        filename = 'database.pgdump' + CODEC_EXTENSIONS[codec]
+        size, sha256 = _dump_postgres(os.path.join(snapshot_dir, filename), codec)
+    else:
+        raise BackupError(f'Backups are not supported for the {vendor} database backend')
+    return {'vendor': vendor, 'file': filename, 'codec': codec, 'size': size, 'sha256': sha256}
+
+
+def _dump_sqlite(target, codec):
+    db_path = settings.DATABASES['default']['NAME']
+    if not os.path.exists(db_path):
+        raise BackupError(f'Database file not found: {db_path}')
+
+    # The backup API copies pages under SQLite's own locking, so concurrent
+    # writes never produce a torn copy; the copy goes to a scratch file first
+    fd, scratch = tempfile.mkstemp(suffix='.sqlite3', dir=os.path.dirname(target))
+    os.close(fd)
+    try:
+        source = sqlite3.connect(db_path)
+        dest = sqlite3.connect(scratch)
+        try:
+            with dest:
+                source.backup(dest, pages=4096)
+        finally:
+            dest.close()
+            source.close()
+
+        digest = hashlib.sha256()
+        with open(scratch, 'rb') as src, open_compressed(target, codec, 'wb') as out:
+            size = copy_stream(src, out, digest)
+        return size, digest.hexdigest()
+    finally:
+        os.remove(scratch)
+
+
+def pg_environment():
+    """Connection arguments and environment for pg_dump/pg_restore from DATABASES['default']"""
+    db = settings.DATABASES['default']
+    args = []
+    if db.get('HOST'):
+        args += ['--host', str(db['HOST'])]
+    if db.get('PORT'):
+        args += ['--port', str(db['PORT'])]
+    if db.get('USER'):
+        args += ['--username', str(db['USER'])]
+    env = dict(os.environ)
+    if db.get('PASSWORD'):
+        env['PGPASSWORD'] = str(db['PASSWORD'])
+    return args, env, db['NAME']
+
+
+def _dump_postgres(target, codec):
+    args, env, name = pg_environment()
+    # Custom format so restores can use pg_restore --jobs; its own compression is
+    # turned off because the stream is compressed here
+    command = ['pg_dump', '--format=custom', '--compress=0', '--no-owner', '--no-privileges', *args, name]
+    # Warnings go to a file: a stderr pipe left unread while stdout is copied
+    # would block pg_dump, and this process with it, once the pipe filled
+    with tempfile.TemporaryFile() as errors:
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors, env=env)
+        except FileNotFoundError:
+            raise BackupError('pg_dump was not found on PATH')
+
+        digest = hashlib.sha256()
+        with process, open_compressed(target, codec, 'wb') as out:
+            size = copy_stream(process.stdout, out, digest)
+        if process.returncode != 0:
+            errors.seek(0)
+            # The error itself comes last, after any warnings
+            stderr = errors.read().decode(errors='replace').strip()[-2000:]
+            raise BackupError(f'pg_dump failed ({process.returncode}): {stderr}')
+    return size, digest.hexdigest()
+
+
+# -------------------------
+# Media
+# -------------------------
+
+class MediaStore:
+    """
+    Content-addressed media objects plus the size/mtime index that lets
+    unchanged files skip hashing.
+    """
+
+    def __init__(self, root, codec):
+        self.root = root
+        self.codec = codec
+        self.index_path = os.path.join(root, 'media-index.json')
+        self.index = {}
+        self.new_objects = 0
+        self.new_bytes = 0
+        self._lock = threading.Lock()
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def codec_for(self, path):
+        return 'none' if os.path.splitext(path)[1].lower() in STORED_EXTENSIONS else self.codec
+
+    def add(self, path, relpath):
+        """Store one file if its content is new; returns its manifest entry"""
+        stat = os.stat(path)
+        cached = self.index.get(relpath)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            sha256 = cached['sha256']
+        else:
+            sha256 = file_sha256(path)
+        self.index[relpath] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+        codec = self.codec_for(relpath)
+        target = object_path(self.root, sha256, codec)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Written under a temporary name so an interrupted run never leaves a partial object
+            fd, scratch = tempfile.mkstemp(dir=os.path.dirname(target))
+            os.close(fd)
+            try:
+                with open(path, 'rb') as src, open_compressed(scratch, codec, 'wb') as out:
+                    copy_stream(src, out)
+                os.replace(scratch, target)
+            except BaseException:
+                os.remove(scratch)
+                raise
+            with self._lock:
+                self.new_objects += 1
+                self.new_bytes += stat.st_size
+        return {'sha256': sha256, 'size': stat.st_size, 'codec': codec}
+
+    def save_index(self, seen):
+        # Forget files that no longer exist so the index does not grow forever
+        self.index = {relpath: entry for relpath, entry in self.index.items() if relpath in seen}
+        scratch = self.index_path + '.tmp'
+        with open(scratch, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(scratch, self.index_path)
+
+
+def walk_media(media_root):
+    """(path, relpath) for every file under ``media_root``"""
+    if not os.path.isdir(media_root):
+        return []
+    found = []
+    for directory, _, filenames in os.walk(media_root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            found.append((path, os.path.relpath(path, media_root).replace(os.sep, '/')))
+    return found
+
+
+def backup_media(store, media_root, workers=None, progress=None):
+    paths = walk_media(media_root)
+    tracker = Progress(len(paths), progress)
+
+    def add(item):
+        entry = store.add(*item)
+        tracker.advance(entry['size'])
+        return entry
+
+    with ThreadPoolExecutor(workers or default_workers()) as pool:
+        files = {relpath: entry for (_, relpath), entry in zip(paths, pool.map(add, paths))}
+    store.save_index(files)
+    return files
+
+
+# -------------------------
+# Verification
+# -------------------------
+
+def verify_database(snapshot_dir, entry):
+    """Decompress the dump, check its checksum and that the database engine can read it"""
+    path = os.path.join(snapshot_dir, entry['file'])
+    if not os.path.exists(path):
+        raise BackupError(f'Database dump missing: {path}')
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        scratch = os.path.join(scratch_dir, 'restore-check')
+        digest = hashlib.sha256()
+        with open_compressed(path, entry['codec'], 'rb') as src, open(scratch, 'wb') as out:
+            copy_stream(src, out, digest)
+        if digest.hexdigest() != entry['sha256']:
+            raise BackupError('Database dump checksum mismatch')
+
+        if entry['vendor'] == 'sqlite':
+            check = sqlite3.connect(scratch)
+            try:
+                result = check.execute('PRAGMA integrity_check').fetchone()[0]
+                tables = check.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+            finally:
+                check.close()
+            if result != 'ok':
+                raise BackupError(f'SQLite integrity check failed: {result}')
+            if not tables:
+                raise BackupError('Restored SQLite database has no tables')
+        elif entry['vendor'] == 'postgresql':
+            try:
+                listing = subprocess.run(['pg_restore', '--list', scratch], capture_output=True)
+            except FileNotFoundError:
+                raise BackupError('pg_restore was not found on PATH')
+            if listing.returncode != 0:
+                raise BackupError(f'pg_restore cannot read the dump: {listing.stderr.decode(errors="replace").strip()}')
+
+
+def object_sha256(path, codec):
+    digest = hashlib.sha256()
+    with open_compressed(path, codec, 'rb') as src:
+        while chunk := src.read(READ_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_media(root, files, deep=False, workers=None, progress=None):
+    """
+    Check that every object a snapshot needs exists. With ``deep``, also
+    decompress each one and compare its checksum, in parallel. Returns the
+    problems found.
+    """
+    objects = {}
+    for relpath, entry in files.items():
+        objects.setdefault((entry['sha256'], entry['codec']), (relpath, entry['size']))
+    tracker = Progress(len(objects), progress)
+
+    def check(item):
+        (sha256, codec), (relpath, size) = item
+        path = object_path(root, sha256, codec)
+        try:
+            if not os.path.exists(path):
+                return f'{relpath}: object {sha256[:12]} missing'
+            if deep and object_sha256(path, codec) != sha256:
+                return f'{relpath}: object {sha256[:12]} is corrupt'
+        except Exception as e:
+            return f'{relpath}: object {sha256[:12]} unreadable ({e})'
+        finally:
+            tracker.advance(size)
+        return None
+
+    if not deep:
+        return [problem for problem in map(check, objects.items()) if problem]
+    with ThreadPoolExecutor(workers or default_workers()) as pool:
+        return [problem for problem in pool.map(check, objects.items()) if problem]
+
+
+def verify_snapshot(name, root=None, deep=False, workers=None, progress=None):
+    """Restore-check a snapshot; raises BackupError describing the first problems found"""
+    root = root or backup_root()
+    manifest = load_manifest(name, root)
+    verify_database(os.path.join(snapshots_dir(root), name), manifest['database'])
+    problems = verify_media(root, manifest['media'], deep=deep, workers=workers, progress=progress)
+    if problems:
+        raise BackupError(f'{len(problems)} media problem(s): ' + '; '.join(problems[:5]))
+    return manifest
+
+
+# -------------------------
+# Backup and retention
+# -------------------------
+
+def create_backup(root=None, codec=None, verify=True, workers=None, progress=None):
+    """
+    Take a full snapshot of the database and an incremental one of MEDIA_ROOT.
+
+    ``progress(done, total, done_bytes)`` is called as media files are stored.
+    """
+    root = root or backup_root()
+    codec = codec or default_codec()
+    name = stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    suffix = 1
+    while os.path.exists(os.path.join(snapshots_dir(root), name)):
+        suffix += 1
+        name = f'{stamp}_{suffix}'
+    final_dir = os.path.join(snapshots_dir(root), name)
+    work_dir = final_dir + '.partial'
+    os.makedirs(work_dir)
+
+    try:
+        database = dump_database(work_dir, codec)
+        store = MediaStore(root, codec)
+        media = backup_media(store, str(settings.MEDIA_ROOT), workers, progress)
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'name': name,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'database': database,
+            'media': media,
+            'stats': {
+                'media_files': len(media),
+                'media_bytes': sum(entry['size'] for entry in media.values()),
+                'new_objects': store.new_objects,
+                'new_bytes': store.new_bytes,
+            },
+        }
+        with open(os.path.join(work_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+
+        if verify:
+            verify_database(work_dir, database)
+            problems = verify_media(root, media)
+            if problems:
+                raise BackupError(f'{len(problems)} media problem(s): ' + '; '.join(problems[:5]))
+        # Only a complete, verified snapshot gets its final name
+        os.replace(work_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    return final_dir, manifest
+
+
+def prune_backups(retention_days, root=None, keep=1):
+    """
+    Delete snapshots older than ``retention_days`` (always keeping the newest
+    ``keep``), then objects no remaining snapshot refers to. Returns
+    (removed snapshot names, removed object count).
+    """
+    root = root or backup_root()
+    cutoff = datetime.now().timestamp() - retention_days * 24 * 3600
+    snapshots = list_snapshots(root)
+
+    removed = []
+    for name in snapshots[:max(len(snapshots) - keep, 0)]:
+        path = os.path.join(snapshots_dir(root), name)
+        if os.path.getmtime(os.path.join(path, 'manifest.json')) < cutoff:
+            shutil.rmtree(path)
+            removed.append(name)
+
+    # Leftovers from interrupted runs
+    if os.path.isdir(snapshots_dir(root)):
+        for name in os.listdir(snapshots_dir(root)):
+            if name.endswith('.partial'):
+                shutil.rmtree(os.path.join(snapshots_dir(root), name), ignore_errors=True)
+
+    referenced = set()
+    for name in list_snapshots(root):
+        for entry in load_manifest(name, root)['media'].values():
+            referenced.add(os.path.basename(object_path(root, entry['sha256'], entry['codec'])))
+
+    removed_objects = 0
+    objects_dir = os.path.join(root, 'objects')
+    if os.path.isdir(objects_dir):
+        for directory, _, filenames in os.walk(objects_dir):
+            for filename in filenames:
+                if filename not in referenced:
+                    os.remove(os.path.join(directory, filename))
+                    removed_objects += 1
+    return removed, removed_objects
+
+
+# -------------------------
+# Restore
+# -------------------------
+
+def _decompress_checked(path, codec, sha256, target):
+    """Decompress ``path`` into ``target`` via a scratch file, replacing it only if the checksum matches"""
+    fd, scratch = tempfile.mkstemp(dir=os.path.dirname(target) or '.', prefix='.restore-')
+    os.close(fd)
+    try:
+        digest = hashlib.sha256()
+        with open_compressed(path, codec, 'rb') as src, open(scratch, 'wb') as out:
+            size = copy_stream(src, out, digest)
+        if digest.hexdigest() != sha256:
+            raise BackupError(f'Checksum mismatch for {os.path.basename(path)}')
+        os.replace(scratch, target)
+        return size
+    except BaseException:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+        raise
+
+
+def restore_database(snapshot_dir, entry, jobs=None):
+    """Replace the default database with the dump in ``snapshot_dir``"""
+    path = os.path.join(snapshot_dir, entry['file'])
+    vendor = database_vendor()
+    if entry['vendor'] != vendor:
+        raise BackupError(f'Backup holds a {entry["vendor"]} database but this site uses {vendor}')
+
+    if vendor == 'sqlite':
+        db_path = settings.DATABASES['default']['NAME']
+        fd, scratch = tempfile.mkstemp(suffix='.sqlite3', dir=os.path.dirname(db_path) or '.')
+        os.close(fd)
+        try:
+            _decompress_checked(path, entry['codec'], entry['sha256'], scratch)
+            check = sqlite3.connect(scratch)
+            try:
+                result = check.execute('PRAGMA integrity_check').fetchone()[0]
+            finally:
+                check.close()
+            if result != 'ok':
+                raise BackupError(f'SQLite integrity check failed: {result}')
+            connections.close_all()
+            # A leftover write-ahead log would be replayed onto the restored file
+            for suffix in ('-wal', '-shm', '-journal'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            os.replace(scratch, db_path)
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
+        return entry['size']
+
+    args, env, name = pg_environment()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        # pg_restore --jobs needs a seekable archive, so the dump is unpacked to disk first
+        scratch = os.path.join(scratch_dir, 'database.pgdump')
+        _decompress_checked(path, entry['codec'], entry['sha256'], scratch)
+        connections.close_all()
+        command = [
+            'pg_restore', '--clean', '--if-exists', '--no-owner', '--no-privileges',
+            f'--jobs={jobs or default_workers()}', *args, '--dbname', name, scratch,
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True, env=env)
+        except FileNotFoundError:
+            raise BackupError('pg_restore was not found on PATH')
+        if result.returncode != 0:
+            raise BackupError(f'pg_restore failed ({result.returncode}): {result.stderr.decode(errors="replace").strip()}')
+    return entry['size']
+
+
+def restore_media(root, files, media_root, workers=None, progress=None):
+    """
+    Rebuild ``media_root`` from a snapshot's file list, in parallel. Files
+    already present with the right checksum are left alone; every restored
+    file is checked against its checksum before it replaces anything.
+
+    Returns {'files', 'restored', 'skipped', 'bytes'}; raises BackupError
+    listing the files that failed once all others are done.
+    """
+    media_root = os.path.abspath(media_root)
+    tracker = Progress(len(files), progress)
+    counts = {'restored': 0, 'skipped': 0}
+    lock = threading.Lock()
+
+    def restore(item):
+        relpath, entry = item
+        target = os.path.abspath(os.path.join(media_root, relpath))
+        try:
+            if not target.startswith(media_root + os.sep):
+                return f'{relpath}: path escapes MEDIA_ROOT'
+            if (
+                os.path.exists(target)
+                and os.path.getsize(target) == entry['size']
+                and file_sha256(target) == entry['sha256']
+            ):
+                outcome = 'skipped'
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _decompress_checked(
+                    object_path(root, entry['sha256'], entry['codec']), entry['codec'], entry['sha256'], target,
+                )
+                outcome = 'restored'
+            with lock:
+                counts[outcome] += 1
+        except Exception as e:
+            return f'{relpath}: {e}'
+        finally:
+            tracker.advance(entry['size'])
+        return None
+
+    with ThreadPoolExecutor(workers or default_workers()) as pool:
+        problems = [problem for problem in pool.map(restore, files.items()) if problem]
+    if problems:
+        raise BackupError(f'{len(problems)} media file(s) could not be restored: ' + '; '.join(problems[:5]))
+    return {'files': len(files), 'bytes': tracker.bytes, **counts}
+
+
+def restore_snapshot(name, root=None, database=True, media=True, media_root=None, workers=None, progress=None):
+    """
+    Restore a snapshot's database and/or media. Media goes to ``media_root``
+    (default MEDIA_ROOT). Returns the manifest and the media restore counts.
+    """
+    root = root or backup_root()
+    manifest = load_manifest(name, root)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise BackupError(f'Unsupported backup manifest version {manifest.get("version")}')
+
+    media_stats = None
+    if media:
+        media_stats = restore_media(root, manifest['media'], str(media_root or settings.MEDIA_ROOT), workers, progress)
+    if database:
+        restore_database(os.path.join(snapshots_dir(root), name), manifest['database'], jobs=workers)
+    return manifest, media_stats
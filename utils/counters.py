@@ -0,0 +1,79 @@
+"""
+Cached dashboard counters for Ward Resident System
+
+Each group of counters is computed with one conditional-aggregation query
+and cached under its own key, so a dashboard hit costs a single cache
+lookup. Model signals (see the apps' signals.py) delete exactly the groups
+a change can affect once the transaction commits; the short TTL bounds
+staleness for writes that bypass signals, such as QuerySet.update().
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from letters.models import LetterRequest
+from residents.models import Resident
+from utils.metrics import record_cache
+from visitors.models import Visitor
+
+TIMEOUT = getattr(settings, 'DASHBOARD_COUNTER_TIMEOUT', 60)
+
+KEY_PREFIX = 'counters'
+
+# Group name -> function returning {counter name: value} in one query
+GROUPS = {
+    'residents': lambda: Resident.objects.aggregate(
+        total_residents=Count('pk', filter=Q(is_active=True)),
+    ),
+    'letters': lambda: LetterRequest.objects.aggregate(
+        pending_requests=Count('pk', filter=Q(status='pending')),
+        completed_requests=Count('pk', filter=Q(status='completed')),
+    ),
+    'visitors': lambda: {'active_visitors': Visitor.objects.active().count()},
+}
+
+ADMIN_GROUPS = ('residents', 'letters', 'visitors')
+
+def _user_letters(user_id):
+    return LetterRequest.objects.filter(requested_by_id=user_id).aggregate(
+        letter_requests_count=Count('pk'),
+        approved_requests_count=Count('pk', filter=Q(status='approved')),
+        pending_requests_count=Count('pk', filter=Q(status='pending')),
+    )
+
+def _group_key(group):
+    return f'{KEY_PREFIX}:{group}'
+
+def _user_key(user_id):
+    return f'{KEY_PREFIX}:letters:user:{user_id}'
+
+def get_counters(groups=ADMIN_GROUPS):
+    """Merged counters for the given groups, computing only those not in the cache"""
+    keys = {_group_key(group): group for group in groups}
+    cached = cache.get_many(keys)
+
+    missing = {key: GROUPS[group]() for key, group in keys.items() if key not in cached}
+    record_cache(hits=len(cached), misses=len(missing))
+    if missing:
+        cache.set_many(missing, TIMEOUT)
+        cached.update(missing)
+
+    counters = {}
+    for values in cached.values():
+        counters.update(values)
+    return counters
+
+def get_user_letter_counters(user_id):
+    """Letter request totals for one requesting user"""
+    key = _user_key(user_id)
+    counters = cache.get(key)
+    record_cache(hits=counters is not None, misses=counters is None)
+    if counters is None:
+        counters = _user_letters(user_id)
+        cache.set(key, counters, TIMEOUT)
+    return counters
+
+def invalidate(*groups, user_ids=()):
+    """Drop cached counter groups (and per-user letter totals) after the current transaction commits"""
+    keys = [_group_key(group) for group in groups] + [_user_key(user_id) for user_id in user_ids if user_id]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -4,9 +4,10 @@ Custom decorators for Ward Resident System
 from functools import wraps
 from django.http import HttpResponseForbidden
 from django.contrib import messages
-from django.shortcuts import redirect
-from django.core.cache import cache
+from django.shortcuts import redirect, render
 from django.http import HttpResponse
+from utils import ratelimit
+import math
 import time
 import logging
 
@@ -30,42 +31,39 @@ def role_required(allowed_roles):
         return _wrapped_view
     return decorator
 
-def rate_limit(key_prefix, limit=5, window=300):
+def rate_limit(policy_name):
     """
     Rate limiting decorator that works with both authenticated and anonymous users.
     
+    Limits come from settings.RATE_LIMITS[policy_name] (see utils.ratelimit);
+    authenticated users are counted by user ID, anonymous ones by IP.
+    
     Args:
-        key_prefix (str): Prefix for the cache key
-        limit (int): Number of requests allowed within the time window
-        window (int): Time window in seconds
+        policy_name (str): Key of the policy in settings.RATE_LIMITS
     """
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
+            policy = ratelimit.get_policy(policy_name)
+            rate = ratelimit.rate_for(policy, request.user)
+            if rate is None:
+                return view_func(request, *args, **kwargs)
+            
             # Use user ID if authenticated, otherwise fall back to IP
             if request.user.is_authenticated:
                 identifier = f"user:{request.user.id}"
-                # Staff users are exempt from rate limiting
-                if hasattr(request.user, 'is_staff') and request.user.is_staff:
-                    return view_func(request, *args, **kwargs)
             else:
                 x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
                 ip = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR', 'unknown')
                 identifier = f"ip:{ip}"
             
-            # Create cache key with window information
-            window_id = int(time.time() / window)
-            cache_key = f"ratelimit:{key_prefix}:{identifier}:{window_id}"
+            decision = ratelimit.check(policy_name, identifier, rate, policy.get('algorithm', ratelimit.DEFAULT_ALGORITHM))
             
-            # Get current count and remaining time in the window
-            current_count = cache.get(cache_key, 0) + 1
-            time_elapsed = int(time.time()) % window
-            retry_after = window - time_elapsed
-            
-            if current_count > limit:
+            if not decision.allowed:
+                retry_after = max(1, math.ceil(decision.retry_after))
                 logger.warning(
                     f'Rate limit exceeded: {identifier} on {request.path} '
-                    f'({current_count} > {limit} in {window}s)'
+                    f'({rate.limit} per {rate.window}s, policy {policy_name})'
                 )
                 # Render a nice error page with retry information
                 response = render(request, 'errors/429.html', 
@@ -74,14 +72,11 @@ def rate_limit(key_prefix, limit=5, window=300):
                 response['Retry-After'] = retry_after
                 return response
             
-            # Set or update the counter with the remaining window time
-            cache.set(cache_key, current_count, window - time_elapsed + 1)
-            
             # Add rate limit headers to all responses
             response = view_func(request, *args, **kwargs)
-            response['X-RateLimit-Limit'] = str(limit)
-            response['X-RateLimit-Remaining'] = str(max(0, limit - current_count))
-            response['X-RateLimit-Reset'] = str(int(time.time()) + retry_after)
+            response['X-RateLimit-Limit'] = str(decision.limit)
+            response['X-RateLimit-Remaining'] = str(decision.remaining)
+            response['X-RateLimit-Reset'] = str(int(time.time() + decision.reset))
             
             return response
         return _wrapped_view
@@ -0,0 +1,119 @@
+"""
+File download helpers for Ward Resident System
+
+Adds validators (ETag / Last-Modified), conditional GET and single byte
+range support on top of FileResponse. Responses keep a real file object so
+servers with a wsgi.file_wrapper (gunicorn) can send it with sendfile().
+"""
+import re
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+class RangeFile:
+    """File wrapper that stops after ``length`` bytes but still exposes fileno()"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+def parse_range(request, size, etag, last_modified):
+    """
+    Return (start, end) for a satisfiable single byte range, 'unsatisfiable',
+    or None when the whole file should be sent.
+    """
+    header = request.META.get('HTTP_RANGE', '').strip()
+    match = RANGE_RE.match(header)
+    if not match or not any(match.groups()):
+        return None
+
+    # Only honour the range if the client's copy is still the current one
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the final N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+def serve_file(request, file, size, etag, last_modified, content_type,
+               filename=None, as_attachment=False, cache_control='private, no-cache'):
+    """
+    Stream an open file with validators, answering 304 and Range requests.
+
+    Args:
+        file: Open binary file object; closed by the response
+        size (int): File size in bytes
+        etag (str): Quoted strong entity tag
+        last_modified (datetime): Modification time of the content
+    """
+    timestamp = int(last_modified.timestamp())
+
+    headers = HttpResponse()
+    headers['ETag'] = etag
+    headers['Last-Modified'] = http_date(timestamp)
+    headers['Cache-Control'] = cache_control
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=timestamp, response=headers)
+    if conditional is not headers:
+        file.close()
+        return conditional
+
+    byte_range = parse_range(request, size, etag, timestamp)
+    if byte_range == 'unsatisfiable':
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(file, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+            as_attachment=as_attachment,
+            filename=filename or '',
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(
+            file,
+            content_type=content_type,
+            as_attachment=as_attachment,
+            filename=filename or '',
+        )
+        response['Content-Length'] = str(size)
+
+    for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+        response[header] = headers[header]
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -1,7 +1,10 @@
 """
 Email utilities for Ward Resident System
+
+Messages go through the outbox (see outbox.mail), so callers only pay for
+an INSERT; delivery, batching and retries happen in the background.
 """
-from django.core.mail import send_mail
+from outbox.mail import queue_email
 from django.template.loader import render_to_string
 from django.conf import settings
 import logging
@@ -9,7 +12,7 @@ import logging
 logger = logging.getLogger('ward_system')
 
 def send_letter_approval_notification(letter_request):
-    """Send email notification when letter is approved"""
+    """Queue the email telling a resident their letter was approved"""
     try:
         if not letter_request.requested_by.email:
             logger.warning(f'No email address for user {letter_request.requested_by.username}')
@@ -27,24 +30,22 @@ def send_letter_approval_notification(letter_request):
         
         message = render_to_string('emails/letter_approved.html', context)
         
-        send_mail(
+        queue_email(
             subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[letter_request.requested_by.email],
-            html_message=message,
-            fail_silently=False,
+            body=message,
+            recipients=[letter_request.requested_by.email],
+            html_body=message,
         )
         
-        logger.info(f'Approval notification sent to {letter_request.requested_by.email}')
+        logger.info(f'Approval notification queued for {letter_request.requested_by.email}')
         return True
         
     except Exception as e:
-        logger.error(f'Failed to send approval notification: {e}')
+        logger.error(f'Failed to queue approval notification: {e}')
         return False
 
 def send_system_alert(subject, message, recipient_list=None):
-    """Send system alert to administrators"""
+    """Queue a system alert to administrators"""
     try:
         if not recipient_list:
             recipient_list = [admin[1] for admin in settings.ADMINS]
@@ -53,17 +54,15 @@ def send_system_alert(subject, message, recipient_list=None):
             logger.warning('No admin email addresses configured')
             return False
             
-        send_mail(
+        queue_email(
             subject=f'[Ward System Alert] {subject}',
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=recipient_list,
-            fail_silently=False,
+            body=message,
+            recipients=recipient_list,
         )
         
-        logger.info(f'System alert sent: {subject}')
+        logger.info(f'System alert queued: {subject}')
         return True
         
     except Exception as e:
-        logger.error(f'Failed to send system alert: {e}')
+        logger.error(f'Failed to queue system alert: {e}')
         return False
@@ -0,0 +1,128 @@
+"""
+Streaming CSV/XLSX exports for Ward Resident System
+
+An export is a queryset plus a tuple of (header, value) columns, where the
+value is an attribute path ("household.street_name") or a callable taking
+the row. Querysets are walked with .iterator(chunk_size=...), CSV is
+streamed to the client as it is produced, and XLSX is written with an
+openpyxl write-only workbook to a temporary file, so memory use does not
+grow with the number of rows.
+"""
+import csv
+import re
+import tempfile
+from datetime import datetime
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+FORMATS = ('csv', 'xlsx')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Cells starting with these are run as formulas by spreadsheet programs
+FORMULA_PREFIXES = ('=', '@', '\t', '\r')
+
+# Signed values left as they are: phone numbers like +255 712 345 678 and plain numbers
+SIGNED_NUMBER = re.compile(r'[+-][\d\s().]*\d[\d\s().]*')
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer that hands each row back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _resolve(row, path):
+    value = row
+    for attr in path.split('.'):
+        value = getattr(value, attr, None)
+        if value is None:
+            return None
+    return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime):
+        # Spreadsheets have no time zones; use the ward's local time
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.replace(tzinfo=None, microsecond=0)
+    if isinstance(value, str):
+        # Neutralise formula injection; phone numbers like +255... are left alone
+        if value.startswith(FORMULA_PREFIXES) or (value[:1] in ('+', '-') and not SIGNED_NUMBER.fullmatch(value)):
+            return "'" + value
+        return value
+    if isinstance(value, (int, float)) or hasattr(value, 'isoformat'):
+        return value
+    return str(value)
+
+
+def export_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Yield one list of cell values per object, fetching ``chunk_size`` rows at a time"""
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield [
+            _cell(value(obj) if callable(value) else _resolve(obj, value))
+            for _, value in columns
+        ]
+
+
+def iter_csv(columns, rows):
+    """Yield CSV text line by line, starting with a BOM so Excel detects UTF-8"""
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow([header for header, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(columns, rows, fileobj, title='Export'):
+    """Write rows to ``fileobj`` as an XLSX workbook using openpyxl's write-only mode"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append([header for header, _ in columns])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(fileobj)
+
+
+def write_export(fileobj, file_format, queryset, columns, title='Export', chunk_size=CHUNK_SIZE):
+    """Write a full export to an open binary file"""
+    rows = export_rows(queryset, columns, chunk_size)
+    if file_format == 'xlsx':
+        write_xlsx(columns, rows, fileobj, title)
+        return
+    for line in iter_csv(columns, rows):
+        fileobj.write(line.encode('utf-8'))
+
+
+def export_response(file_format, filename, queryset, columns, title='Export'):
+    """
+    Return the export as a download.
+
+    CSV is streamed row by row. XLSX is a zip archive that can only be
+    finished once every row is known, so it is spooled to a temporary file
+    first and then sent from disk.
+    """
+    stamp = timezone.localtime().strftime('%Y%m%d_%H%M')
+    filename = f'{filename}_{stamp}.{file_format}'
+
+    if file_format == 'xlsx':
+        spool = tempfile.TemporaryFile()
+        write_xlsx(columns, export_rows(queryset, columns), spool, title)
+        spool.seek(0)
+        return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+    response = StreamingHttpResponse(
+        iter_csv(columns, export_rows(queryset, columns)),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
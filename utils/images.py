@@ -0,0 +1,119 @@
+"""
+Photo derivatives for Ward Resident System
+
+Uploaded photos are kept as they are, and resized, recompressed copies
+are built in the background for display:
+
+    resident_photos/1_QFmAZze.jpg  ->  thumbs/resident_photos/1_QFmAZze.64.webp
+                                       thumbs/resident_photos/1_QFmAZze.160.webp
+                                       thumbs/resident_photos/1_QFmAZze.400.webp
+
+Names are derived from the original name and the size, so templates can
+work out a derivative's URL without a database lookup (see the
+``thumbnail`` filter in utils.templatetags.images). Until a derivative
+exists the original is served instead.
+"""
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger('ward_system')
+
+# Longest side in pixels; roughly twice the CSS size each is shown at, for high-DPI screens
+SIZES = {
+    'thumb': 64,
+    'small': 160,
+    'medium': 400,
+}
+
+PREFIX = 'thumbs'
+
+FORMATS = {
+    'webp': {'extension': 'webp', 'pillow': 'WEBP', 'options': {'quality': 80, 'method': 4}},
+    'jpeg': {'extension': 'jpg', 'pillow': 'JPEG', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+
+def derivative_format():
+    return FORMATS[getattr(settings, 'IMAGE_DERIVATIVE_FORMAT', 'webp')]
+
+
+def derivative_name(name, size):
+    """Storage name of the ``size`` derivative of the original stored as ``name``"""
+    stem = os.path.splitext(name)[0]
+    return f'{PREFIX}/{stem}.{SIZES[size]}.{derivative_format()["extension"]}'
+
+
+def derivatives_exist(name):
+    return all(default_storage.exists(derivative_name(name, size)) for size in SIZES)
+
+
+def failure_marker(name):
+    """Storage name of the marker left for an original that could not be decoded"""
+    return f'{PREFIX}/{os.path.splitext(name)[0]}.failed'
+
+
+def build_derivatives(name, force=False):
+    """
+    Write every missing derivative of the stored image ``name``; returns the
+    number written. Unreadable images are logged and skipped.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    pending = [size for size in SIZES if force or not default_storage.exists(derivative_name(name, size))]
+    if not pending:
+        return 0
+
+    output = derivative_format()
+    try:
+        with default_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            # Let the JPEG decoder scale down while decoding; far cheaper than resizing a full-size photo
+            largest = max(SIZES[size] for size in pending)
+            image.draft('RGB', (largest * 2, largest * 2))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning(f'Cannot build thumbnails for {name}: {e}')
+        # Remembered so saving the owner does not queue the same failing build again
+        marker = failure_marker(name)
+        if not default_storage.exists(marker):
+            default_storage.save(marker, ContentFile(str(e).encode()))
+        return 0
+
+    if output['pillow'] == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if output['pillow'] == 'WEBP' and 'A' in image.getbands() else 'RGB')
+
+    # Largest first, each resized from the previous one
+    for size in sorted(pending, key=SIZES.get, reverse=True):
+        image.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, output['pillow'], **output['options'])
+        target = derivative_name(name, size)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        default_storage.save(target, ContentFile(buffer.getvalue()))
+    if force and default_storage.exists(failure_marker(name)):
+        default_storage.delete(failure_marker(name))
+    return len(pending)
+
+
+def queue_derivatives(fieldfile, update_fields=None):
+    """
+    Queue a background build for an uploaded photo whose derivatives are
+    missing. ``update_fields`` comes from post_save: saves that cannot have
+    changed the photo (such as the last_login update) are skipped without
+    touching storage.
+    """
+    from jobs.queue import enqueue
+
+    if not fieldfile:
+        return
+    if update_fields is not None and fieldfile.field.name not in update_fields:
+        return
+    if derivatives_exist(fieldfile.name) or default_storage.exists(failure_marker(fieldfile.name)):
+        return
+    enqueue('images.build_derivatives', unique=True, path=fieldfile.name)
@@ -0,0 +1,97 @@
+"""
+Management command to backup database and media files
+
+See utils.backup for the snapshot layout. Run nightly; only media files
+that changed since the last run are written.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.core.mail import send_mail
+from utils.backup import CODEC_EXTENSIONS, create_backup, prune_backups
+import logging
+
+logger = logging.getLogger('ward_system')
+
+class Command(BaseCommand):
+    help = 'Backup database and media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            action='store_true',
+            help='Send backup completion email to admin',
+        )
+        parser.add_argument(
+            '--compression',
+            choices=[codec for codec in CODEC_EXTENSIONS if codec != 'none'],
+            help='zstd or gzip (default: BACKUP_COMPRESSION, zstd when installed)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Threads for storing media files (default: BACKUP_WORKERS)',
+        )
+        parser.add_argument(
+            '--skip-verify',
+            action='store_true',
+            help='Skip the restore check of the new backup',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            snapshot_dir, manifest = create_backup(
+                codec=options['compression'],
+                verify=not options['skip_verify'],
+                workers=options['workers'],
+            )
+            stats = manifest['stats']
+            self.stdout.write(
+                f'Database: {manifest["database"]["vendor"]} dump, '
+                f'{manifest["database"]["size"] / 1024 / 1024:.1f} MB before compression'
+            )
+            self.stdout.write(
+                f'Media: {stats["media_files"]} files, {stats["new_objects"]} new '
+                f'({stats["new_bytes"] / 1024 / 1024:.1f} MB stored this run)'
+            )
+            if not options['skip_verify']:
+                self.stdout.write('Restore check passed')
+            
+            # Clean old backups
+            retention_days = getattr(settings, 'BACKUP_RETENTION_DAYS', 30)
+            removed, removed_objects = prune_backups(retention_days)
+            for name in removed:
+                self.stdout.write(f'Removed old backup: {name}')
+            if removed_objects:
+                self.stdout.write(f'Removed {removed_objects} unreferenced media object(s)')
+            
+            success_msg = f'Backup completed successfully: {snapshot_dir}'
+            self.stdout.write(self.style.SUCCESS(success_msg))
+            logger.info(success_msg)
+            
+            if options['email']:
+                self.send_backup_notification(True, snapshot_dir)
+                
+        except Exception as e:
+            error_msg = f'Backup failed: {str(e)}'
+            self.stdout.write(self.style.ERROR(error_msg))
+            logger.error(error_msg, exc_info=True)
+            
+            if options['email']:
+                self.send_backup_notification(False, str(e))
+            raise CommandError(error_msg)
+
+    def send_backup_notification(self, success, details):
+        """Send email notification about backup status"""
+        subject = 'Ward System Backup ' + ('Successful' if success else 'Failed')
+        message = f'Backup details: {details}'
+        
+        try:
+            send_mail(
+                subject,
+                message,
+                settings.DEFAULT_FROM_EMAIL,
+                [settings.ADMINS[0][1]] if settings.ADMINS else [],
+                fail_silently=False,
+            )
+        except Exception as e:
+            logger.error(f'Failed to send backup notification: {e}')
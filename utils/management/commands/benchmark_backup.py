@@ -0,0 +1,91 @@
+"""
+Management command to measure backup and restore throughput
+
+Builds a synthetic media tree in a scratch directory, then times a full
+backup, an incremental backup with nothing changed, a checksum
+verification and a media restore for each worker count. The live
+database is dumped as part of each backup but never restored, and the
+real MEDIA_ROOT and BACKUP_ROOT are not touched.
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from utils.backup import create_backup, restore_media, verify_media
+
+# (directory, extension, share of files, compressible)
+MEDIA_MIX = (
+    ('resident_photos', '.jpg', 0.6, False),
+    ('generated_letters', '.pdf', 0.3, False),
+    ('imports', '.csv', 0.1, True),
+)
+
+class Command(BaseCommand):
+    help = 'Measure backup, verification and restore throughput (MB/s) on a synthetic media tree'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=2000, help='Number of media files to generate')
+        parser.add_argument('--size-kb', type=int, default=200, help='Average file size in KB')
+        parser.add_argument(
+            '--workers',
+            default='1,4,8',
+            help='Comma-separated worker counts to compare',
+        )
+        parser.add_argument('--compression', choices=['zstd', 'gzip'], help='Codec (default: BACKUP_COMPRESSION)')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch directory')
+
+    def handle(self, *args, **options):
+        scratch = tempfile.mkdtemp(prefix='ward-backup-bench-')
+        try:
+            media_root = os.path.join(scratch, 'media')
+            total = self.generate_media(media_root, options['files'], options['size_kb'] * 1024)
+            self.stdout.write(f'Synthetic media: {options["files"]} files, {total / 1024 / 1024:.1f} MB in {media_root}')
+            self.stdout.write(f'{"workers":>8} {"backup":>10} {"incremental":>12} {"verify":>10} {"restore":>10}   (MB/s)')
+
+            for workers in [int(value) for value in options['workers'].split(',')]:
+                root = os.path.join(scratch, f'backups-{workers}')
+                with override_settings(MEDIA_ROOT=media_root, BACKUP_ROOT=root):
+                    full, (_, manifest) = self.timed(create_backup, codec=options['compression'], verify=False, workers=workers)
+                    incremental, _ = self.timed(create_backup, codec=options['compression'], verify=False, workers=workers)
+                verify, problems = self.timed(verify_media, root, manifest['media'], deep=True, workers=workers)
+                restore, _ = self.timed(
+                    restore_media, root, manifest['media'], os.path.join(scratch, f'restore-{workers}'), workers=workers,
+                )
+                if problems:
+                    self.stdout.write(self.style.ERROR(f'Verification found {len(problems)} problem(s)'))
+
+                rate = lambda seconds: f'{total / 1024 / 1024 / max(seconds, 1e-6):.1f}'
+                self.stdout.write(
+                    f'{workers:>8} {rate(full):>10} {rate(incremental):>12} {rate(verify):>10} {rate(restore):>10}'
+                )
+                shutil.rmtree(os.path.join(scratch, f'restore-{workers}'))
+        finally:
+            if options['keep']:
+                self.stdout.write(f'Scratch directory kept: {scratch}')
+            else:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+    def generate_media(self, media_root, count, average_size):
+        """Write ``count`` files around ``average_size`` bytes; returns the total size"""
+        rng = random.Random(42)
+        total = 0
+        for directory, extension, share, compressible in MEDIA_MIX:
+            os.makedirs(os.path.join(media_root, directory), exist_ok=True)
+            for i in range(max(1, int(count * share))):
+                size = int(average_size * rng.uniform(0.5, 1.5))
+                if compressible:
+                    data = (b'NIDA,first_name,last_name,phone\n' * (size // 32 + 1))[:size]
+                else:
+                    data = os.urandom(size)
+                with open(os.path.join(media_root, directory, f'{i:06d}{extension}'), 'wb') as f:
+                    f.write(data)
+                total += size
+        return total
+
+    def timed(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        return time.perf_counter() - started, result
@@ -0,0 +1,173 @@
+"""
+Management command to measure page latency and query counts at scale
+
+By default a throwaway test database is created, filled with
+utils.synthetic at the requested scale, and dropped afterwards. With
+--existing the pages are measured against the configured database, which
+must already hold synthetic data (see generate_data).
+
+Each endpoint is requested through the test client as the role that uses
+it: once to warm caches, then --requests times. The report gives p50 and
+p95 latency and the number of queries, compared with a stored baseline.
+"""
+import json
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+from accounts.models import User
+from utils import synthetic
+
+# (label, role, URL name, function returning URL args or None, query string); role None is anonymous
+ENDPOINTS = (
+    ('home', None, 'home', None, ''),
+    ('home', 'admin', 'home', None, ''),
+    ('home', 'resident', 'home', None, ''),
+    ('resident_list', 'admin', 'residents:list', None, ''),
+    ('resident_search', 'admin', 'residents:list', None, 'search=Kimaro'),
+    ('resident_detail', 'admin', 'residents:detail', lambda s: [s['resident']], ''),
+    ('visitor_log', 'admin', 'visitors:log', None, ''),
+    ('visitor_detail', 'admin', 'visitors:detail', lambda s: [s['visitor']], ''),
+    ('all_requests', 'admin', 'letters:all', None, ''),
+    ('pending_requests', 'admin', 'letters:pending', None, ''),
+    ('request_detail', 'admin', 'letters:detail', lambda s: [s['letter_request']], ''),
+    ('my_requests', 'resident', 'letters:my_requests', None, ''),
+    ('announcements', 'resident', 'communications:announcements', None, ''),
+    ('complaints', 'admin', 'communications:complaints', None, ''),
+    ('complaint_detail', 'admin', 'communications:complaint_detail', lambda s: [s['complaint']], ''),
+    ('audit_events', 'admin', 'audit:events', None, ''),
+)
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'views.json')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+class Command(BaseCommand):
+    help = 'Measure p50/p95 latency and query counts of the main pages on synthetic data, against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residents', type=int, default=10000, help='Scale of the synthetic dataset')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic dataset')
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--existing', action='store_true', help='Use the configured database as it is')
+        parser.add_argument('--only', help='Comma-separated endpoint labels to run')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed p95 slowdown over the baseline, as a fraction',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = None
+        try:
+            if not options['existing']:
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                started = time.perf_counter()
+                synthetic.generate(options['residents'], seed=options['seed'])
+                self.stdout.write(
+                    f'Generated {options["residents"]} residents (seed {options["seed"]}) '
+                    f'in {time.perf_counter() - started:.1f}s'
+                )
+            elif not User.objects.filter(username=f'{synthetic.USER_PREFIX}admin').exists():
+                raise CommandError('No synthetic data in this database; run generate_data first')
+            # Pages must render without a collectstatic manifest
+            with override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'):
+                results = self.run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results, options)
+
+    def run(self, options):
+        samples = synthetic.sample_objects()
+        clients = {None: Client(raise_request_exception=False)}
+        for role in ('admin', 'resident'):
+            clients[role] = Client(raise_request_exception=False)
+            clients[role].force_login(samples['users'][role])
+
+        only = set(options['only'].split(',')) if options['only'] else None
+        results = {}
+        for label, role, url_name, args, query in ENDPOINTS:
+            if only and label not in only:
+                continue
+            url = reverse(url_name, args=args(samples) if args else None) + (f'?{query}' if query else '')
+            key = f'{label}:{role or "anonymous"}'
+            client = clients[role]
+
+            response = client.get(url, secure=True)  # warm-up; fills caches as a real visitor would
+            timings = []
+            for _ in range(options['requests']):
+                # Captured per request: the query log is reset whenever a request starts
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url, secure=True)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+            results[key] = {
+                'status': response.status_code,
+                'p50': round(percentile(timings, 0.50), 2),
+                'p95': round(percentile(timings, 0.95), 2),
+                'queries': len(queries),
+            }
+            self.stdout.write(f'  {key}: {results[key]["p95"]} ms p95')
+        # The counters and feeds cached while crawling describe the benchmark data
+        synthetic.invalidate_caches()
+        return {'residents': options['residents'], 'seed': options['seed'], 'results': results}
+
+    def report(self, current, options):
+        baseline = None
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if (baseline['residents'], baseline['seed']) != (current['residents'], current['seed']):
+                self.stdout.write(self.style.WARNING(
+                    f'Baseline was taken at {baseline["residents"]} residents (seed {baseline["seed"]}); '
+                    'differences are not comparable'
+                ))
+
+        self.stdout.write(
+            f'\n{"endpoint":<32} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"base p95":>9} {"base q":>7}'
+        )
+        regressions = []
+        for key, result in current['results'].items():
+            base = (baseline or {}).get('results', {}).get(key)
+            line = (
+                f'{key:<32} {result["status"]:>6} {result["p50"]:>9.1f} {result["p95"]:>9.1f} {result["queries"]:>8}'
+            )
+            if base:
+                line += f' {base["p95"]:>9.1f} {base["queries"]:>7}'
+                if result['queries'] > base['queries']:
+                    regressions.append(f'{key}: {base["queries"]} -> {result["queries"]} queries')
+                if result['p95'] > base['p95'] * (1 + options['tolerance']):
+                    regressions.append(f'{key}: p95 {base["p95"]:.1f} -> {result["p95"]:.1f} ms')
+                if result['status'] != base['status']:
+                    regressions.append(f'{key}: status {base["status"]} -> {result["status"]}')
+            self.stdout.write(self.style.ERROR(line) if result['status'] >= 500 else line)
+
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']) or '.', exist_ok=True)
+            with open(options['baseline'], 'w') as f:
+                json.dump(current, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+        elif regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        elif baseline:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,42 @@
+"""
+Management command to build photo derivatives for existing uploads
+
+New uploads are handled by the images.build_derivatives background task;
+run this once after deploying, or with --force after changing
+utils.images.SIZES or IMAGE_DERIVATIVE_FORMAT.
+"""
+from django.core.management.base import BaseCommand
+from accounts.models import User
+from residents.models import Resident
+from utils.images import build_derivatives
+import logging
+
+logger = logging.getLogger('ward_system')
+
+class Command(BaseCommand):
+    help = 'Build resized copies of resident and profile photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild derivatives that already exist',
+        )
+
+    def handle(self, *args, **options):
+        names = set(
+            Resident.objects.exclude(photo='').exclude(photo__isnull=True).values_list('photo', flat=True)
+        )
+        names.update(
+            User.objects.exclude(profile_photo='').exclude(profile_photo__isnull=True).values_list('profile_photo', flat=True)
+        )
+
+        built = 0
+        for index, name in enumerate(sorted(names), 1):
+            built += build_derivatives(name, force=options['force'])
+            if index % 100 == 0:
+                self.stdout.write(f'  {index}/{len(names)} photos checked')
+
+        summary = f'Built {built} derivative(s) for {len(names)} photo(s)'
+        self.stdout.write(self.style.SUCCESS(summary))
+        logger.info(summary)
@@ -0,0 +1,66 @@
+"""
+Management command that guards every page against N+1 query regressions
+
+Builds a synthetic ward in a throwaway test database at two sizes and
+crawls every page as each role at both. It fails when a page runs more
+queries on the larger dataset, or more than its budget in
+query_budgets.json. After an intended change, --update rewrites the
+budgets from the larger crawl. The checks themselves live in
+utils.querycount and also run with the test suite (utils.tests); this
+command runs them at full size.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from utils import querycount, synthetic
+
+class Command(BaseCommand):
+    help = 'Crawl every page as each role on two dataset sizes and fail on queries that grow with rows or exceed budget'
+
+    def add_arguments(self, parser):
+        # The small ward fits on one page of every list, the large one fills them
+        parser.add_argument('--small', type=int, default=20, help='Residents in the first dataset')
+        parser.add_argument('--large', type=int, default=1000, help='Residents in the second dataset')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for both datasets')
+        parser.add_argument('--budgets', default=querycount.BUDGETS_PATH, help='Per-page query budget file')
+        parser.add_argument('--update', action='store_true', help='Write the measured counts as the new budgets')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'):
+                small, _ = querycount.measure(options['small'], options['seed'])
+                synthetic.clear()
+                large, missing = querycount.measure(options['large'], options['seed'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, reason in missing:
+            self.stdout.write(self.style.WARNING(f'Not crawled: {name} ({reason})'))
+
+        skipped = querycount.split_errors(large)
+        for key, reason in skipped.items():
+            self.stdout.write(self.style.WARNING(f'Not measured: {key} {reason}'))
+
+        failures = querycount.growth(small, large)
+        if options['update']:
+            data = querycount.write_budgets(large, skipped, options['budgets'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {len(data["budgets"])} budgets and {len(data["skipped"])} skipped pages to {options["budgets"]}'
+            ))
+        else:
+            recorded = querycount.load_budgets(options['budgets'])
+            if recorded is None:
+                failures.append(f'No budget file at {options["budgets"]}; run with --update to create it')
+            else:
+                budget_failures, notes = querycount.check_budgets(large, skipped, recorded)
+                failures += budget_failures
+                for note in notes:
+                    self.stdout.write(note)
+
+        self.stdout.write(f'Crawled {len(large)} page/role combinations')
+        if failures:
+            raise CommandError('Query count check failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Query counts are flat and within budget'))
@@ -0,0 +1,79 @@
+"""
+Management command to export registers to CSV or XLSX
+"""
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from letters.exports import LETTER_REQUEST_COLUMNS, letter_request_queryset
+from residents.exports import RESIDENT_COLUMNS
+from residents.search import resident_list_queryset
+from utils.exports import CHUNK_SIZE, FORMATS, write_export
+from visitors.exports import VISITOR_COLUMNS, VISITOR_LOG_COLUMNS, visitor_log_queryset, visitor_queryset
+import logging
+
+logger = logging.getLogger('ward_system')
+
+def _exports(options):
+    """register name -> (queryset, columns, sheet title), filtered like the list views"""
+    return {
+        'residents': lambda: (resident_list_queryset(options['search']), RESIDENT_COLUMNS, 'Residents'),
+        'visitors': lambda: (visitor_queryset(), VISITOR_COLUMNS, 'Visitors'),
+        'visitor-activity': lambda: (visitor_log_queryset(), VISITOR_LOG_COLUMNS, 'Visitor Activity'),
+        'letters': lambda: (letter_request_queryset(options['status']), LETTER_REQUEST_COLUMNS, 'Letter Requests'),
+    }
+
+class Command(BaseCommand):
+    help = 'Export residents, visitors, visitor activity or letter requests to CSV or XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'register',
+            choices=['residents', 'visitors', 'visitor-activity', 'letters'],
+            help='Which register to export',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='csv',
+            help='Output format',
+        )
+        parser.add_argument(
+            '--output',
+            help='Output file (default: <register>_<timestamp>.<format> in the current directory)',
+        )
+        parser.add_argument(
+            '--search',
+            default='',
+            help='Residents only: same search as the resident list',
+        )
+        parser.add_argument(
+            '--status',
+            help='Letters only: export requests with this status, e.g. pending',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Rows fetched from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        register = options['register']
+        file_format = options['format']
+        stamp = timezone.localtime().strftime('%Y%m%d_%H%M%S')
+        output = options['output'] or f'{register}_{stamp}.{file_format}'
+
+        queryset, columns, title = _exports(options)[register]()
+        started = time.perf_counter()
+        try:
+            with open(output, 'wb') as f:
+                write_export(f, file_format, queryset, columns, title=title, chunk_size=options['chunk_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(output)
+        message = f'Exported {register} to {output} ({size / 1024:,.0f} KB in {elapsed:.1f}s)'
+        self.stdout.write(self.style.SUCCESS(message))
+        logger.info(message)
@@ -0,0 +1,40 @@
+"""
+Management command to fill the database with a synthetic ward
+
+For load testing and benchmarks only; see utils.synthetic for what is
+created. Every synthetic account has the password "synthetic".
+"""
+from django.core.management.base import BaseCommand, CommandError
+from utils import synthetic
+
+class Command(BaseCommand):
+    help = 'Create synthetic households, residents, visitors, letter requests and complaints at a given scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residents', type=int, default=10000, help='Number of residents; other rows scale with it')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed and scale give the same data')
+        parser.add_argument('--clear', action='store_true', help='Delete existing synthetic data first')
+        parser.add_argument('--clear-only', action='store_true', help='Delete synthetic data and stop')
+
+    def handle(self, *args, **options):
+        if options['clear'] or options['clear_only']:
+            self.stdout.write(f'Deleted {synthetic.clear()} synthetic row(s)')
+            if options['clear_only']:
+                return
+
+        last = {}
+
+        def progress(kind, done, total):
+            # Roughly every tenth of each kind
+            step = max(total // 10, 1)
+            if done == total or done // step != last.get(kind, -1):
+                last[kind] = done // step
+                self.stdout.write(f'  {kind}: {done}/{total}')
+
+        try:
+            counts = synthetic.generate(options['residents'], seed=options['seed'], progress=progress)
+        except ValueError as e:
+            raise CommandError(f'{e} (use --clear)')
+
+        summary = ', '.join(f'{total} {kind.replace("_", " ")}' for kind, total in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}'))
@@ -0,0 +1,128 @@
+"""
+Management command to restore the database and media files from a backup
+
+Counterpart of backup_data. Every file is checked against the checksum in
+the backup manifest before it replaces anything.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from utils.backup import BackupError, list_snapshots, restore_snapshot, verify_snapshot
+import logging
+
+logger = logging.getLogger('ward_system')
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2
+
+class Command(BaseCommand):
+    help = 'Restore the database and media files from a backup made by backup_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'backup',
+            nargs='?',
+            help='Backup name, e.g. 20261018_020000 (default: the latest)',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List available backups and exit',
+        )
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Check every checksum in the backup without restoring anything',
+        )
+        parser.add_argument(
+            '--skip-database',
+            action='store_true',
+            help='Restore media files only',
+        )
+        parser.add_argument(
+            '--skip-media',
+            action='store_true',
+            help='Restore the database only',
+        )
+        parser.add_argument(
+            '--media-root',
+            help='Restore media files here instead of MEDIA_ROOT',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Threads for copying and checking media files (default: BACKUP_WORKERS)',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Do not ask for confirmation',
+        )
+
+    def handle(self, *args, **options):
+        snapshots = list_snapshots()
+        if options['list']:
+            for name in snapshots:
+                self.stdout.write(name)
+            return
+        if not snapshots:
+            raise CommandError('No backups found')
+        name = options['backup'] or snapshots[-1]
+
+        started = time.perf_counter()
+        progress = self.progress_reporter(started)
+        try:
+            if options['verify_only']:
+                manifest = verify_snapshot(name, deep=True, workers=options['workers'], progress=progress)
+                self.report_rate('Verified', manifest['stats']['media_bytes'], started)
+                self.stdout.write(self.style.SUCCESS(f'Backup {name} is intact'))
+                return
+
+            database = not options['skip_database']
+            media = not options['skip_media']
+            if options['interactive']:
+                targets = ' and '.join(
+                    label for label, chosen in (('the database', database), ('media files', media)) if chosen
+                )
+                answer = input(f'This will overwrite {targets} with backup {name}. Type "yes" to continue: ')
+                if answer != 'yes':
+                    raise CommandError('Restore cancelled')
+
+            manifest, media_stats = restore_snapshot(
+                name,
+                database=database,
+                media=media,
+                media_root=options['media_root'],
+                workers=options['workers'],
+                progress=progress,
+            )
+        except BackupError as e:
+            logger.error(f'Restore of {name} failed: {e}')
+            raise CommandError(f'Restore failed: {e}')
+
+        if media_stats:
+            self.stdout.write(
+                f'Media: {media_stats["restored"]} restored, {media_stats["skipped"]} already up to date'
+            )
+            self.report_rate('Media', media_stats['bytes'], started)
+        if database:
+            self.stdout.write(f'Database restored from {manifest["database"]["file"]}')
+
+        success_msg = f'Restore of {name} completed in {time.perf_counter() - started:.1f}s'
+        self.stdout.write(self.style.SUCCESS(success_msg))
+        logger.info(success_msg)
+
+    def progress_reporter(self, started):
+        last = [started]
+
+        def progress(done, total, done_bytes):
+            now = time.perf_counter()
+            if now - last[0] >= PROGRESS_INTERVAL or done == total:
+                last[0] = now
+                rate = done_bytes / 1024 / 1024 / max(now - started, 1e-6)
+                self.stdout.write(f'  {done}/{total} files, {done_bytes / 1024 / 1024:.1f} MB ({rate:.1f} MB/s)')
+        return progress
+
+    def report_rate(self, label, size, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label}: {size / 1024 / 1024:.1f} MB in {elapsed:.1f}s ({size / 1024 / 1024 / max(elapsed, 1e-6):.1f} MB/s)')
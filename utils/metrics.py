@@ -0,0 +1,249 @@
+"""
+Per-request performance metrics for Ward Resident System
+
+PerformanceMiddleware (ward_system.middleware) starts a RequestStats for
+each request. Database time comes from connection.execute_wrapper,
+template time from the InstrumentedDjangoTemplates backend, and cache
+hits from code that calls ``record_cache``. Each finished request is
+folded into in-process histograms labelled by URL name, which
+``render_prometheus`` returns in the Prometheus text format.
+
+Metrics live in the memory of each process, so every gunicorn worker
+reports its own numbers.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from django.template.backends.django import DjangoTemplates
+
+# Upper bounds, in seconds, for the latency histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds for the per-request query count histogram; high counts point at N+1 pages
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Timings gathered while one request is handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def start_request():
+    """Begin collecting stats for the current request; returns (stats, token for finish_request)"""
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_stats():
+    return _current.get()
+
+
+def record_cache(hits=0, misses=0):
+    """Count cache lookups against the current request, if there is one"""
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class InstrumentedTemplate:
+    """Backend template wrapper that adds its render time to the current request"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing each top-level render.
+
+    Included and extended templates render inside their parent, so they are
+    not counted twice.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Histograms and counters keyed by label values, guarded by one lock"""
+
+    HISTOGRAMS = {
+        'ward_request_duration_seconds': ('Time to produce the response', DURATION_BUCKETS),
+        'ward_request_db_seconds': ('Time spent in database queries per request', DURATION_BUCKETS),
+        'ward_request_db_queries': ('Database queries per request', QUERY_BUCKETS),
+        'ward_request_template_seconds': ('Time spent rendering templates per request', DURATION_BUCKETS),
+    }
+
+    COUNTERS = {
+        'ward_requests_total': 'Requests handled',
+        'ward_cache_lookups_total': 'Cache lookups made while handling requests',
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in self.HISTOGRAMS}
+        self._counters = {name: {} for name in self.COUNTERS}
+
+    def observe(self, name, labels, value):
+        series = self._histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(self.HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        series = self._counters[name]
+        series[labels] = series.get(labels, 0) + amount
+
+    def record_request(self, view, method, status, duration, stats):
+        labels = (('view', view), ('method', method))
+        view_label = (('view', view),)
+        with self._lock:
+            self.inc('ward_requests_total', labels + (('status', str(status)),))
+            self.observe('ward_request_duration_seconds', labels, duration)
+            self.observe('ward_request_db_seconds', view_label, stats.db_time)
+            self.observe('ward_request_db_queries', view_label, stats.queries)
+            self.observe('ward_request_template_seconds', view_label, stats.template_time)
+            if stats.cache_hits:
+                self.inc('ward_cache_lookups_total', view_label + (('result', 'hit'),), stats.cache_hits)
+            if stats.cache_misses:
+                self.inc('ward_cache_lookups_total', view_label + (('result', 'miss'),), stats.cache_misses)
+
+    def render(self, extra=()):
+        """
+        Prometheus text exposition format.
+
+        ``extra`` is an iterable of (name, type, help, value) for values
+        kept elsewhere; ``value`` may be a dict of label tuples to values.
+        """
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+                    lines.append(f'{name}_sum{_labels(labels)} {_number(histogram.sum)}')
+                    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+            for name, help_text in self.COUNTERS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        for name, metric_type, help_text, value in extra:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if isinstance(value, dict):
+                for labels, sample in sorted(value.items()):
+                    lines.append(f'{name}{_labels(labels)} {_number(sample)}')
+            else:
+                lines.append(f'{name} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def can_view(user):
+    """Staff and ward admins may see Server-Timing headers and /metrics/"""
+    return user is not None and user.is_authenticated and (user.is_staff or getattr(user, 'role', None) == 'admin')
+
+
+def server_timing(duration, stats):
+    """Server-Timing header value for one request (durations in milliseconds)"""
+    return ', '.join((
+        f'total;dur={duration * 1000:.1f}',
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'tpl;dur={stats.template_time * 1000:.1f};desc="templates"',
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+    ))
+
+
+registry = Registry()
+
+
+def render_prometheus():
+    """Request metrics plus the audit sink and email outbox counters, as served at /metrics/"""
+    from audit.sink import get_sink
+    from outbox.mail import outbox_stats
+
+    audit = get_sink().stats()
+    outbox = outbox_stats()
+    return registry.render(extra=(
+        ('ward_outbox_messages', 'gauge', 'Outbox emails by delivery status', {
+            (('status', status),): count for status, count in outbox['counts'].items()
+        }),
+        ('ward_outbox_oldest_queued_seconds', 'gauge', 'Age of the oldest email due for delivery', outbox['oldest_queued_seconds']),
+        ('ward_audit_queued', 'gauge', 'Audit events waiting to be written', audit['queued']),
+        ('ward_audit_written_total', 'counter', 'Audit events written', audit['written']),
+        ('ward_audit_dropped_total', 'counter', 'Audit events dropped because the queue was full', audit['dropped']),
+        ('ward_audit_failed_total', 'counter', 'Audit events that could not be written', audit['failed']),
+    ))
@@ -0,0 +1,196 @@
+"""
+Keyset (cursor) pagination for Ward Resident System
+
+Pages are found by seeking past the last row shown instead of using OFFSET,
+and no COUNT(*) runs unless a total is asked for. Cursors are signed,
+opaque tokens carrying the ordering values of the boundary row.
+"""
+import datetime
+from decimal import Decimal
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+CURSOR_SALT = 'utils.pagination.cursor'
+
+# Upper bound for cheap "N+" counts on filtered querysets
+COUNT_CAP = 10000
+
+def _serialize(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def _resolve(obj, path):
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+def approximate_count(queryset, cap=COUNT_CAP):
+    """
+    Return (count, label) without a full scan where possible.
+
+    Unfiltered tables on PostgreSQL use the planner's row estimate; other
+    querysets count at most ``cap`` rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0) until the table has been analysed
+        if row and row[0] > 0:
+            return row[0], f'~{row[0]:,}'
+
+    count = queryset.order_by()[:cap + 1].count()
+    if count > cap:
+        return cap, f'{cap:,}+'
+    return count, f'{count:,}'
+
+class CursorPage:
+    """One page of results with opaque tokens for the neighbouring pages"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor,
+                 count=None, count_label=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_label = count_label
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+class CursorPaginator:
+    """
+    Paginate a queryset by keyset.
+
+    Args:
+        queryset: The rows to page through
+        per_page (int): Rows per page
+        ordering (tuple): Non-null fields to order by, e.g. ('last_name', 'first_name', 'pk')
+            or ('-entry_time',). The primary key is appended as a tie-breaker. When None,
+            the queryset's own ordering is kept and pages are addressed by offset; use this
+            for ranked search results that cannot be sought by column values.
+        count (str): None for no total, 'exact' for COUNT(*), 'approximate' for approximate_count
+    """
+
+    def __init__(self, queryset, per_page, ordering=None, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_mode = count
+        self.ordering = None
+        if ordering:
+            self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+            if self.ordering[-1][0] not in ('pk', 'id'):
+                self.ordering.append(('pk', self.ordering[-1][1]))
+
+    def encode(self, position):
+        return signing.dumps(position, salt=CURSOR_SALT, compress=True)
+
+    def decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            return signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+
+    def _total(self):
+        if self.count_mode == 'exact':
+            count = self.queryset.count()
+            return count, f'{count:,}'
+        if self.count_mode == 'approximate':
+            return approximate_count(self.queryset)
+        return None, None
+
+    def _seek(self, values, backwards):
+        """Rows strictly after (or before) the given ordering values"""
+        condition = Q()
+        for i, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != backwards else 'gt'
+            clause = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (previous, _) in enumerate(self.ordering[:i]):
+                clause &= Q(**{previous: values[j]})
+            condition |= clause
+        return condition
+
+    def _values(self, row):
+        return [_serialize(_resolve(row, name)) for name, _ in self.ordering]
+
+    def get_page(self, cursor=None):
+        position = self.decode(cursor)
+        if self.ordering is None:
+            page = self._offset_page(position)
+        else:
+            page = self._keyset_page(position)
+        page.count, page.count_label = self._total()
+        return page
+
+    def _keyset_page(self, position):
+        backwards = bool(position) and position.get('d') == 'p'
+        values = position.get('v') if position else None
+
+        order = [('-' if descending != backwards else '') + name for name, descending in self.ordering]
+        queryset = self.queryset.order_by(*order)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._seek(values, backwards))
+            except (IndexError, TypeError, ValueError, ValidationError):
+                # Cursor from an older ordering; start again from the first page
+                return self._keyset_page(None)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows and values is not None:
+            # The boundary rows are gone; fall back to the first page
+            return self._keyset_page(None)
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return CursorPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode({'d': 'n', 'v': self._values(rows[-1])}) if has_next else None,
+            previous_cursor=self.encode({'d': 'p', 'v': self._values(rows[0])}) if has_previous else None,
+        )
+
+    def _offset_page(self, position):
+        offset = position.get('o', 0) if position else 0
+        if not isinstance(offset, int) or offset < 0:
+            offset = 0
+
+        rows = list(self.queryset[offset:offset + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        has_previous = offset > 0
+
+        return CursorPage(
+            rows[:self.per_page],
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode({'o': offset + self.per_page}) if has_next else None,
+            previous_cursor=self.encode({'o': max(offset - self.per_page, 0)}) if has_previous else None,
+        )
@@ -0,0 +1,195 @@
+"""
+Query-count crawl of every page in Ward Resident System
+
+``crawl()`` requests every named GET-able URL in the project's urlconf as
+each role and counts the queries each response takes. URL arguments are
+filled in from utils.synthetic.sample_objects() through URL_ARGS. A new
+URL with arguments missing from URL_ARGS is reported, not skipped
+silently.
+
+``measure()`` crawls the synthetic ward at one size. A page whose query
+count rises between two sizes has an N+1 (usually a relation touched in
+a template); ``growth()`` reports those. Each count is also held against
+the budget recorded for it in query_budgets.json by ``check_budgets()``.
+The file also records the pages left unmeasured because they error, so a
+page that starts or stops erroring shows up in review. utils.tests runs
+the whole check with the test suite; the check_query_counts command runs
+it at larger sizes and rewrites the file with --update.
+"""
+import json
+import logging
+import os
+from django.conf import settings
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from utils import synthetic
+
+BUDGETS_PATH = os.path.join(settings.BASE_DIR, 'query_budgets.json')
+
+ROLES = ('anonymous', 'admin', 'clerk', 'resident')
+
+# URL name -> key in sample_objects() that fills its one argument
+URL_ARGS = {
+    'residents:detail': 'resident',
+    'residents:edit': 'resident',
+    'visitors:exit': 'visitor',
+    'visitors:detail': 'visitor',
+    'letters:detail': 'letter_request',
+    'letters:approve': 'pending_letter_request',
+    'letters:reject': 'pending_letter_request',
+    'letters:generate_pdf': 'approved_letter_request',
+    'communications:delete_announcement': 'announcement',
+    'communications:complaint_detail': 'complaint',
+    'communications:respond_complaint': 'complaint',
+}
+
+# URL names not crawled, and why
+SKIP = {
+    'media': 'serves files, not pages',
+    'metrics': 'scrape endpoint; counts depend on the audit sink',
+    'event_stream': 'long-lived stream',
+    'accounts:logout': 'logs the crawler out',
+    'residents:export': 'streams every row by design',
+    'visitors:export': 'streams every row by design',
+    'letters:export': 'streams every row by design',
+    'letters:batch_export': 'POST only',
+    'letters:batch_export_download': 'one per export job',
+}
+
+# URL namespaces not crawled
+SKIP_NAMESPACES = ('admin',)
+
+
+def named_patterns(resolver=None, namespace=''):
+    """(name, pattern) for every named URL, with namespaces applied"""
+    resolver = resolver or get_resolver()
+    for entry in resolver.url_patterns:
+        if isinstance(entry, URLResolver):
+            if entry.namespace in SKIP_NAMESPACES:
+                continue
+            prefix = f'{namespace}{entry.namespace}:' if entry.namespace else namespace
+            yield from named_patterns(entry, prefix)
+        elif isinstance(entry, URLPattern) and entry.name:
+            yield f'{namespace}{entry.name}', entry
+
+
+def urls(samples):
+    """
+    Crawlable URLs as (name, url) and unfillable ones as (name, reason),
+    sorted by name.
+    """
+    crawl, missing = [], []
+    for name, pattern in sorted(named_patterns(), key=lambda item: item[0]):
+        if name in SKIP:
+            continue
+        params = list(pattern.pattern.converters) or [
+            group for group in pattern.pattern.regex.groupindex
+        ]
+        if not params:
+            crawl.append((name, reverse(name)))
+        elif name in URL_ARGS and samples.get(URL_ARGS[name]):
+            crawl.append((name, reverse(name, args=[samples[URL_ARGS[name]]])))
+        else:
+            missing.append((name, f'no sample for {", ".join(params)}; add it to URL_ARGS or SKIP'))
+    return crawl, missing
+
+
+def crawl(samples):
+    """{"name:role": {"status": ..., "queries": ...}} for every crawlable URL and role"""
+    clients = {}
+    for role in ROLES:
+        clients[role] = Client(raise_request_exception=False)
+        if role != 'anonymous':
+            clients[role].force_login(samples['users'][role])
+
+    crawlable, missing = urls(samples)
+    results = {}
+    for name, url in crawlable:
+        for role in ROLES:
+            client = clients[role]
+            # Counted on the second request, once caches are warm, as for most real visits
+            client.get(url, secure=True)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, secure=True)
+            results[f'{name}:{role}'] = {'status': response.status_code, 'queries': len(queries)}
+    return results, missing
+
+
+def measure(residents, seed=0):
+    """crawl() over a freshly generated synthetic ward of the given size"""
+    synthetic.generate(residents, seed=seed)
+    # Role checks log every denied page the crawler visits
+    logging.disable(logging.WARNING)
+    try:
+        results, missing = crawl(synthetic.sample_objects())
+    finally:
+        logging.disable(logging.NOTSET)
+    return results, missing
+
+
+def split_errors(results):
+    """
+    Remove pages that errored from results and return them as
+    {"name:role": "returned <status>"}; an error has no meaningful count.
+    """
+    errors = sorted(key for key, result in results.items() if result['status'] >= 500)
+    return {key: f'returned {results.pop(key)["status"]}' for key in errors}
+
+
+def growth(small, large):
+    """Failures for pages that run more queries on the larger ward"""
+    failures = []
+    for key, result in large.items():
+        before = small.get(key, result)['queries']
+        if result['queries'] > before:
+            failures.append(f'{key}: {before} -> {result["queries"]} queries as rows grow (N+1?)')
+    return failures
+
+
+def load_budgets(path=BUDGETS_PATH):
+    """{"budgets": {key: queries}, "skipped": {key: reason}}, or None if there is no file"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_budgets(results, skipped, path=BUDGETS_PATH):
+    data = {
+        'budgets': {key: result['queries'] for key, result in sorted(results.items())},
+        'skipped': dict(sorted(skipped.items())),
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+    return data
+
+
+def check_budgets(results, skipped, recorded):
+    """
+    (failures, notes) for measured results and skipped pages against the
+    recorded file contents. A page that newly errors is a failure; one
+    that was recorded as skipped and now works, or that runs under its
+    budget, is only noted.
+    """
+    budgets, known = recorded['budgets'], recorded['skipped']
+    failures, notes = [], []
+    for key, result in sorted(results.items()):
+        budget = budgets.get(key)
+        if budget is None:
+            if key in known:
+                notes.append(f'{key}: recorded as skipped ({known[key]}) but now measured; run with --update')
+            else:
+                failures.append(f'{key}: no budget; run with --update if the new page is expected')
+        elif result['queries'] > budget:
+            failures.append(f'{key}: {result["queries"]} queries, budget {budget}')
+        elif result['queries'] < budget:
+            notes.append(f'{key}: {result["queries"]} queries, under its budget of {budget}; consider --update')
+    for key, reason in sorted(skipped.items()):
+        if key not in known:
+            failures.append(f'{key}: {reason}; fix the page or run with --update to record it as skipped')
+    for key in sorted(budgets.keys() - results.keys() - skipped.keys()):
+        notes.append(f'{key}: budgeted but no longer crawled')
+    return failures, notes
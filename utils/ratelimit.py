@@ -0,0 +1,273 @@
+"""
+Rate limiting engine for Ward Resident System
+
+A policy names a rate ("10/h", "5/15m", "100/d") and an algorithm:
+
+* ``fixed``   - counter that resets once per window
+* ``sliding`` - log of hit times over the last window, so there is no
+                doubled burst where two fixed windows meet
+* ``gcra``    - generic cell rate algorithm: a token bucket refilled
+                evenly over the window, stored as one timestamp per client
+
+Policies live in settings.RATE_LIMITS, with optional per-role rates. On
+the Redis cache every check is a single Lua script call, so it is atomic
+across workers and costs one round trip. With the local-memory cache (and
+whenever the cache cannot be reached) an in-process limiter with the same
+algorithms is used. Other cache backends get an atomic fixed window built
+from add() and incr().
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger('ward_system')
+
+ALGORITHMS = ('fixed', 'sliding', 'gcra')
+
+DEFAULT_ALGORITHM = 'gcra'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Seconds between warnings while the cache is unreachable
+OUTAGE_LOG_INTERVAL = 60
+
+Rate = namedtuple('Rate', 'limit window')
+
+# retry_after: seconds until the next hit is allowed (0 when allowed)
+# reset: seconds until the client is back to a full allowance
+Decision = namedtuple('Decision', 'allowed limit remaining retry_after reset')
+
+_RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$')
+
+
+def parse_rate(rate):
+    """Parse "10/h" or "5/15m" into Rate(limit, window_seconds)"""
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ImproperlyConfigured(f'Invalid rate limit "{rate}"; expected e.g. "10/h" or "5/15m"')
+    limit, multiplier, unit = match.groups()
+    return Rate(int(limit), int(multiplier or 1) * PERIODS[unit])
+
+
+def get_policy(name):
+    try:
+        policy = settings.RATE_LIMITS[name]
+    except (AttributeError, KeyError):
+        raise ImproperlyConfigured(f'No rate limit policy "{name}" in settings.RATE_LIMITS')
+    algorithm = policy.get('algorithm', DEFAULT_ALGORITHM)
+    if algorithm not in ALGORITHMS:
+        raise ImproperlyConfigured(f'Rate limit policy "{name}" has unknown algorithm "{algorithm}"')
+    return policy
+
+
+def rate_for(policy, user):
+    """The Rate that applies to ``user`` under ``policy``, or None if the user is exempt"""
+    if user.is_authenticated:
+        if user.is_staff and policy.get('exempt_staff', True):
+            return None
+        role = getattr(user, 'role', None)
+    else:
+        role = 'anonymous'
+    rate = policy.get('roles', {}).get(role, policy['rate'])
+    return parse_rate(rate) if rate else None
+
+
+# -------------------------
+# Redis: one atomic script per check. Times come from the Redis server clock so
+# every worker agrees; values are milliseconds. Each script returns
+# {allowed, remaining, retry_after_ms, reset_ms}.
+# -------------------------
+
+_NOW_MS = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+"""
+
+FIXED_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local count = redis.call('INCR', KEYS[1])
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], window)
+    ttl = window
+end
+if count > limit then
+    return {0, 0, ttl, ttl}
+end
+return {1, limit - count, 0, ttl}
+"""
+
+SLIDING_SCRIPT = _NOW_MS + """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    local newest = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+    return {0, 0, tonumber(oldest[2]) + window - now, tonumber(newest[2]) + window - now}
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], window)
+return {1, limit - count - 1, 0, window}
+"""
+
+GCRA_SCRIPT = _NOW_MS + """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local interval = window / limit
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+redis.call('SET', KEYS[1], math.ceil(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.floor((now - allow_at) / interval), 0, math.ceil(new_tat - now)}
+"""
+
+SCRIPTS = {'fixed': FIXED_SCRIPT, 'sliding': SLIDING_SCRIPT, 'gcra': GCRA_SCRIPT}
+
+
+def _redis_client(backend, key):
+    """The redis-py client behind Django's RedisCache or django-redis, else None"""
+    if hasattr(backend, '_cache') and hasattr(backend._cache, 'get_client'):
+        return backend._cache.get_client(key, write=True)  # django.core.cache.backends.redis
+    client = getattr(backend, 'client', None)
+    if client is not None and hasattr(client, 'get_client'):
+        return client.get_client(write=True)  # django_redis
+    return None
+
+
+class RedisLimiter:
+    def __init__(self):
+        self._scripts = {}
+
+    def hit(self, client, key, algorithm, rate):
+        script = self._scripts.get(algorithm)
+        if script is None:
+            script = self._scripts[algorithm] = client.register_script(SCRIPTS[algorithm])
+        args = [rate.limit, rate.window * 1000]
+        if algorithm == 'sliding':
+            args.append(os.urandom(8).hex())  # log entries must be unique per hit
+        allowed, remaining, retry_ms, reset_ms = script(keys=[key], args=args, client=client)
+        return Decision(bool(allowed), rate.limit, int(remaining), int(retry_ms) / 1000, int(reset_ms) / 1000)
+
+
+class LocalLimiter:
+    """
+    In-process implementation of the same algorithms.
+
+    Limits are per process, so with several workers a client may get up to
+    workers x limit; good enough for development and for riding out a cache
+    outage.
+    """
+
+    # Expired entries are swept once the table grows past this
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def hit(self, key, algorithm, rate, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if len(self._state) > self.MAX_KEYS:
+                self._sweep(now)
+            return getattr(self, f'_{algorithm}')(key, rate, now)
+
+    def _sweep(self, now):
+        self._state = {key: value for key, value in self._state.items() if value[0] > now}
+
+    # State per key is (expires_at, data)
+
+    def _fixed(self, key, rate, now):
+        expires, count = self._state.get(key, (0, 0))
+        if expires <= now:
+            expires, count = now + rate.window, 0
+        count += 1
+        self._state[key] = (expires, count)
+        reset = expires - now
+        if count > rate.limit:
+            return Decision(False, rate.limit, 0, reset, reset)
+        return Decision(True, rate.limit, rate.limit - count, 0, reset)
+
+    def _sliding(self, key, rate, now):
+        hits = self._state.get(key, (0, None))[1] or deque()
+        while hits and hits[0] <= now - rate.window:
+            hits.popleft()
+        if len(hits) >= rate.limit:
+            self._state[key] = (hits[-1] + rate.window, hits)
+            return Decision(False, rate.limit, 0, hits[0] + rate.window - now, hits[-1] + rate.window - now)
+        hits.append(now)
+        self._state[key] = (now + rate.window, hits)
+        return Decision(True, rate.limit, rate.limit - len(hits), 0, rate.window)
+
+    def _gcra(self, key, rate, now):
+        interval = rate.window / rate.limit
+        tat = max(self._state.get(key, (0, now))[1], now)
+        new_tat = tat + interval
+        allow_at = new_tat - rate.window
+        if allow_at > now:
+            return Decision(False, rate.limit, 0, allow_at - now, tat - now)
+        self._state[key] = (new_tat, new_tat)
+        return Decision(True, rate.limit, int((now - allow_at) // interval), 0, new_tat - now)
+
+
+class CacheLimiter:
+    """Fixed window on any Django cache: add() creates the counter, incr() bumps it atomically"""
+
+    def hit(self, backend, key, rate):
+        now = time.time()
+        window_end = (int(now // rate.window) + 1) * rate.window
+        key = f'{key}:{int(now // rate.window)}'
+        backend.add(key, 0, int(window_end - now) + 1)
+        try:
+            count = backend.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            backend.add(key, 1, int(window_end - now) + 1)
+            count = 1
+        reset = window_end - now
+        if count > rate.limit:
+            return Decision(False, rate.limit, 0, reset, reset)
+        return Decision(True, rate.limit, rate.limit - count, 0, reset)
+
+
+_redis = RedisLimiter()
+_local = LocalLimiter()
+_generic = CacheLimiter()
+_outage_logged_at = 0
+
+
+def check(policy_name, identifier, rate, algorithm=DEFAULT_ALGORITHM, backend=None):
+    """Count one hit for ``identifier`` and return the Decision"""
+    backend = backend or caches[DEFAULT_CACHE_ALIAS]
+    key = f'ratelimit:{policy_name}:{algorithm}:{identifier}'
+
+    if isinstance(backend, LocMemCache):
+        return _local.hit(key, algorithm, rate)
+    try:
+        cache_key = backend.make_key(key)
+        client = _redis_client(backend, cache_key)
+        if client is not None:
+            return _redis.hit(client, cache_key, algorithm, rate)
+        return _generic.hit(backend, key, rate)
+    except Exception:
+        global _outage_logged_at
+        if time.monotonic() - _outage_logged_at > OUTAGE_LOG_INTERVAL:
+            _outage_logged_at = time.monotonic()
+            logger.warning('Rate limit cache unavailable; using the in-process limiter', exc_info=True)
+        return _local.hit(key, algorithm, rate)
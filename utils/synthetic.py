@@ -0,0 +1,388 @@
+"""
+Synthetic ward data for Ward Resident System
+
+``generate(residents, seed)`` fills the database with households,
+residents, resident accounts, visitors, letter requests, complaints and
+announcements in realistic proportions. Everything is written with
+bulk_create in chunks, so a million residents takes minutes, not hours.
+The output depends only on the scale and the seed, so two runs can be
+compared. Signals do not fire for bulk inserts, so no thumbnails, emails
+or live updates are produced.
+
+Synthetic rows are marked (usernames start with ``syn_`` and household
+numbers with ``SYN-``), and ``clear()`` removes them without touching
+real records.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import User
+from communications.models import Announcement, Complaint, ComplaintResponse
+from communications.feed import bump_version
+from letters.models import LetterRequest, LetterType
+from letters.templating import STANDARD_TEMPLATES, invalidate_template
+from residents.models import Household, Resident
+from utils.counters import GROUPS, invalidate
+from visitors.models import Visitor, VisitorLog
+
+USER_PREFIX = 'syn_'
+HOUSEHOLD_PREFIX = 'SYN-'
+
+# Password of every synthetic account
+PASSWORD = 'synthetic'
+
+CHUNK = 5000
+
+# Rows of each kind per resident
+RATIOS = {
+    'households': 1 / 4,
+    'accounts': 1 / 10,
+    'visitors': 1 / 10,
+    'letter_requests': 1 / 5,
+    'complaints': 1 / 50,
+}
+
+ANNOUNCEMENTS = 20
+
+FIRST_NAMES = (
+    'Asha', 'Baraka', 'Neema', 'Juma', 'Rehema', 'Hamisi', 'Zawadi', 'Faraji', 'Upendo', 'Salim',
+    'Amina', 'Daudi', 'Mwanaisha', 'Emmanuel', 'Halima', 'Joseph', 'Subira', 'Peter', 'Saida', 'John',
+)
+LAST_NAMES = (
+    'Mwakyusa', 'Kimaro', 'Mushi', 'Massawe', 'Njau', 'Mollel', 'Mrema', 'Shayo', 'Lyimo', 'Swai',
+    'Mbwambo', 'Kisanga', 'Mfinanga', 'Temba', 'Urio', 'Minja', 'Kessy', 'Lema', 'Macha', 'Ngowi',
+)
+STREETS = ('Uhuru', 'Mapinduzi', 'Nyerere', 'Msimbazi', 'Jamhuri', 'Kariakoo', 'Mwenge', 'Sinza', 'Saranga', 'Kimara')
+WARDS = ('Saranga', 'Kimara', 'Mbezi', 'Ubungo')
+OCCUPATIONS = ('Teacher', 'Farmer', 'Trader', 'Driver', 'Nurse', 'Student', 'Mechanic', 'Tailor', '')
+# (name, template) of each letter type requested; the templates the code ships
+LETTER_TYPES = tuple(STANDARD_TEMPLATES.items())
+
+# (value, weight) pairs
+LETTER_STATUSES = (('pending', 15), ('approved', 25), ('completed', 50), ('rejected', 10))
+COMPLAINT_STATUSES = (('open', 30), ('in_progress', 25), ('resolved', 35), ('closed', 10))
+SPECIAL_CATEGORIES = (('none', 85), ('elderly', 7), ('disability', 3), ('orphan', 3), ('vulnerable', 2))
+
+
+def _pick(rng, weighted):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def _phone(rng):
+    return f'07{rng.randrange(10 ** 8):08d}'
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """Let bulk_create keep the generated created/updated times instead of now()"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _chunks(total):
+    for start in range(0, total, CHUNK):
+        yield start, min(start + CHUNK, total)
+
+
+def clear():
+    """Delete every synthetic row; returns the number of rows deleted"""
+    deleted = 0
+    deleted += Household.objects.filter(household_number__startswith=HOUSEHOLD_PREFIX).delete()[0]
+    deleted += User.objects.filter(username__startswith=USER_PREFIX).delete()[0]
+    invalidate_caches()
+    return deleted
+
+
+def invalidate_caches(letter_type_ids=()):
+    """
+    Retire the cached counters, announcement feeds and compiled letter
+    templates that bulk writes leave stale; nothing else in the cache is touched
+    """
+    invalidate(*GROUPS)
+    bump_version()
+    for pk in letter_type_ids:
+        invalidate_template(pk)
+
+
+def generate(residents, seed=0, progress=None):
+    """
+    Create a synthetic ward with ``residents`` residents and everything that
+    goes with them. ``progress(kind, done, total)`` is called after each chunk.
+    Returns the number of rows created per kind.
+    """
+    if User.objects.filter(username__startswith=USER_PREFIX).exists():
+        raise ValueError('Synthetic data already exists; clear it first')
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    progress = progress or (lambda kind, done, total: None)
+    counts = {kind: max(1, int(residents * ratio)) for kind, ratio in RATIOS.items()}
+    counts['residents'] = residents
+    password = make_password(PASSWORD)
+
+    with manual_timestamps(
+        User, Household, Resident, Visitor, VisitorLog, LetterRequest, Complaint, ComplaintResponse, Announcement,
+    ):
+        with transaction.atomic():
+            staff = [
+                User(username=f'{USER_PREFIX}admin', role='admin', is_staff=True, password=password,
+                     first_name='Ward', last_name='Leader', email='syn_admin@example.invalid', date_joined=now,
+                     created_at=now, updated_at=now),
+                User(username=f'{USER_PREFIX}clerk', role='clerk', password=password,
+                     first_name='Data', last_name='Clerk', date_joined=now, created_at=now, updated_at=now),
+            ]
+            User.objects.bulk_create(staff)
+            staff_ids = list(User.objects.filter(username__in=[u.username for u in staff]).order_by('pk').values_list('pk', flat=True))
+            letter_type_ids = [
+                LetterType.objects.get_or_create(name=name, defaults={'description': name, 'template_content': text})[0].pk
+                for name, text in LETTER_TYPES
+            ]
+
+        household_ids = _households(rng, counts['households'], now, progress)
+        account_ids = _accounts(rng, counts['accounts'], password, now, progress)
+        resident_ids = _residents(rng, residents, household_ids, account_ids, now, progress)
+        _visitors(rng, counts['visitors'], household_ids, staff_ids, now, progress)
+        # Only residents with an account can request letters or complain
+        owners = list(zip(account_ids, resident_ids[:len(account_ids)]))
+        _letter_requests(rng, counts['letter_requests'], owners, letter_type_ids, staff_ids[0], now, progress)
+        counts['complaint_responses'] = _complaints(rng, counts['complaints'], owners, staff_ids[0], now, progress)
+        _announcements(rng, staff_ids[0], now)
+        counts['announcements'] = ANNOUNCEMENTS
+
+    # Cached counters and feeds describe the old data
+    invalidate_caches(letter_type_ids)
+    return counts
+
+
+def _households(rng, total, now, progress):
+    for start, end in _chunks(total):
+        Household.objects.bulk_create([
+            Household(
+                household_number=f'{HOUSEHOLD_PREFIX}{i:07d}',
+                street_name=f'{rng.choice(STREETS)} Street',
+                house_number=str(rng.randint(1, 999)),
+                ward=rng.choice(WARDS),
+                created_at=now,
+                updated_at=now,
+            )
+            for i in range(start, end)
+        ])
+        progress('households', end, total)
+    return list(
+        Household.objects.filter(household_number__startswith=HOUSEHOLD_PREFIX).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def _accounts(rng, total, password, now, progress):
+    for start, end in _chunks(total):
+        User.objects.bulk_create([
+            User(
+                username=f'{USER_PREFIX}resident{i}',
+                role='resident',
+                password=password,
+                email=f'resident{i}@example.invalid',
+                phone_number=_phone(rng),
+                date_joined=now - timedelta(days=rng.randint(0, 1000)),
+                created_at=now,
+                updated_at=now,
+            )
+            for i in range(start, end)
+        ])
+        progress('accounts', end, total)
+    return list(
+        User.objects.filter(username__startswith=f'{USER_PREFIX}resident').order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def _residents(rng, total, household_ids, account_ids, now, progress):
+    today = now.date()
+    for start, end in _chunks(total):
+        batch = []
+        for i in range(start, end):
+            household_id = household_ids[i % len(household_ids)]
+            registered = now - timedelta(days=rng.randint(0, 1500), seconds=rng.randint(0, 86399))
+            batch.append(Resident(
+                user_id=account_ids[i] if i < len(account_ids) else None,
+                household_id=household_id,
+                first_name=rng.choice(FIRST_NAMES),
+                middle_name=rng.choice(FIRST_NAMES) if rng.random() < 0.5 else '',
+                last_name=rng.choice(LAST_NAMES),
+                nida_number=f'99{i:018d}',
+                date_of_birth=today - timedelta(days=rng.randint(365, 90 * 365)),
+                gender=rng.choice('MF'),
+                marital_status=rng.choice(('single', 'married', 'married', 'divorced', 'widowed')),
+                phone_number=_phone(rng) if rng.random() < 0.8 else '',
+                email=f'resident{i}@example.invalid' if rng.random() < 0.6 else '',
+                occupation=rng.choice(OCCUPATIONS),
+                special_category=_pick(rng, SPECIAL_CATEGORIES),
+                relationship_to_head='Head' if i < len(household_ids) else rng.choice(('Spouse', 'Child', 'Parent', 'Relative')),
+                is_active=rng.random() < 0.97,
+                registration_date=registered,
+                updated_at=registered,
+            ))
+        Resident.objects.bulk_create(batch)
+        progress('residents', end, total)
+    # Residents of the accounts, in the same order as account_ids
+    return list(Resident.objects.filter(user_id__in=account_ids).order_by('user_id').values_list('pk', flat=True))
+
+
+def _visitors(rng, total, household_ids, staff_ids, now, progress):
+    for start, end in _chunks(total):
+        batch = []
+        for i in range(start, end):
+            entry = now - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1439))
+            # A few visits are still going on, some of them past their expected exit
+            current = rng.random() < 0.02
+            entry = now - timedelta(minutes=rng.randint(5, 600)) if current else entry
+            batch.append(Visitor(
+                full_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                id_number=f'{rng.randrange(10 ** 12):012d}',
+                phone_number=_phone(rng),
+                address=f'{rng.randint(1, 999)} {rng.choice(STREETS)} Street',
+                household_visited_id=rng.choice(household_ids),
+                person_visited=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                purpose=rng.choice(('business', 'family', 'family', 'official', 'service', 'other')),
+                entry_time=entry,
+                expected_exit_time=entry + timedelta(hours=rng.randint(1, 8)),
+                actual_exit_time=None if current else entry + timedelta(minutes=rng.randint(10, 480)),
+                registered_by_id=rng.choice(staff_ids),
+                is_active=current,
+                created_at=entry,
+                updated_at=entry,
+            ))
+        created = Visitor.objects.bulk_create(batch)
+        # The entry (and exit) log rows the visitor views write
+        logs = []
+        for visitor in created:
+            logs.append(VisitorLog(
+                visitor_id=visitor.pk, action='entry', description=f'Visitor registered for entry at {visitor.entry_time}',
+                performed_by_id=visitor.registered_by_id, timestamp=visitor.entry_time,
+            ))
+            if visitor.actual_exit_time:
+                logs.append(VisitorLog(
+                    visitor_id=visitor.pk, action='exit', description=f'Visitor exited at {visitor.actual_exit_time}',
+                    performed_by_id=visitor.registered_by_id, timestamp=visitor.actual_exit_time,
+                ))
+        VisitorLog.objects.bulk_create(logs)
+        progress('visitors', end, total)
+
+
+def _letter_requests(rng, total, owners, letter_type_ids, approver_id, now, progress):
+    for start, end in _chunks(total):
+        batch = []
+        for i in range(start, end):
+            user_id, resident_id = owners[i % len(owners)]
+            requested = now - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86399))
+            status = _pick(rng, LETTER_STATUSES)
+            decided = requested + timedelta(hours=rng.randint(1, 72)) if status != 'pending' else None
+            batch.append(LetterRequest(
+                resident_id=resident_id,
+                letter_type_id=rng.choice(letter_type_ids),
+                purpose=rng.choice(('Bank account', 'Job application', 'School admission', 'Travel', 'Loan')),
+                priority=rng.choice(('low', 'medium', 'medium', 'high', 'urgent')),
+                status=status,
+                requested_by_id=user_id,
+                approved_by_id=approver_id if decided else None,
+                request_date=requested,
+                approval_date=decided,
+                completion_date=decided + timedelta(days=1) if status == 'completed' else None,
+                rejection_reason='Incomplete details' if status == 'rejected' else '',
+            ))
+        LetterRequest.objects.bulk_create(batch)
+        progress('letter_requests', end, total)
+
+
+def _complaints(rng, total, owners, responder_id, now, progress):
+    categories = [value for value, _ in Complaint.CATEGORY_CHOICES]
+    responses = 0
+    for start, end in _chunks(total):
+        batch = []
+        for i in range(start, end):
+            user_id, resident_id = owners[rng.randrange(len(owners))]
+            submitted = now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86399))
+            status = _pick(rng, COMPLAINT_STATUSES)
+            batch.append(Complaint(
+                title=f'{rng.choice(("Broken", "Blocked", "Missing", "Unsafe"))} {rng.choice(("road", "drain", "street light", "water point"))}',
+                description='Reported by a resident.',
+                category=rng.choice(categories),
+                location=f'{rng.choice(STREETS)} Street',
+                submitted_by_id=user_id,
+                resident_id=resident_id,
+                anonymous=rng.random() < 0.1,
+                status=status,
+                assigned_to_id=responder_id if status != 'open' else None,
+                submitted_at=submitted,
+                updated_at=submitted,
+                resolved_at=submitted + timedelta(days=rng.randint(1, 30)) if status in ('resolved', 'closed') else None,
+            ))
+        created = Complaint.objects.bulk_create(batch)
+        replies = [
+            ComplaintResponse(
+                complaint_id=complaint.pk,
+                response_text='We are looking into this.',
+                responded_by_id=responder_id,
+                created_at=complaint.submitted_at + timedelta(hours=n + 1),
+            )
+            for complaint in created if complaint.status != 'open'
+            for n in range(rng.randint(1, 3))
+        ]
+        ComplaintResponse.objects.bulk_create(replies)
+        responses += len(replies)
+        progress('complaints', end, total)
+    return responses
+
+
+def _announcements(rng, author_id, now):
+    Announcement.objects.bulk_create([
+        Announcement(
+            title=f'Ward notice {i + 1}',
+            content='Synthetic announcement for load testing.',
+            priority=rng.choice(('low', 'medium', 'high', 'urgent')),
+            created_by_id=author_id,
+            created_at=now - timedelta(days=i),
+            updated_at=now - timedelta(days=i),
+            expires_at=now + timedelta(days=rng.randint(1, 60)) if rng.random() < 0.3 else None,
+        )
+        for i in range(ANNOUNCEMENTS)
+    ])
+
+
+def sample_objects():
+    """
+    Users of each role and one object of each kind for detail pages, picked
+    the same way on every run. Objects belong to the sample resident where
+    the resident could see them.
+    """
+    users = {
+        role: User.objects.filter(username__startswith=f'{USER_PREFIX}{role}').order_by('pk').first()
+        for role in ('admin', 'clerk', 'resident')
+    }
+    own_letters = LetterRequest.objects.filter(requested_by=users['resident']).order_by('pk')
+    ids = lambda queryset: queryset.values_list('pk', flat=True).first()
+    return {
+        'users': users,
+        'resident': ids(Resident.objects.filter(user=users['resident'])),
+        'visitor': ids(Visitor.objects.exclude(actual_exit_time=None).order_by('pk')),
+        'letter_request': ids(own_letters) or ids(LetterRequest.objects.order_by('pk')),
+        'pending_letter_request': ids(LetterRequest.objects.filter(status='pending').order_by('pk')),
+        'approved_letter_request': ids(LetterRequest.objects.filter(status='approved').order_by('pk')),
+        'complaint': (
+            ids(Complaint.objects.filter(submitted_by=users['resident']).exclude(status='open').order_by('pk'))
+            or ids(Complaint.objects.exclude(status='open').order_by('pk'))
+        ),
+        'announcement': ids(Announcement.objects.order_by('pk')),
+    }
@@ -0,0 +1,10 @@
+"""
+Background tasks for shared utilities
+"""
+from jobs.queue import task
+from .images import build_derivatives
+
+@task('images.build_derivatives')
+def build_image_derivatives(path):
+    """Build the display-size copies of an uploaded photo"""
+    build_derivatives(path)
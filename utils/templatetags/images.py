@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+from django.core.files.storage import default_storage
+from utils.images import SIZES, derivative_name
+
+register = template.Library()
+
+@register.filter
+def thumbnail(fieldfile, size='thumb'):
+    """
+    URL of a photo resized for display, falling back to the original until
+    the derivative has been built.
+    Usage: <img src="{{ resident.photo|thumbnail:'small' }}">
+    """
+    if not fieldfile:
+        return ''
+    if size not in SIZES:
+        if settings.DEBUG:
+            raise template.TemplateSyntaxError(f'Unknown thumbnail size "{size}"; use one of {", ".join(SIZES)}')
+        size = 'thumb'
+    name = derivative_name(fieldfile.name, size)
+    if default_storage.exists(name):
+        return default_storage.url(name)
+    return fieldfile.url
@@ -0,0 +1,19 @@
+from django import template
+
+register = template.Library()
+
+@register.simple_tag(takes_context=True)
+def query_with(context, **kwargs):
+    """
+    Current query string with the given parameters replaced.
+    Empty values remove the parameter.
+    Usage: <a href="?{% query_with cursor=page.next_cursor %}">
+    """
+    params = context['request'].GET.copy()
+    params.pop('page', None)
+    for key, value in kwargs.items():
+        if value in (None, ''):
+            params.pop(key, None)
+        else:
+            params[key] = value
+    return params.urlencode()
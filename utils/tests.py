@@ -0,0 +1,416 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from utils import backup, exports, querycount, ratelimit, synthetic
+from utils.ratelimit import CacheLimiter, LocalLimiter, Rate, parse_rate
+
+
+class ParseRateTests(SimpleTestCase):
+    def test_rates(self):
+        self.assertEqual(parse_rate('10/h'), Rate(10, 3600))
+        self.assertEqual(parse_rate('5/15m'), Rate(5, 900))
+        self.assertEqual(parse_rate(' 100 / d '), Rate(100, 86400))
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ImproperlyConfigured):
+            parse_rate('10 per hour')
+
+
+class LocalLimiterTests(SimpleTestCase):
+    rate = Rate(3, 60)
+
+    def setUp(self):
+        self.limiter = LocalLimiter()
+
+    def hits(self, algorithm, times, key='client'):
+        return [self.limiter.hit(key, algorithm, self.rate, now=now) for now in times]
+
+    def test_fixed_window_resets(self):
+        decisions = self.hits('fixed', [0, 1, 2, 3])
+        self.assertEqual([d.allowed for d in decisions], [True, True, True, False])
+        self.assertEqual([d.remaining for d in decisions], [2, 1, 0, 0])
+        self.assertEqual(decisions[-1].retry_after, 57)
+        # The window opened at 0 ends at 60
+        self.assertTrue(self.limiter.hit('client', 'fixed', self.rate, now=60).allowed)
+
+    def test_fixed_window_allows_a_burst_at_the_boundary(self):
+        # Windows start at a client's first hit; six hits in two seconds span two of them
+        decisions = self.hits('fixed', [0, 58, 59, 60, 60, 60])
+        self.assertTrue(all(d.allowed for d in decisions))
+
+    def test_sliding_window_has_no_boundary_burst(self):
+        decisions = self.hits('sliding', [59, 59, 59, 60])
+        self.assertEqual([d.allowed for d in decisions], [True, True, True, False])
+        self.assertEqual(decisions[-1].retry_after, 59)
+
+    def test_sliding_window_frees_hits_as_they_age(self):
+        decisions = self.hits('sliding', [0, 10, 20, 59, 60, 61])
+        self.assertEqual([d.allowed for d in decisions], [True, True, True, False, True, False])
+        self.assertEqual(decisions[-1].retry_after, 9)
+
+    def test_gcra_allows_burst_then_even_rate(self):
+        # 3 per 60s: one hit is earned back every 20s
+        decisions = self.hits('gcra', [0, 0, 0, 0, 19, 20])
+        self.assertEqual([d.allowed for d in decisions], [True, True, True, False, False, True])
+        self.assertEqual([d.remaining for d in decisions[:3]], [2, 1, 0])
+        self.assertEqual(decisions[3].retry_after, 20)
+        self.assertEqual(decisions[4].retry_after, 1)
+
+    def test_gcra_refills_to_full_allowance(self):
+        self.hits('gcra', [0, 0, 0])
+        self.assertEqual(self.limiter.hit('client', 'gcra', self.rate, now=60).remaining, 2)
+
+    def test_denied_gcra_hit_costs_nothing(self):
+        self.hits('gcra', [0, 0, 0, 0, 0, 0])
+        self.assertTrue(self.limiter.hit('client', 'gcra', self.rate, now=20).allowed)
+
+    def test_clients_are_counted_separately(self):
+        for algorithm in ratelimit.ALGORITHMS:
+            self.hits(algorithm, [0, 0, 0], key=f'{algorithm}:a')
+            self.assertTrue(self.limiter.hit(f'{algorithm}:b', algorithm, self.rate, now=0).allowed)
+
+    def test_expired_keys_are_swept(self):
+        with mock.patch.object(LocalLimiter, 'MAX_KEYS', 2):
+            for n in range(3):
+                self.limiter.hit(f'client{n}', 'fixed', self.rate, now=0)
+            self.limiter.hit('late', 'fixed', self.rate, now=100)
+        self.assertEqual(list(self.limiter._state), ['late'])
+
+
+class CacheLimiterTests(SimpleTestCase):
+    rate = Rate(2, 60)
+
+    def setUp(self):
+        self.backend = LocMemCache('ratelimit-tests', {})
+        self.limiter = CacheLimiter()
+
+    def hit(self, now):
+        with mock.patch.object(ratelimit.time, 'time', return_value=now):
+            return self.limiter.hit(self.backend, 'client', self.rate)
+
+    def test_fixed_window_on_cache(self):
+        decisions = [self.hit(now) for now in (120, 130, 140)]
+        self.assertEqual([d.allowed for d in decisions], [True, True, False])
+        self.assertEqual([d.remaining for d in decisions], [1, 0, 0])
+        self.assertEqual(decisions[-1].retry_after, 40)
+
+    def test_next_window_starts_fresh(self):
+        self.hit(120)
+        self.hit(121)
+        decision = self.hit(180)
+        self.assertTrue(decision.allowed)
+        self.assertEqual(decision.remaining, 1)
+
+
+class UnreachableRedis:
+    """A Redis cache backend whose server is down"""
+
+    class _cache:
+        @staticmethod
+        def get_client(key, write=False):
+            raise ConnectionError('Connection refused')
+
+    def make_key(self, key):
+        return f':1:{key}'
+
+
+class FallbackTests(SimpleTestCase):
+    def setUp(self):
+        for name, value in (('_local', LocalLimiter()), ('_outage_logged_at', float('-inf'))):
+            patcher = mock.patch.object(ratelimit, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_cache_outage_uses_in_process_limiter(self):
+        rate = Rate(2, 60)
+        with self.assertLogs('ward_system', 'WARNING') as logs:
+            decisions = [
+                ratelimit.check('test', 'client', rate, 'fixed', backend=UnreachableRedis())
+                for _ in range(3)
+            ]
+        self.assertEqual([d.allowed for d in decisions], [True, True, False])
+        # Warned once, not on every request
+        self.assertEqual(len(logs.records), 1)
+
+    def test_locmem_cache_uses_in_process_limiter(self):
+        backend = LocMemCache('ratelimit-fallback', {})
+        decision = ratelimit.check('test', 'client', Rate(1, 60), 'sliding', backend=backend)
+        self.assertTrue(decision.allowed)
+        self.assertIn('ratelimit:test:sliding:client', ratelimit._local._state)
+
+
+class ExportTests(SimpleTestCase):
+    def test_formulas_are_neutralised(self):
+        for value in ('=HYPERLINK("http://x")', '@SUM(A1)', '+cmd', '-2+3+cmd|\' /C calc\'!A0', '\t=1'):
+            self.assertEqual(exports._cell(value), "'" + value)
+
+    def test_phone_numbers_and_plain_text_are_kept(self):
+        for value in ('+255712345678', '+255 (712) 345 678', '-5', '-1.5', 'Asha = Juma', ''):
+            self.assertEqual(exports._cell(value), value)
+
+    def test_missing_related_objects_are_blank(self):
+        row = mock.Mock(visitor=mock.Mock(full_name='Asha'), performed_by=None)
+        columns = (('Visitor', 'visitor.full_name'), ('Performed By', 'performed_by.username'))
+        self.assertEqual(list(exports.export_rows(mock.Mock(iterator=lambda chunk_size: [row]), columns)), [['Asha', '']])
+
+    def test_csv_starts_with_a_bom_and_header(self):
+        lines = list(exports.iter_csv((('Name', 'name'),), [['=1']]))
+        self.assertEqual(lines, ['\ufeffName\r\n', '=1\r\n'])
+
+
+class BackupTestCase(SimpleTestCase):
+    """Backups of a scratch SQLite file and media directory, leaving the test database alone"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.root = os.path.join(self.tmp, 'backups')
+        self.media = os.path.join(self.tmp, 'media')
+        self.db_path = os.path.join(self.tmp, 'site.sqlite3')
+
+        with sqlite3.connect(self.db_path) as db:
+            db.execute('CREATE TABLE resident (name TEXT)')
+            db.executemany('INSERT INTO resident VALUES (?)', [('Asha',), ('Juma',)])
+        db.close()
+
+        media_root = override_settings(MEDIA_ROOT=self.media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        for patcher in (
+            mock.patch.dict(settings.DATABASES['default'], NAME=self.db_path),
+            mock.patch.object(backup, 'database_vendor', return_value='sqlite'),
+            # Restores close every connection; the test database must stay open
+            mock.patch.object(backup, 'connections'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_media(self, relpath, content):
+        path = os.path.join(self.media, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def read_media(self, relpath):
+        with open(os.path.join(self.media, relpath), 'rb') as f:
+            return f.read()
+
+    def residents(self):
+        db = sqlite3.connect(self.db_path)
+        try:
+            return [row[0] for row in db.execute('SELECT name FROM resident ORDER BY name')]
+        finally:
+            db.close()
+
+    def snapshot(self):
+        directory, manifest = backup.create_backup(root=self.root, codec='gzip', workers=2)
+        return manifest['name']
+
+
+class BackupRestoreTests(BackupTestCase):
+    def test_round_trip(self):
+        self.write_media('photos/asha.jpg', b'\xff\xd8 jpeg bytes')
+        self.write_media('letters/1.pdf', b'%PDF-1.4 letter')
+        name = self.snapshot()
+
+        # Everything changes after the backup
+        os.remove(os.path.join(self.media, 'photos/asha.jpg'))
+        self.write_media('letters/1.pdf', b'%PDF-1.4 edited')
+        with sqlite3.connect(self.db_path) as db:
+            db.execute("DELETE FROM resident WHERE name = 'Juma'")
+        db.close()
+
+        backup.verify_snapshot(name, root=self.root, deep=True)
+        manifest, stats = backup.restore_snapshot(name, root=self.root, workers=2)
+
+        self.assertEqual(self.residents(), ['Asha', 'Juma'])
+        self.assertEqual(self.read_media('photos/asha.jpg'), b'\xff\xd8 jpeg bytes')
+        self.assertEqual(self.read_media('letters/1.pdf'), b'%PDF-1.4 letter')
+        self.assertEqual(stats, {'files': 2, 'bytes': manifest['stats']['media_bytes'], 'restored': 2, 'skipped': 0})
+
+    def test_unchanged_media_is_stored_once(self):
+        self.write_media('photos/asha.jpg', b'photo')
+        self.snapshot()
+        self.write_media('photos/copy.jpg', b'photo')
+        name = self.snapshot()
+
+        manifest = backup.load_manifest(name, root=self.root)
+        self.assertEqual(manifest['stats']['new_objects'], 0)
+        self.assertEqual(manifest['media']['photos/asha.jpg'], manifest['media']['photos/copy.jpg'])
+
+    def test_unchanged_files_are_skipped_on_restore(self):
+        self.write_media('letters/1.pdf', b'letter')
+        name = self.snapshot()
+        _, stats = backup.restore_snapshot(name, root=self.root, database=False)
+        self.assertEqual((stats['restored'], stats['skipped']), (0, 1))
+
+    def test_corrupt_object_is_not_restored(self):
+        self.write_media('letters/1.pdf', b'letter')
+        name = self.snapshot()
+        entry = backup.load_manifest(name, root=self.root)['media']['letters/1.pdf']
+        with backup.open_compressed(backup.object_path(self.root, entry['sha256'], entry['codec']), entry['codec'], 'wb') as f:
+            f.write(b'tampered')
+        self.write_media('letters/1.pdf', b'current')
+
+        with self.assertRaises(backup.BackupError):
+            backup.verify_snapshot(name, root=self.root, deep=True)
+        with self.assertRaises(backup.BackupError):
+            backup.restore_snapshot(name, root=self.root, database=False)
+        self.assertEqual(self.read_media('letters/1.pdf'), b'current')
+
+
+class PruneBackupsTests(BackupTestCase):
+    def age(self, name, days):
+        manifest = os.path.join(backup.snapshots_dir(self.root), name, 'manifest.json')
+        then = (datetime.now() - timedelta(days=days)).timestamp()
+        os.utime(manifest, (then, then))
+
+    def test_old_snapshots_and_their_objects_are_removed(self):
+        self.write_media('photos/kept.jpg', b'kept')
+        self.write_media('photos/deleted.jpg', b'deleted')
+        old = self.snapshot()
+        os.remove(os.path.join(self.media, 'photos/deleted.jpg'))
+        new = self.snapshot()
+        self.age(old, 40)
+
+        removed, removed_objects = backup.prune_backups(30, root=self.root)
+
+        self.assertEqual(removed, [old])
+        self.assertEqual(removed_objects, 1)
+        self.assertEqual(backup.list_snapshots(self.root), [new])
+        # What is left still restores
+        backup.verify_snapshot(new, root=self.root, deep=True)
+
+    def test_newest_snapshots_are_kept_however_old(self):
+        self.write_media('photos/a.jpg', b'a')
+        first = self.snapshot()
+        second = self.snapshot()
+        self.age(first, 40)
+        self.age(second, 40)
+
+        removed, _ = backup.prune_backups(30, root=self.root, keep=1)
+        self.assertEqual(removed, [first])
+        self.assertEqual(backup.list_snapshots(self.root), [second])
+
+    def test_recent_snapshots_are_kept(self):
+        self.write_media('photos/a.jpg', b'a')
+        self.snapshot()
+        self.snapshot()
+        removed, removed_objects = backup.prune_backups(30, root=self.root)
+        self.assertEqual((removed, removed_objects), ([], 0))
+
+    def test_interrupted_runs_are_cleaned_up(self):
+        self.snapshot()
+        partial = os.path.join(backup.snapshots_dir(self.root), '20000101_000000.partial')
+        os.makedirs(partial)
+        backup.prune_backups(30, root=self.root)
+        self.assertFalse(os.path.exists(partial))
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def resident(self, nida):
+        from residents.models import Household, Resident
+
+        household, _ = Household.objects.get_or_create(
+            household_number='HH1', defaults={'street_name': 'Main', 'house_number': '1', 'ward': 'Saranga'}
+        )
+        return Resident.objects.create(
+            household=household, first_name='Asha', last_name='Juma', nida_number=nida * 20,
+            date_of_birth=datetime(1990, 1, 1).date(), gender='F', marital_status='single',
+        )
+
+    def test_counters_are_cached(self):
+        from utils.counters import get_counters
+
+        self.assertEqual(get_counters(('residents',))['total_residents'], 0)
+        with self.assertNumQueries(0):
+            get_counters(('residents',))
+
+    def test_cached_group_is_dropped_when_the_transaction_commits(self):
+        from utils.counters import get_counters
+
+        get_counters()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.resident('1')
+            # Nothing is dropped before the commit, so a rollback costs no recount
+            self.assertEqual(get_counters(('residents',))['total_residents'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_counters()['total_residents'], 1)
+
+    def test_other_groups_stay_cached(self):
+        from utils.counters import get_counters
+
+        get_counters()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resident('1')
+        with self.assertNumQueries(1):
+            get_counters()
+
+
+class SyntheticDataTests(TestCase):
+    def test_only_stale_cache_entries_are_dropped(self):
+        from communications import feed
+        from utils.counters import get_counters
+
+        cache.set('unrelated', 'kept')
+        get_counters()
+        version = feed.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            synthetic.generate(10)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        self.assertGreater(feed.current_version(), version)
+        self.assertEqual(get_counters(('residents',))['total_residents'], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            synthetic.clear()
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        self.assertEqual(get_counters(('residents',))['total_residents'], 0)
+
+    def test_letter_types_use_the_shipped_templates(self):
+        from letters.models import LetterType
+        from letters.templating import STANDARD_TEMPLATES
+
+        synthetic.generate(10)
+        self.assertEqual(dict(LetterType.objects.values_list('name', 'template_content')), STANDARD_TEMPLATES)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class QueryCountTests(TestCase):
+    """Every page, as every role, against N+1 growth and query_budgets.json"""
+
+    # The small ward fits on one page of every list, the large one fills them
+    small, large = 20, 200
+
+    @classmethod
+    def setUpTestData(cls):
+        # The audit sink's thread writes through its own connection, which cannot see the test transaction
+        with mock.patch('audit.sink.record'):
+            cls.small_results, _ = querycount.measure(cls.small)
+            synthetic.clear()
+            cls.large_results, cls.missing = querycount.measure(cls.large)
+        cls.skipped = querycount.split_errors(cls.large_results)
+
+    def test_every_page_is_crawled(self):
+        self.assertEqual(self.missing, [])
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.assertEqual(querycount.growth(self.small_results, self.large_results), [])
+
+    def test_queries_are_within_budget(self):
+        recorded = querycount.load_budgets()
+        self.assertIsNotNone(recorded, 'run check_query_counts --update to create query_budgets.json')
+        failures, _ = querycount.check_budgets(self.large_results, self.skipped, recorded)
+        self.assertEqual(failures, [])
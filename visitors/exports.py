@@ -0,0 +1,56 @@
+"""
+Register export columns for visitors and the visitor activity log
+"""
+from .models import Visitor, VisitorLog
+
+VISITOR_COLUMNS = (
+    ('Full Name', 'full_name'),
+    ('ID Number', 'id_number'),
+    ('Phone Number', 'phone_number'),
+    ('Address', 'address'),
+    ('Household', 'household_visited.household_number'),
+    ('Street', 'household_visited.street_name'),
+    ('Person Visited', 'person_visited'),
+    ('Purpose', lambda v: v.get_purpose_display()),
+    ('Purpose Details', 'purpose_details'),
+    ('Entry Time', 'entry_time'),
+    ('Expected Exit Time', 'expected_exit_time'),
+    ('Actual Exit Time', 'actual_exit_time'),
+    ('Currently Visiting', 'is_currently_visiting'),
+    ('Registered By', 'registered_by.username'),
+    ('Notes', 'notes'),
+)
+
+VISITOR_LOG_COLUMNS = (
+    ('Timestamp', 'timestamp'),
+    ('Visitor', 'visitor.full_name'),
+    ('Visitor ID Number', 'visitor.id_number'),
+    ('Action', 'action'),
+    ('Description', 'description'),
+    ('Performed By', 'performed_by.username'),
+)
+
+def overstay_columns(now):
+    """Export columns for the overstay report, with hours overdue measured at ``now``"""
+    return (
+        ('Full Name', 'full_name'),
+        ('ID Number', 'id_number'),
+        ('Phone Number', 'phone_number'),
+        ('Household', 'household_visited.household_number'),
+        ('Street', 'household_visited.street_name'),
+        ('Person Visited', 'person_visited'),
+        ('Entry Time', 'entry_time'),
+        ('Expected Exit Time', 'expected_exit_time'),
+        ('Flagged At', 'overstay_flagged_at'),
+        ('Hours Overdue', lambda v: hours_overdue(v, now)),
+    )
+
+def hours_overdue(visitor, now):
+    return round((now - visitor.expected_exit_time).total_seconds() / 3600, 1)
+
+def visitor_queryset():
+    """Visitors as listed on the visitor log"""
+    return Visitor.objects.select_related('household_visited', 'registered_by').order_by('-entry_time', '-pk')
+
+def visitor_log_queryset():
+    return VisitorLog.objects.select_related('visitor', 'performed_by').order_by('-timestamp', '-pk')
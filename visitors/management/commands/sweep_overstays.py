@@ -0,0 +1,80 @@
+"""
+Management command to sweep visits past their expected exit
+
+Meant for cron (every few minutes). By default overdue visits are flagged
+and left open for the checkpoint to follow up; --close records them as
+exited. Either way the overstay report is printed, or written to --output
+as CSV or XLSX.
+"""
+import os
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from utils.exports import FORMATS, write_export
+from visitors.exports import hours_overdue, overstay_columns
+from visitors.overstay import close_overstays, flag_overstays, grace_period, overstay_report
+
+class Command(BaseCommand):
+    help = 'Flag or close visits past their expected exit and report the overstays'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--close',
+            action='store_true',
+            help='Record overdue visitors as exited instead of only flagging them',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            help='Minutes past the expected exit before a visit counts as overdue '
+                 '(default: VISITOR_OVERSTAY_GRACE_MINUTES)',
+        )
+        parser.add_argument(
+            '--report-only',
+            action='store_true',
+            help='Only report the overstays; change nothing',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the report to this .csv or .xlsx file instead of printing it',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        grace = timedelta(minutes=options['grace']) if options['grace'] is not None else grace_period()
+
+        # Reported before a --close sweep, which would otherwise leave nothing to report
+        report = overstay_report(now, grace)
+        if options['output']:
+            self.write_report(report, options['output'], now)
+        else:
+            self.print_report(report, now)
+
+        if options['report_only']:
+            return
+        if options['close']:
+            closed = close_overstays(now, grace)
+            self.stdout.write(self.style.SUCCESS(f'Closed {closed} overdue visit(s)'))
+        else:
+            flagged = flag_overstays(now, grace)
+            self.stdout.write(self.style.SUCCESS(f'Flagged {flagged} new overstay(s)'))
+
+    def print_report(self, report, now):
+        rows = 0
+        for visitor in report.iterator():
+            if not rows:
+                self.stdout.write(f'{"visitor":<30} {"household":<15} {"expected exit":<17} {"hours over":>10}')
+            self.stdout.write(
+                f'{visitor.full_name[:30]:<30} {visitor.household_visited.household_number[:15]:<15} '
+                f'{timezone.localtime(visitor.expected_exit_time):%Y-%m-%d %H:%M} {hours_overdue(visitor, now):>10}'
+            )
+            rows += 1
+        self.stdout.write(f'{rows} visit(s) past their expected exit')
+
+    def write_report(self, report, path, now):
+        file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            file_format = 'csv'
+        with open(path, 'wb') as f:
+            write_export(f, file_format, report, overstay_columns(now), title='Overstays')
+        self.stdout.write(f'Overstay report written to {path}')
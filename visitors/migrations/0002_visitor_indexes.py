@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['-entry_time', '-id'], name='visitor_entry_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(condition=models.Q(('actual_exit_time__isnull', True), ('is_active', True)), fields=['household_visited', 'entry_time'], name='visitor_active_idx'),
+        ),
+    ]
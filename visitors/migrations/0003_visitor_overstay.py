@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('visitors', '0002_visitor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='overstay_flagged_at',
+            field=models.DateTimeField(blank=True, help_text='When the overstay sweep flagged this visit', null=True),
+        ),
+        migrations.AlterField(
+            model_name='visitorlog',
+            name='performed_by',
+            field=models.ForeignKey(blank=True, help_text='Empty for entries written by the overstay sweep', null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(condition=models.Q(('actual_exit_time__isnull', True), ('is_active', True)), fields=['expected_exit_time'], name='visitor_overdue_idx'),
+        ),
+    ]
@@ -1,7 +1,30 @@
 from django.db import models
+from django.db.models import Prefetch, Q
 from django.conf import settings
 from residents.models import Household
 
+# Visitors still inside the ward; the same condition defines the partial index that serves it
+ACTIVE = Q(is_active=True, actual_exit_time__isnull=True)
+
+class VisitorQuerySet(models.QuerySet):
+    def active(self):
+        """Visits in progress, answered from visitor_active_idx"""
+        return self.filter(ACTIVE)
+
+    def overdue(self, cutoff):
+        """Visits in progress whose expected exit is before ``cutoff``, answered from visitor_overdue_idx"""
+        return self.active().filter(expected_exit_time__lt=cutoff)
+
+    def for_list(self):
+        """Rows for the visitor log with the household visited joined in"""
+        return self.select_related('household_visited')
+
+    def for_detail(self):
+        """One visitor with the activity log and who recorded each entry, in a fixed number of queries"""
+        return self.select_related('household_visited', 'registered_by').prefetch_related(
+            Prefetch('logs', queryset=VisitorLog.objects.select_related('performed_by').order_by('-timestamp'))
+        )
+
 class Visitor(models.Model):
     VISIT_PURPOSE_CHOICES = (
         ('business', 'Business'),
@@ -33,28 +56,63 @@ class Visitor(models.Model):
     
     # Status
     is_active = models.BooleanField(default=True, help_text="Is the visitor currently in the area?")
+    overstay_flagged_at = models.DateTimeField(null=True, blank=True, help_text="When the overstay sweep flagged this visit")
     notes = models.TextField(blank=True, help_text="Additional notes or observations")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VisitorQuerySet.as_manager()
+
     class Meta:
         ordering = ['-entry_time']
+        indexes = [
+            # Visitor log pages, newest first (CursorPaginator adds pk as the tiebreaker)
+            models.Index(fields=['-entry_time', '-id'], name='visitor_entry_time_idx'),
+            # Only the visits in progress, grouped by household for the occupancy board
+            models.Index(fields=['household_visited', 'entry_time'], condition=ACTIVE, name='visitor_active_idx'),
+            # Visits in progress by expected exit, for the overstay sweep
+            models.Index(fields=['expected_exit_time'], condition=ACTIVE, name='visitor_overdue_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} visiting {self.person_visited} at {self.household_visited}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_presence()
+        return instance
+
     @property
     def is_currently_visiting(self):
         return self.is_active and self.actual_exit_time is None
 
+    def _presence(self):
+        # Read from __dict__ so a deferred field is not fetched just to compare it
+        return self.__dict__.get('is_active'), self.__dict__.get('actual_exit_time')
+
+    def remember_presence(self):
+        """Record is_active and actual_exit_time as saved, for presence_changed()"""
+        self._saved_presence = self._presence()
+
+    def presence_changed(self):
+        """Whether is_active or actual_exit_time differ from the loaded row; True when nothing was loaded"""
+        return getattr(self, '_saved_presence', None) != self._presence()
+
 class VisitorLog(models.Model):
     """Track all visitor activities and status changes"""
     visitor = models.ForeignKey(Visitor, on_delete=models.CASCADE, related_name='logs')
     action = models.CharField(max_length=50, help_text="Action taken (entry, exit, status_change, etc.)")
     description = models.TextField()
-    performed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    performed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Empty for entries written by the overstay sweep",
+    )
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -0,0 +1,39 @@
+"""
+Live ward occupancy for security checkpoints
+
+The number of visitors inside is the cached ``visitors`` counter group
+(utils.counters), dropped whenever a visit starts or ends. Each change is
+also published on the OCCUPANCY channel, so open boards and dashboards
+update without a reload; the count is taken after the transaction
+commits, so it includes the change and runs once per change. The board itself reads only the rows in
+visitor_active_idx, grouped by household.
+"""
+from django.db import transaction
+from events.bus import OCCUPANCY, publish
+from utils.counters import get_counters, invalidate
+from .models import Visitor
+
+
+def live_count():
+    """Visitors inside the ward right now; one cache lookup on a warm cache"""
+    return get_counters(('visitors',))['active_visitors']
+
+
+def board():
+    """Visits in progress, ordered by household and then by entry, with the household joined in"""
+    return (
+        Visitor.objects.active()
+        .select_related('household_visited')
+        .only(
+            'full_name', 'id_number', 'person_visited', 'purpose', 'entry_time', 'expected_exit_time', 'overstay_flagged_at',
+            'is_active', 'actual_exit_time', 'household_visited__household_number',
+            'household_visited__house_number', 'household_visited__street_name',
+        )
+        .order_by('household_visited__household_number', 'household_visited_id', 'entry_time')
+    )
+
+
+def occupancy_changed():
+    """Drop the cached count and announce the new one once the current transaction commits"""
+    invalidate('visitors')
+    transaction.on_commit(lambda: publish(OCCUPANCY, 'occupancy', {'total': Visitor.objects.active().count()}))
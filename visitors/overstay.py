@@ -0,0 +1,94 @@
+"""
+Overstay sweep for Ward Resident System
+
+Visits whose expected exit has passed (by more than a grace period) are
+found through visitor_overdue_idx and handled in bulk, all in one
+transaction: the overdue rows are locked and their keys read once, then
+each chunk of keys gets one UPDATE and one bulk_create of its VisitorLog
+entries. Nothing is read back by the values just written, which no index
+covers. ``flag_overstays`` only marks the visits; ``close_overstays``
+also records them as exited. Either way a visit is logged once, and a
+visitor a clerk lets out in the meantime is left alone.
+
+The sweep_overstays command runs this from cron and prints (or exports)
+the overstay report.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Visitor, VisitorLog
+from .occupancy import occupancy_changed
+
+# Visits per UPDATE and VisitorLog bulk INSERT
+BATCH_SIZE = 1000
+
+
+def grace_period():
+    return timedelta(minutes=getattr(settings, 'VISITOR_OVERSTAY_GRACE_MINUTES', 30))
+
+
+def _cutoff(now, grace):
+    return now - (grace_period() if grace is None else grace)
+
+
+def _sweep(visitors, changes, action, describe):
+    """
+    Lock ``visitors``, apply ``changes`` to them and log one VisitorLog per
+    visit, BATCH_SIZE at a time; returns how many were swept. Must run
+    inside a transaction.
+    """
+    rows = list(visitors.select_for_update().order_by('pk').values_list('pk', 'expected_exit_time'))
+    for start in range(0, len(rows), BATCH_SIZE):
+        chunk = rows[start:start + BATCH_SIZE]
+        Visitor.objects.filter(pk__in=[pk for pk, _ in chunk]).update(**changes)
+        VisitorLog.objects.bulk_create([
+            VisitorLog(visitor_id=pk, action=action, description=describe(expected), performed_by=None)
+            for pk, expected in chunk
+        ])
+    return len(rows)
+
+
+@transaction.atomic
+def flag_overstays(now=None, grace=None):
+    """Mark overdue visits not flagged yet; returns how many were flagged"""
+    now = now or timezone.now()
+    return _sweep(
+        Visitor.objects.overdue(_cutoff(now, grace)).filter(overstay_flagged_at__isnull=True),
+        {'overstay_flagged_at': now},
+        'overstay',
+        lambda expected: f'Flagged by the overstay sweep; expected exit was {expected}',
+    )
+
+
+@transaction.atomic
+def close_overstays(now=None, grace=None):
+    """Record overdue visits as exited at ``now``; returns how many were closed"""
+    now = now or timezone.now()
+    closed = _sweep(
+        Visitor.objects.overdue(_cutoff(now, grace)),
+        {
+            'is_active': False,
+            'actual_exit_time': now,
+            'overstay_flagged_at': Coalesce('overstay_flagged_at', Value(now)),
+            'updated_at': now,
+        },
+        'exit',
+        lambda expected: f'Exit recorded by the overstay sweep at {now}; expected exit was {expected}',
+    )
+    if closed:
+        # update() sends no signals, so refresh the live count once for the whole sweep
+        occupancy_changed()
+    return closed
+
+
+def overstay_report(now=None, grace=None):
+    """Visits still in progress past their expected exit, longest overdue first"""
+    now = now or timezone.now()
+    return (
+        Visitor.objects.overdue(_cutoff(now, grace))
+        .select_related('household_visited')
+        .order_by('expected_exit_time', 'pk')
+    )
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Visitor
+from .occupancy import occupancy_changed
+
+@receiver(post_save, sender=Visitor)
+def refresh_visitor_counters(sender, instance, created, **kwargs):
+    # Edits to a visit's details leave the number inside unchanged
+    if created or instance.presence_changed():
+        occupancy_changed()
+    instance.remember_presence()
+
+@receiver(post_delete, sender=Visitor)
+def refresh_visitor_counters_on_delete(sender, instance, **kwargs):
+    occupancy_changed()
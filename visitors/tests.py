@@ -1,3 +1,186 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from residents.models import Household
+from utils.exports import write_export
+from .exports import VISITOR_LOG_COLUMNS, visitor_log_queryset
+from .models import Visitor, VisitorLog
+from .occupancy import board, live_count
+from .overstay import close_overstays, flag_overstays, overstay_report
 
-# Create your tests here.
+
+class VisitorTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clerk = User.objects.create_user('clerk', role='clerk')
+        cls.household = Household.objects.create(household_number='HH1', street_name='Main', house_number='1', ward='Saranga')
+
+    def visitor(self, name='Asha', entered=2, expected=1, **fields):
+        now = timezone.now()
+        return Visitor.objects.create(
+            full_name=name, id_number='ID1', address='Dodoma', household_visited=self.household,
+            person_visited='Juma', purpose='family', entry_time=now - timedelta(hours=entered),
+            expected_exit_time=now - timedelta(hours=expected), registered_by=self.clerk, **fields
+        )
+
+
+class ExportTests(VisitorTestCase):
+    def test_log_entries_without_a_user_export_a_blank_name(self):
+        visitor = self.visitor()
+        VisitorLog.objects.create(visitor=visitor, action='entry', description='In', performed_by=self.clerk)
+        VisitorLog.objects.create(visitor=visitor, action='overstay', description='=Flagged', performed_by=None)
+
+        out = io.BytesIO()
+        write_export(out, 'csv', visitor_log_queryset(), VISITOR_LOG_COLUMNS)
+        rows = out.getvalue().decode('utf-8-sig').splitlines()
+
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(rows[1].endswith(",overstay,'=Flagged,"))
+        self.assertTrue(rows[2].endswith(',entry,In,clerk'))
+
+
+class OccupancyTests(VisitorTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('visitors.occupancy.publish')
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def commit(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            return change()
+
+    def totals(self):
+        return [c.args[2]['total'] for c in self.publish.call_args_list]
+
+    def test_count_follows_entries_and_exits(self):
+        asha = self.commit(lambda: self.visitor('Asha'))
+        self.commit(lambda: self.visitor('Juma'))
+        self.assertEqual(live_count(), 2)
+
+        asha.is_active = False
+        asha.actual_exit_time = timezone.now()
+        self.commit(asha.save)
+        self.assertEqual(live_count(), 1)
+        self.assertEqual(self.totals(), [1, 2, 1])
+        self.assertEqual([v.full_name for v in board()], ['Juma'])
+
+    def test_total_is_counted_after_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.visitor('Asha')
+            self.visitor('Juma')
+        self.publish.assert_not_called()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.totals(), [2, 2])
+
+    def test_edits_that_leave_presence_alone_publish_nothing(self):
+        visitor = self.commit(lambda: self.visitor())
+        live_count()
+        self.publish.reset_mock()
+
+        visitor = Visitor.objects.get(pk=visitor.pk)
+        visitor.notes = 'Carrying a parcel'
+        self.commit(visitor.save)
+
+        self.publish.assert_not_called()
+        with self.assertNumQueries(0):
+            self.assertEqual(live_count(), 1)
+
+
+@override_settings(VISITOR_OVERSTAY_GRACE_MINUTES=30)
+class OverstayTests(VisitorTestCase):
+    def setUp(self):
+        # Two hours overdue, within the grace period, and already let out
+        self.late = self.visitor('Late', entered=4, expected=2)
+        self.recent = self.visitor('Recent', entered=1, expected=0.25)
+        self.exited = self.visitor('Exited', entered=4, expected=2)
+        self.exit_time = timezone.now() - timedelta(hours=1)
+        self.exited.is_active = False
+        self.exited.actual_exit_time = self.exit_time
+        self.exited.save()
+
+    def refresh(self):
+        for visitor in (self.late, self.recent, self.exited):
+            visitor.refresh_from_db()
+
+    def test_flag_marks_overdue_visits_once(self):
+        self.assertEqual(flag_overstays(), 1)
+        self.assertEqual(flag_overstays(), 0)
+        self.refresh()
+        self.assertIsNotNone(self.late.overstay_flagged_at)
+        self.assertTrue(self.late.is_currently_visiting)
+        self.assertIsNone(self.recent.overstay_flagged_at)
+        self.assertEqual(list(VisitorLog.objects.values_list('visitor_id', 'action', 'performed_by')),
+                         [(self.late.pk, 'overstay', None)])
+
+    def test_close_records_the_exit(self):
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(close_overstays(now=now), 1)
+        self.refresh()
+        self.assertEqual((self.late.is_active, self.late.actual_exit_time), (False, now))
+        self.assertEqual(self.late.overstay_flagged_at, now)
+        self.assertTrue(self.recent.is_currently_visiting)
+
+    def test_close_keeps_the_first_flag_time(self):
+        flagged_at = timezone.now() - timedelta(minutes=10)
+        flag_overstays(now=flagged_at)
+        close_overstays()
+        self.late.refresh_from_db()
+        self.assertEqual(self.late.overstay_flagged_at, flagged_at)
+
+    def test_exited_visitors_are_left_alone(self):
+        flag_overstays()
+        close_overstays()
+        self.refresh()
+        self.assertEqual(self.exited.actual_exit_time, self.exit_time)
+        self.assertIsNone(self.exited.overstay_flagged_at)
+        self.assertFalse(VisitorLog.objects.filter(visitor=self.exited).exists())
+
+    def test_report_lists_visits_still_overdue(self):
+        self.assertEqual([v.full_name for v in overstay_report()], ['Late'])
+        close_overstays()
+        self.assertEqual(list(overstay_report()), [])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class DetailTests(VisitorTestCase):
+    def setUp(self):
+        # The audit sink's thread writes through its own connection, which cannot see the test transaction
+        patcher = mock.patch('audit.sink.record')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.clerk)
+
+    def get(self, visitor):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('visitors:detail', args=[visitor.pk]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_queries_do_not_grow_with_the_log(self):
+        visitor = self.visitor()
+        VisitorLog.objects.create(visitor=visitor, action='entry', description='In', performed_by=self.clerk)
+        _, queries = self.get(visitor)
+
+        for _ in range(5):
+            VisitorLog.objects.create(visitor=visitor, action='note', description='Seen', performed_by=self.clerk)
+            VisitorLog.objects.create(visitor=visitor, action='overstay', description='Late', performed_by=None)
+        response, more_queries = self.get(visitor)
+
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(len(response.context['logs']), 11)
+
+    def test_sweep_entries_are_shown_without_a_user(self):
+        visitor = self.visitor()
+        VisitorLog.objects.create(visitor=visitor, action='overstay', description='Late', performed_by=None)
+        response, _ = self.get(visitor)
+        self.assertContains(response, 'Overstay sweep')
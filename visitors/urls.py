@@ -5,6 +5,8 @@ app_name = 'visitors'
 
 urlpatterns = [
     path('log/', views.visitor_log, name='log'),
+    path('occupancy/', views.occupancy_board, name='occupancy'),
+    path('export/', views.visitor_export, name='export'),
     path('register/', views.register_visitor, name='register'),
     path('exit/<int:pk>/', views.visitor_exit, name='exit'),
     path('detail/<int:pk>/', views.visitor_detail, name='detail'),
@@ -1,10 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.utils import timezone
 from .models import Visitor, VisitorLog
+from .occupancy import board, live_count
 from .forms import VisitorRegistrationForm
+from utils.exports import FORMATS, export_response
+from utils.pagination import CursorPaginator
+from .exports import VISITOR_COLUMNS, VISITOR_LOG_COLUMNS, visitor_log_queryset, visitor_queryset
 
 @login_required
 def visitor_log(request):
@@ -12,12 +15,44 @@ def visitor_log(request):
         messages.error(request, 'Access denied. Admin or clerk privileges required.')
         return redirect('home')
     
-    visitors = Visitor.objects.all().select_related('household_visited').order_by('-entry_time')
-    paginator = Paginator(visitors, 20)
-    page_number = request.GET.get('page')
-    visitors = paginator.get_page(page_number)
+    visitors = Visitor.objects.for_list()
+    paginator = CursorPaginator(visitors, 20, ordering=('-entry_time',), count='approximate')
+    visitors = paginator.get_page(request.GET.get('cursor'))
     
-    return render(request, 'visitors/log.html', {'visitors': visitors})
+    return render(request, 'visitors/log.html', {
+        'visitors': visitors,
+        'active_visitors_count': live_count(),
+    })
+
+@login_required
+def occupancy_board(request):
+    if request.user.role not in ['admin', 'clerk']:
+        messages.error(request, 'Access denied. Admin or clerk privileges required.')
+        return redirect('home')
+    
+    # Grouped by household in the template; rows come only from the active-visit index
+    visitors = board()
+    
+    return render(request, 'visitors/occupancy.html', {
+        'visitors': visitors,
+        'active_visitors_count': live_count(),
+        'now': timezone.now(),
+    })
+
+@login_required
+def visitor_export(request):
+    if request.user.role not in ['admin', 'clerk']:
+        messages.error(request, 'Access denied. Admin or clerk privileges required.')
+        return redirect('home')
+    
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in FORMATS:
+        file_format = 'csv'
+    
+    # ?activity=1 exports the entry/exit activity log instead of the visitors
+    if request.GET.get('activity'):
+        return export_response(file_format, 'visitor_activity', visitor_log_queryset(), VISITOR_LOG_COLUMNS, title='Visitor Activity')
+    return export_response(file_format, 'visitors', visitor_queryset(), VISITOR_COLUMNS, title='Visitors')
 
 @login_required
 def register_visitor(request):
@@ -79,8 +114,9 @@ def visitor_detail(request, pk):
         messages.error(request, 'Access denied. Admin or clerk privileges required.')
         return redirect('home')
     
-    visitor = get_object_or_404(Visitor, pk=pk)
-    logs = visitor.logs.all().order_by('-timestamp')
+    visitor = get_object_or_404(Visitor.objects.for_detail(), pk=pk)
+    # Prefetched with who recorded each entry by for_detail()
+    logs = visitor.logs.all()
     
     return render(request, 'visitors/detail.html', {
         'visitor': visitor,
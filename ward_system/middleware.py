@@ -2,26 +2,48 @@
 Custom middleware for Ward Resident System
 """
 import logging
+import time
+from contextlib import ExitStack
 from django.utils import timezone
-from django.contrib.auth.models import AnonymousUser
 from django.http import HttpResponseServerError
 from django.template import loader
 from django.conf import settings
+from django.db import connections
+from audit import sink as audit_sink
+from utils import metrics
 
 logger = logging.getLogger('ward_system')
 
 class AuditTrailMiddleware:
-    """Log user activities for audit purposes"""
+    """
+    Record authenticated requests in the audit trail.
+
+    Only a tuple is built here; audit.sink queues it and writes batches from
+    a background thread, so the request never waits on the audit store.
+    """
     
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Log request details
-        if not isinstance(request.user, AnonymousUser) and request.user.is_authenticated:
-            logger.info(f"User {request.user.username} ({request.user.role}) accessed {request.path} from {self.get_client_ip(request)}")
+        # Resolve the user before the view runs so logouts are still attributed
+        user = request.user if request.user.is_authenticated else None
+        started = time.perf_counter()
         
         response = self.get_response(request)
+        
+        if user is not None:
+            audit_sink.record((
+                timezone.now(),
+                user.pk,
+                user.username,
+                getattr(user, 'role', ''),
+                request.method,
+                request.path[:255],
+                response.status_code,
+                (self.get_client_ip(request) or '')[:45],
+                int((time.perf_counter() - started) * 1000),
+            ))
         return response
 
     def get_client_ip(self, request):
@@ -32,6 +54,38 @@ class AuditTrailMiddleware:
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
+class PerformanceMiddleware:
+    """
+    Time each request and count its database queries.
+
+    Totals are added to the histograms in utils.metrics under the URL name,
+    and sent back in a Server-Timing header to staff and admin users (to everyone
+    when SERVER_TIMING_PUBLIC is set).
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        duration = time.perf_counter() - started
+        
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        metrics.registry.record_request(view, request.method, response.status_code, duration, stats)
+        
+        if getattr(settings, 'SERVER_TIMING_PUBLIC', False) or metrics.can_view(getattr(request, 'user', None)):
+            response['Server-Timing'] = metrics.server_timing(duration, stats)
+        return response
+
 class SecurityHeadersMiddleware:
     """Add security headers to responses"""
     
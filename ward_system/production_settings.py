@@ -37,6 +37,10 @@ DATABASES = {
     }
 }
 
+# Trigram lookups used by resident search
+if 'django.contrib.postgres' not in INSTALLED_APPS:
+    INSTALLED_APPS = INSTALLED_APPS + ['django.contrib.postgres']
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -126,9 +130,6 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
         'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
-        'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-        }
     }
 }
 
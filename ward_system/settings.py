@@ -52,17 +52,27 @@ INSTALLED_APPS = [
     'letters',
     'communications',
     'visitors',
+    'jobs',
+    'audit',
+    'outbox',
+    'events',
     'utils',
     'whitenoise.runserver_nostatic',  # Added for WhiteNoise
 ]
 
+# Trigram lookups used by resident search on PostgreSQL
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.postgresql':
+    INSTALLED_APPS.append('django.contrib.postgres')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Inserted WhiteNoise middleware
+    'ward_system.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ward_system.middleware.AuditTrailMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,7 +81,7 @@ ROOT_URLCONF = 'ward_system.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'utils.metrics.InstrumentedDjangoTemplates',  # DjangoTemplates that reports render time
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -91,6 +101,7 @@ WSGI_APPLICATION = 'ward_system.wsgi.application'
 # -------------------------
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 SESSION_COOKIE_SECURE = not DEBUG
+SESSION_COOKIE_DOMAIN = os.getenv('SESSION_COOKIE_DOMAIN') or None
 CSRF_COOKIE_SECURE = not DEBUG
 SECURE_SSL_REDIRECT = not DEBUG
 CSRF_TRUSTED_ORIGINS = [
@@ -142,6 +153,82 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 AUTH_USER_MODEL = 'accounts.User'
 
+# -------------------------
+# Background jobs
+# -------------------------
+# Run queued jobs on the request thread instead of the run_jobs worker (development only)
+JOBS_RUN_INLINE = os.getenv('JOBS_RUN_INLINE', 'False') == 'True'
+JOBS_RETENTION_DAYS = 7  # done and failed jobs older than this are deleted by purge_jobs
+
+# Seconds dashboard counters may be served from the cache (signals refresh them sooner)
+DASHBOARD_COUNTER_TIMEOUT = 60
+
+# Longest time an announcement feed (and the anonymous home page) is cached; saves and expiries refresh it sooner
+ANNOUNCEMENT_FEED_TIMEOUT = 300
+
+# -------------------------
+# Audit trail: events are queued in memory and written in batches by a background thread.
+# 'db' writes to the audit_auditevent table, 'file' to rotating JSON lines at AUDIT_LOG_FILE.
+AUDIT_BACKEND = os.getenv('AUDIT_BACKEND', 'db')
+AUDIT_LOG_FILE = BASE_DIR / 'logs' / 'audit.jsonl'
+AUDIT_QUEUE_SIZE = 10000  # events beyond this are dropped and counted, never waited for
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 2.0  # seconds
+
+# Letters a batch export writes on the request thread; larger selections go to the job worker
+LETTER_EXPORT_INLINE_LIMIT = 10
+
+# Residents per announcement broadcast batch; each batch is one background job
+BROADCAST_BATCH_SIZE = 500
+
+# Email outbox (outbox.mail): messages per claimed batch, all sent over one SMTP connection
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_RETENTION_DAYS = 30  # delivered messages older than this are purged by send_outbox
+
+# Live updates over server-sent events (events.bus). The stream is served by the separate ASGI
+# "events" process; the site itself stays on WSGI so exports and downloads stream from disk.
+# EVENTS_STREAM_URL is the stream's absolute URL when that process has its own host (leave it
+# empty when a proxy routes /events/ to it); that host then needs the site's origin in
+# EVENTS_ALLOWED_ORIGINS and a SESSION_COOKIE_DOMAIN shared by both hosts. Stream requests that
+# reach the WSGI site are redirected there, or answered 204 (no live updates) when it is empty.
+EVENTS_STREAM_URL = os.getenv('EVENTS_STREAM_URL', '')
+EVENTS_ALLOWED_ORIGINS = [o for o in os.getenv('EVENTS_ALLOWED_ORIGINS', '').split(',') if o]
+EVENTS_BACKEND = 'events.bus.DatabaseBus'  # or 'events.bus.InProcessBus' for a single process
+EVENTS_POLL_INTERVAL = 1.0  # seconds between each web process's checks for new events
+EVENTS_STREAM_TIMEOUT = 300  # seconds before a stream closes and the browser reconnects
+EVENTS_RETENTION_HOURS = 24  # stored events older than this are deleted by purge_events
+EVENTS_TRIM_INTERVAL = 600  # seconds between the deletes DatabaseBus runs itself while publishing
+
+# Minutes past a visitor's expected exit before the sweep_overstays command flags or closes the visit
+VISITOR_OVERSTAY_GRACE_MINUTES = 30
+
+# Format of the resized photo copies built by utils.images: 'webp' or 'jpeg'
+IMAGE_DERIVATIVE_FORMAT = 'webp'
+
+# -------------------------
+# Backups (manage.py backup_data): snapshots and content-addressed media under BACKUP_ROOT
+BACKUP_ROOT = BASE_DIR / 'backups'
+BACKUP_RETENTION_DAYS = 30
+BACKUP_COMPRESSION = os.getenv('BACKUP_COMPRESSION', 'auto')  # 'auto' picks zstd when installed, else gzip
+BACKUP_WORKERS = None  # threads for copying and checking media; None picks from the CPU count
+
+# Rate limit policies for utils.decorators.rate_limit. 'rate' is "<count>/<period>" with the
+# period in s, m, h or d ("5/15m"); 'roles' overrides it per user role ('anonymous' for
+# logged-out visitors, None to exempt a role). Staff are exempt unless 'exempt_staff' is False.
+# 'algorithm' is 'gcra' (smooth token bucket, default), 'sliding' (exact log) or 'fixed'.
+RATE_LIMITS = {
+    'letter_request': {
+        'rate': '10/h',
+        'algorithm': 'gcra',
+        'roles': {'anonymous': '3/h'},
+    },
+}
+
+# Request metrics (utils.metrics). Server-Timing headers go to staff users unless made public;
+# /metrics/ is open to staff and to scrapers presenting METRICS_TOKEN as a bearer token.
+SERVER_TIMING_PUBLIC = False
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # -------------------------
 # Default primary key field type
 # -------------------------
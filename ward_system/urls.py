@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from events.views import stream
 from . import views
 
 urlpatterns = [
@@ -15,8 +16,13 @@ urlpatterns = [
     path('letters/', include('letters.urls')),
     path('communications/', include('communications.urls')),
     path('visitors/', include('visitors.urls')),
+    path('audit/', include('audit.urls')),
+    path('metrics/', views.metrics, name='metrics'),
+    path('events/stream/', stream, name='event_stream'),
+    # Uploaded photos are served by Django in every environment so downloads get validators
+    # and access checks; see views.MEDIA_DIRS for what is served and to whom
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', views.media, name='media'),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -1,43 +1,117 @@
+import mimetypes
+import os
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
 from letters.models import LetterRequest
-from communications.models import Complaint, Announcement
+from communications.feed import cached_public_page, get_feed
+from communications.models import Complaint
+from utils.counters import get_counters, get_user_letter_counters
 from residents.models import Resident
-from visitors.models import Visitor
+from utils import images
+from utils.downloads import serve_file
+from utils.metrics import can_view, render_prometheus
+
+def _own_resident_photos(user):
+    return [name for name in Resident.objects.filter(user=user).values_list('photo', flat=True) if name]
+
+def _own_profile_photos(user):
+    return [user.profile_photo.name] if user.profile_photo else []
+
+# Upload directories the media view serves -> the user's own files in it. Staff may read any
+# file in these; residents only their own (and its thumbnails). Every other directory, such as
+# generated letters, import files or a new upload field, is not served until it is added here.
+MEDIA_DIRS = {
+    'resident_photos': _own_resident_photos,
+    'profile_photos': _own_profile_photos,
+}
+
+def can_read_media(user, path):
+    """Whether ``user`` may fetch the media file at ``path``"""
+    original = path[len(images.PREFIX) + 1:] if path.startswith(f'{images.PREFIX}/') else path
+    own_files = MEDIA_DIRS.get(original.split('/', 1)[0])
+    if own_files is None:
+        return False
+    if user.role in ('admin', 'clerk'):
+        return True
+    return any(
+        path == name or path in {images.derivative_name(name, size) for size in images.SIZES}
+        for name in own_files(user)
+    )
 
 def home(request):
+    # The anonymous page only changes with the public announcements, so it is served from the cache
+    return cached_public_page(request, 'home', lambda: _render_home(request))
+
+def _render_home(request):
     context = {}
     
     if request.user.is_authenticated:
         if request.user.role == 'admin':
-            # Admin dashboard data
+            # Admin dashboard data; counters come from the cache
+            context.update(get_counters())
             context.update({
-                'total_residents': Resident.objects.filter(is_active=True).count(),
-                'pending_requests': LetterRequest.objects.filter(status='pending').count(),
-                'completed_requests': LetterRequest.objects.filter(status='completed').count(),
-                'active_visitors': Visitor.objects.filter(is_active=True, actual_exit_time__isnull=True).count(),
                 'recent_requests': LetterRequest.objects.select_related('resident', 'letter_type').order_by('-request_date')[:5],
             })
         elif request.user.role == 'resident':
             # Resident dashboard data
             letter_requests = LetterRequest.objects.filter(requested_by=request.user)
             
+            context.update(get_user_letter_counters(request.user.pk))
             context.update({
-                'letter_requests_count': letter_requests.count(),
-                'approved_requests_count': letter_requests.filter(status='approved').count(),
-                'pending_requests_count': letter_requests.filter(status='pending').count(),
                 # Recently approved letters ready for download (limit 5)
                 'approved_letters': letter_requests.filter(status='approved').select_related('letter_type').order_by('-request_date')[:5],
             })
         
         # Recent announcements for authenticated users
-        context['announcements'] = Announcement.objects.filter(is_active=True).order_by('-created_at')[:3]
+        context['announcements'] = get_feed('latest')
         
     else:
         # Public announcements for non-authenticated users
-        context['public_announcements'] = Announcement.objects.filter(
-            is_active=True,
-            priority__in=['high', 'urgent']
-        ).order_by('-created_at')[:5]
+        context['public_announcements'] = get_feed('public')
     
     return render(request, 'home.html', context)
+
+@login_required
+def media(request, path):
+    """Serve uploaded photos with validators, 304 revalidation and Range support"""
+    if not can_read_media(request.user, path):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    
+    stat = os.stat(fullpath)
+    content_type, _ = mimetypes.guess_type(fullpath)
+    return serve_file(
+        request,
+        open(fullpath, 'rb'),
+        size=stat.st_size,
+        etag=f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+        last_modified=datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc),
+        content_type=content_type or 'application/octet-stream',
+        cache_control='private, max-age=86400',
+    )
+
+def metrics(request):
+    """
+    Request metrics in the Prometheus text format.
+
+    Open to staff and admin users, or to a scraper sending
+    ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = can_view(request.user)
+    if not authorized and token:
+        authorized = constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    if not authorized:
+        raise Http404
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')